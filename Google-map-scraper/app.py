@@ -4,14 +4,24 @@ Simplified Google Maps Scraper API for Railway deployment
 This version initializes Chrome only when needed to avoid startup issues
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
+import asyncio
 import uvicorn
 import os
 
+from fast_json import FastJSONResponse, project_rows, search_response, select_fields
+from job_store import InvalidCursorError
+import metrics
+from job_stream import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, stream_job, wants_sse
+from fair_queue import DEFAULT_TENANT
+from scrape_jobs import JobManager, QueueFullError
+from webhooks import JobWebhook, WebhookSender, validate_callback_url
+
 # FastAPI app initialization
 app = FastAPI(title="Google Maps Scraper API", version="1.0.0")
 
@@ -24,11 +34,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def run_contact_extractor(query, max_results, visit_websites, progress_callback=None, skip_links=None):
+    """Job runner for the contact extractor (imported lazily to avoid startup issues)"""
+    # The extractor can't skip businesses, so extended jobs re-extract them. It has no per-business
+    # hook either: the job streams its rows as 'result' events when the run returns
+    from main import AdvancedContactExtractor
+
+    print("🚀 Initializing Google Maps extractor...")
+    extractor = AdvancedContactExtractor(
+        search_query=query,
+        max_results=max_results,
+        visit_websites=visit_websites
+    )
+    print("Starting extraction process...")
+    return extractor.run_extraction()
+
+# Scrapes run on this executor, off the event loop, so /health keeps answering.
+# Not sliced: the extractor can't skip businesses, so every slice would redo the ones before it
+job_manager = JobManager(scrape_fn=run_contact_extractor, slice_size=0)
+# Webhooks go out on their own threads, never on the scrape workers
+webhook_sender = WebhookSender()
+
+def request_tenant(http_request):
+    """Fair-share tenant of a request: the X-Tenant header, else the client address"""
+    tenant = http_request.headers.get('x-tenant')
+    if tenant:
+        return tenant[:64]
+    return http_request.client.host if http_request.client else DEFAULT_TENANT
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request, exc):
+    """Backpressure: tell clients when to come back instead of queueing forever"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after, "queue": job_manager.stats()},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Pydantic models
 class SearchRequest(BaseModel):
     query: str
     max_results: Optional[int] = 100
     visit_websites: Optional[bool] = True
+    use_cache: Optional[bool] = True
+    # interactive or batch; by default small scrapes are interactive
+    priority: Optional[Literal['interactive', 'batch']] = None
+    # POST results here when the job finishes (or every callback_chunk_size results)
+    callback_url: Optional[str] = None
+    callback_chunk_size: Optional[int] = None
 
 class BusinessResult(BaseModel):
     name: str
@@ -51,6 +104,34 @@ class SearchResponse(BaseModel):
     total_results: int
     message: str
 
+def build_business_rows(results, query):
+    """Raw extractor dicts as BusinessResult-shaped dicts, built once in their final form"""
+    # Trusted path: no per-row model, FastAPI doesn't validate them again
+    return [
+        {
+            'name': result.get('name') or 'Unknown Business',
+            'address': result.get('address') or 'Address not found',
+            'rating': result.get('rating'),
+            'review_count': result.get('review_count'),
+            'category': result.get('category') or 'Unknown Category',
+            'website': result.get('website'),
+            'mobile': result.get('mobile'),
+            'email': result.get('email'),
+            'secondary_email': result.get('secondary_email'),
+            'google_maps_url': result.get('google_maps_url') or '',
+            'search_query': result.get('search_query') or query,
+            'website_visited': bool(result.get('website_visited', False)),
+            'additional_contacts': result.get('additional_contacts') or ''
+        }
+        for result in results or []
+        if result  # Skip None results
+    ]
+
+def serialize_business(result, query):
+    """One raw result as a BusinessResult dict for streaming"""
+    rows = build_business_rows([result], query)
+    return rows[0] if rows else None
+
 # Basic endpoints
 @app.get("/")
 async def root():
@@ -132,7 +213,7 @@ async def test_chrome():
         }
 
 @app.post("/scrape", response_model=SearchResponse)
-async def scrape_google_maps(request: SearchRequest):
+async def scrape_google_maps(request: SearchRequest, http_request: Request):
     """
     Scrape Google Maps for business information
     """
@@ -140,62 +221,138 @@ async def scrape_google_maps(request: SearchRequest):
         print(f"🔍 Received scraping request: {request.query}")
         print(f"📊 Max results: {request.max_results}, Visit websites: {request.visit_websites}")
         
-        # Import the scraper class here to avoid startup issues
-        from main import AdvancedContactExtractor
-        
-        # Create extractor instance
-        print("🚀 Initializing Google Maps extractor...")
-        extractor = AdvancedContactExtractor(
-            search_query=request.query,
-            max_results=request.max_results,
-            visit_websites=request.visit_websites
-        )
-        
-        # Run extraction
-        print("Starting extraction process...")
-        results = extractor.run_extraction()
+        # Run extraction on the job executor without blocking the event loop
+        job = job_manager.submit(request.query, request.max_results, request.visit_websites, request.use_cache,
+                                 request.priority, request_tenant(http_request))
+        results = await asyncio.wrap_future(job.future)
+        if job.status == 'failed':
+            raise Exception(job.error)
         print(f"Extraction completed. Results type: {type(results)}")
         
         if results and isinstance(results, list):
-            # Convert results to BusinessResult objects
-            business_results = []
-            for result in results:
-                if result:  # Skip None results
-                    business_result = BusinessResult(
-                        name=result.get('name', 'Unknown Business'),
-                        address=result.get('address', 'Address not found'),
-                        rating=result.get('rating'),
-                        review_count=result.get('review_count'),
-                        category=result.get('category', 'Unknown Category'),
-                        website=result.get('website'),
-                        mobile=result.get('mobile'),
-                        email=result.get('email'),
-                        secondary_email=result.get('secondary_email'),
-                        google_maps_url=result.get('google_maps_url', ''),
-                        search_query=result.get('search_query', request.query),
-                        website_visited=result.get('website_visited', False),
-                        additional_contacts=result.get('additional_contacts', '')
-                    )
-                    business_results.append(business_result)
-            
-            return SearchResponse(
-                success=True,
-                data=business_results,
-                total_results=len(business_results),
-                message=f"Successfully scraped {len(business_results)} businesses"
+            rows = build_business_rows(results, request.query)
+            return search_response(
+                rows,
+                f"Successfully scraped {len(rows)} businesses" + (" (cached)" if job.cached else ""),
+                success=True
             )
         else:
-            return SearchResponse(
-                success=False,
-                data=[],
-                total_results=0,
-                message="No results found or extraction failed"
-            )
+            return search_response([], "No results found or extraction failed")
             
+    except QueueFullError:
+        raise
     except Exception as e:
         print(f"Scraping error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
 
+@app.post("/scrape/stream")
+async def scrape_google_maps_stream(request: SearchRequest, http_request: Request, format: Optional[str] = None):
+    """
+    Stream businesses as they are extracted (NDJSON by default, SSE with
+    ?format=sse or Accept: text/event-stream), then a summary event
+    """
+    job = job_manager.submit(request.query, request.max_results, request.visit_websites, request.use_cache,
+                             request.priority, request_tenant(http_request))
+    sse = wants_sse(format, http_request.headers.get('accept'))
+    return StreamingResponse(
+        stream_job(job, serialize_business, sse=sse),
+        media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+        # Stop nginx-style proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_scrape_job(request: SearchRequest, http_request: Request):
+    """Start a scrape in the background and return its job ID immediately"""
+    if request.callback_url:
+        try:
+            validate_callback_url(request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job = job_manager.submit(request.query, request.max_results, request.visit_websites, request.use_cache,
+                             request.priority, request_tenant(http_request))
+    if request.callback_url:
+        JobWebhook(webhook_sender, job, request.callback_url, request.callback_chunk_size,
+                   lambda result: serialize_business(result, request.query)).attach()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "results_url": f"/jobs/{job.id}/results",
+        "deliveries_url": f"/jobs/{job.id}/deliveries" if request.callback_url else None
+    }
+
+@app.get("/queue")
+async def queue_stats():
+    """Worker slots, queue depth and wait times of the scrape executor"""
+    return job_manager.stats()
+
+@app.get("/cache")
+async def cache_stats():
+    """Result cache size and hit/miss counters"""
+    return job_manager.cache_stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: phase latency histograms, selector hits, queue and driver gauges"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/jobs/{job_id}")
+async def get_scrape_job(job_id: str):
+    """Job status, progress and the results extracted so far"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job.to_dict(include_results=True))
+
+@app.get("/jobs/{job_id}/deliveries")
+async def get_scrape_job_deliveries(job_id: str):
+    """Webhook delivery log of a job: every attempt with its status code or error"""
+    return {"job_id": job_id, "deliveries": webhook_sender.log(job_id)}
+
+
+@app.get("/jobs/{job_id}/results", response_model=SearchResponse)
+async def get_scrape_job_results(job_id: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                                 fields: Optional[str] = None):
+    """
+    Final results of a finished job. With cursor/limit/fields the results
+    are paged from the job store in rank order; follow next_cursor until it is null
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}")
+    if job.status != 'failed' and (cursor or limit or fields):
+        return await get_scrape_job_results_page(job, cursor, limit or 100, fields)
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=f"Scraping failed: {job.error}")
+
+    rows = build_business_rows(job.snapshot_results(), job.query)
+    return search_response(
+        rows,
+        f"Successfully scraped {len(rows)} businesses" if rows else "No results found or extraction failed"
+    )
+
+async def get_scrape_job_results_page(job, cursor, limit, fields):
+    """One page of stored results, optionally projected to some fields"""
+    try:
+        selected = select_fields(fields)
+        results, next_cursor = await asyncio.to_thread(job_manager.results_page, job, cursor, limit)
+    except (ValueError, InvalidCursorError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = project_rows(build_business_rows(results, job.query), selected)
+    return FastJSONResponse({
+        "success": True,
+        "job_id": job.id,
+        "data": rows,
+        "count": len(rows),
+        "total_results": len(job.results),
+        "next_cursor": next_cursor,
+        "message": f"Returned {len(rows)} of {len(job.results)} businesses"
+    })
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Async DB Pool - The contact database for async endpoints
+Key points:
+- AsyncMySQLPool talks to MySQL over aiomysql: a query waits on the event
+  loop, not in one of FastAPI's ~40 threadpool threads, so slow contact
+  queries can't starve the Chrome endpoints and thousands of requests can
+  wait on DB_POOL_SIZE connections at once
+- Same limits as db_pool.ConnectionPool: DB_POOL_TIMEOUT to get a
+  connection (PoolTimeoutError, 503), MAX_EXECUTION_TIME per query
+  (QueryTimeoutError, 504), idle connections pinged after
+  DB_HEALTH_CHECK_INTERVAL and replaced if dead, and unbuffered streams
+- ThreadedPool is the fallback (SQLite stand-in for tests and development,
+  or MySQL without aiomysql installed): the sync pool behind the same
+  async methods, run on its own threads, one per connection
+- A connection whose query was cancelled (the client went away) is closed
+  instead of returned, since it may still have a result in flight
+"""
+
+import asyncio
+import functools
+import importlib.util
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+
+from db_pool import (DB_HEALTH_CHECK_INTERVAL, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_QUERY_TIMEOUT, DB_STREAM_BATCH,
+                     DB_STREAM_TIMEOUT, DEFAULT_CONTACTS_DB, ER_QUERY_TIMEOUT, POOL_IN_USE, POOL_OPEN,
+                     POOL_REPLACED, POOL_TIMEOUTS, POOL_WAIT_SECONDS, QUERY_SECONDS, QUERY_TIMEOUTS,
+                     PoolTimeoutError, QueryTimeoutError, mysql_settings, open_pool)
+
+
+async def open_async_pool(database, url=None, **kwargs):
+    """Async pool for one database on the CONTACTS_DB server (see db_pool.open_pool)"""
+    url = url or DEFAULT_CONTACTS_DB
+    if url.startswith('mysql://'):
+        if importlib.util.find_spec('aiomysql'):
+            pool = AsyncMySQLPool(database, **mysql_settings(url), **kwargs)
+            await pool.start()
+            return pool
+        print(f"⚠️ aiomysql not installed (pip install aiomysql): '{database}' queries run on a thread pool")
+    return ThreadedPool(open_pool(database, url, **kwargs))
+
+
+class AsyncMySQLPool:
+    def __init__(self, database, host='127.0.0.1', port=3306, user='root', password='root', size=DB_POOL_SIZE,
+                 checkout_timeout=DB_POOL_TIMEOUT, query_timeout=DB_QUERY_TIMEOUT,
+                 health_check_interval=DB_HEALTH_CHECK_INTERVAL):
+        self.name = database
+        self.database = database
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.query_timeout = query_timeout
+        self.health_check_interval = health_check_interval
+
+        self._aiomysql = None
+        self._pool = None
+        self._in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.replaced = 0
+
+    async def start(self):
+        """Create the aiomysql pool; connections open on first use, so a database that is down doesn't fail this"""
+        import aiomysql
+        self._aiomysql = aiomysql
+        self._pool = await aiomysql.create_pool(
+            host=self.host, port=self.port, user=self.user, password=self.password, db=self.database,
+            minsize=0, maxsize=self.size, autocommit=True, init_command=self._timeout_sql(self.query_timeout))
+
+    def _timeout_sql(self, seconds):
+        return f"SET SESSION MAX_EXECUTION_TIME = {int((seconds or 0) * 1000)}"
+
+    def _is_timeout(self, error):
+        return bool(getattr(error, 'args', None)) and error.args[0] == ER_QUERY_TIMEOUT
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a connection for the block; it goes back to the pool afterwards"""
+        conn = await self._checkout()
+        reusable = False
+        try:
+            yield conn
+            reusable = True
+        except Exception:
+            # The server may have dropped it mid-query; only keep it if it still answers
+            reusable = await self._ping(conn)
+            raise
+        finally:
+            self._checkin(conn, reusable)
+
+    async def _checkout(self):
+        start = time.monotonic()
+        while True:
+            try:
+                conn = await asyncio.wait_for(self._pool.acquire(), self.checkout_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                POOL_TIMEOUTS.inc(pool=self.name)
+                raise PoolTimeoutError(f"All {self.size} '{self.name}' connections busy for "
+                                       f"{self.checkout_timeout}s") from None
+            idle = asyncio.get_running_loop().time() - conn.last_usage
+            if idle <= self.health_check_interval or await self._ping(conn):
+                break
+            print(f"⚠️ Replacing dead '{self.name}' database connection")
+            self.replaced += 1
+            POOL_REPLACED.inc(pool=self.name)
+            conn.close()
+            self._pool.release(conn)
+        self._in_use += 1
+        self.checkouts += 1
+        self._update_gauges()
+        POOL_WAIT_SECONDS.observe(time.monotonic() - start, pool=self.name)
+        return conn
+
+    def _checkin(self, conn, reusable):
+        self._in_use -= 1
+        if not reusable:
+            conn.close()
+        self._pool.release(conn)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        POOL_IN_USE.set(self._in_use, pool=self.name)
+        POOL_OPEN.set(self._pool.size, pool=self.name)
+
+    async def _ping(self, conn):
+        try:
+            await conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    async def query(self, sql, params=()):
+        """All rows of a query as dicts (raises PoolTimeoutError, QueryTimeoutError)"""
+        async with self.connection() as conn:
+            with QUERY_SECONDS.time(pool=self.name):
+                try:
+                    async with conn.cursor(self._aiomysql.DictCursor) as cursor:
+                        await cursor.execute(sql, params)
+                        return list(await cursor.fetchall())
+                except Exception as e:
+                    if self._is_timeout(e):
+                        QUERY_TIMEOUTS.inc(pool=self.name)
+                        raise QueryTimeoutError(f"Query on '{self.name}' ran past {self.query_timeout}s") from e
+                    raise
+
+    async def query_one(self, sql, params=()):
+        rows = await self.query(sql, params)
+        return rows[0] if rows else None
+
+    async def stream(self, sql, params=(), batch_size=DB_STREAM_BATCH, timeout=DB_STREAM_TIMEOUT):
+        """Batches of rows as dicts, holding one connection until the result is read or the generator closed"""
+        conn = await self._checkout()
+        finished = False
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(self._timeout_sql(timeout))
+            # Unbuffered: rows stay on the server until fetched
+            cursor = await conn.cursor(self._aiomysql.SSDictCursor)
+            await cursor.execute(sql, params)
+            while True:
+                rows = await cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+            await cursor.close()
+            async with conn.cursor() as cursor:
+                await cursor.execute(self._timeout_sql(self.query_timeout))
+            finished = True
+        except Exception as e:
+            if self._is_timeout(e):
+                QUERY_TIMEOUTS.inc(pool=self.name)
+                raise QueryTimeoutError(f"Stream on '{self.name}' ran past {timeout}s") from e
+            raise
+        finally:
+            # An abandoned stream leaves unread rows on the connection: close it rather than reuse it
+            self._checkin(conn, finished)
+
+    async def health(self):
+        """Stats plus whether a connection can be borrowed and answers"""
+        try:
+            async with self.connection() as conn:
+                await conn.ping(reconnect=False)
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+        stats = self.stats()
+        stats.update(healthy=healthy, error=error)
+        return stats
+
+    def stats(self):
+        return {
+            'pool': self.name,
+            'size': self.size,
+            'open': self._pool.size,
+            'in_use': self._in_use,
+            'idle': self._pool.freesize,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'replaced': self.replaced,
+        }
+
+    async def close(self):
+        """Close idle connections and wait for borrowed ones to come back"""
+        self._pool.close()
+        await self._pool.wait_closed()
+
+
+def _close_after(fetch, batches):
+    """Close a sync stream once the fetch in flight (if any) is done with it"""
+    if fetch is not None:
+        wait([fetch])
+    batches.close()
+
+
+class ThreadedPool:
+    """A sync ConnectionPool behind AsyncMySQLPool's methods, on its own threads"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.name = pool.name
+        self.size = pool.size
+        # One thread per connection: more could only wait for a checkout, and none come from FastAPI's threadpool
+        self._executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix=f"db-{pool.name}")
+
+    async def _run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def query(self, sql, params=()):
+        return await self._run(self.pool.query, sql, params)
+
+    async def query_one(self, sql, params=()):
+        return await self._run(self.pool.query_one, sql, params)
+
+    async def stream(self, sql, params=(), batch_size=DB_STREAM_BATCH, timeout=DB_STREAM_TIMEOUT):
+        batches = self.pool.stream(sql, params, batch_size, timeout)
+        fetch = None
+        try:
+            while True:
+                fetch = self._executor.submit(next, batches, None)
+                rows = await asyncio.wrap_future(fetch)
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            # Even when cancelled: the connection goes back (or is closed, if rows were left unread)
+            await asyncio.shield(asyncio.wrap_future(self._executor.submit(_close_after, fetch, batches)))
+
+    async def health(self):
+        return await self._run(self.pool.health)
+
+    def stats(self):
+        return self.pool.stats()
+
+    async def close(self):
+        self.pool.close()
+        self._executor.shutdown(wait=False)
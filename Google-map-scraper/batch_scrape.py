@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Batch Scrape - Many queries at once, with each place extracted only once
+Key points:
+- A batch of (category x city) queries runs on the shared executor as batch
+  priority work, one query per slot, so it uses the whole pool without
+  starving interactive requests
+- Places are deduplicated by Google place ID across the whole batch: the
+  first query to reach a place claims it, every other query just records
+  the membership and skips the detail page load
+- Queries answered by the result cache don't load any pages at all
+- Results come back as one place table plus, per query, the place IDs it
+  matched in rank order
+"""
+
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from fair_queue import DEFAULT_TENANT
+from metrics import REGISTRY
+from result_cache import cache_key, normalize_query
+from scrape_jobs import MAX_FINISHED_JOBS, scrape_profile
+
+
+MAX_BATCH_QUERIES = 200
+
+DUPLICATES_SKIPPED = REGISTRY.counter(
+    'scrape_batch_duplicates_skipped_total',
+    'Detail pages not loaded because another query in the batch had the place')
+
+# The feature ID in place URLs: ...!1s0x89c259a61c75684f:0x79d31adb123348d2!...
+_FEATURE_ID = re.compile(r'!1s(0x[0-9a-f]+:0x[0-9a-f]+)', re.IGNORECASE)
+_PLACE_PATH = re.compile(r'/maps/place/([^/?]+)')
+
+
+def place_id(url):
+    """Stable ID of a place from its Google Maps URL (URLs differ per search)"""
+    if not url:
+        return None
+    match = _FEATURE_ID.search(url)
+    if match:
+        return match.group(1).lower()
+    match = _PLACE_PATH.search(url)
+    if match:
+        return match.group(1)
+    return url.split('?')[0]
+
+
+class BatchScrape:
+    def __init__(self, queries, max_results=20, visit_websites=False, tenant=DEFAULT_TENANT):
+        self.id = uuid.uuid4().hex
+        self.max_results = max_results
+        self.visit_websites = visit_websites
+        self.tenant = tenant
+        self.created_at = datetime.now()
+        self.finished_at = None
+
+        self.queries = [
+            {'query': q, 'status': 'queued', 'cached': False, 'links_found': 0, 'processed': 0,
+             'place_ids': [], 'error': None}
+            for q in queries
+        ]
+        # place ID -> business (None while the claiming query is still extracting it)
+        self.places = OrderedDict()
+        self._owners = {}
+        self.page_loads = 0
+        self.duplicates_skipped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return all(q['status'] in ('completed', 'failed') for q in self.queries)
+
+    def claim(self, index, link):
+        """Called by the scraper before loading a detail page: True if this query should load it"""
+        pid = place_id(link)
+        with self._lock:
+            self._add_member(index, pid)
+            if pid in self.places:
+                self.duplicates_skipped += 1
+                DUPLICATES_SKIPPED.inc()
+                return False
+            self.places[pid] = None
+            self._owners[pid] = index
+            self.page_loads += 1
+            return True
+
+    def add_result(self, index, result):
+        """Store a business under its place ID (final, enriched copies replace earlier ones)"""
+        pid = place_id(result.get('google_maps_url'))
+        if not pid:
+            return
+        with self._lock:
+            self._add_member(index, pid)
+            owner = self._owners.setdefault(pid, index)
+            if owner == index or self.places.get(pid) is None:
+                self.places[pid] = result
+
+    def _add_member(self, index, pid):
+        members = self.queries[index]['place_ids']
+        if pid not in members:
+            members.append(pid)
+
+    def handle_event(self, index, event, payload):
+        """Progress callback for one query's scrape"""
+        entry = self.queries[index]
+        if event == 'result':
+            self.add_result(index, payload['result'])
+        elif event == 'links':
+            entry['links_found'] = payload.get('links_found', 0)
+        elif event == 'progress':
+            entry['processed'] = payload.get('processed', 0)
+
+    def to_dict(self, serialize_result=None):
+        with self._lock:
+            places = {pid: r for pid, r in self.places.items() if r}
+            queries = [
+                {'query': q['query'], 'status': q['status'], 'cached': q['cached'],
+                 'links_found': q['links_found'], 'processed': q['processed'], 'error': q['error'],
+                 # Places claimed by a query whose extraction failed have no data
+                 'place_ids': [pid for pid in q['place_ids'] if pid in places]}
+                for q in self.queries
+            ]
+            page_loads, skipped = self.page_loads, self.duplicates_skipped
+        if serialize_result:
+            places = {pid: serialize_result(r) for pid, r in places.items()}
+        return {
+            'batch_id': self.id,
+            'status': 'completed' if self.finished else 'running',
+            'total_queries': len(queries),
+            'completed_queries': sum(1 for q in queries if q['status'] in ('completed', 'failed')),
+            'total_places': len(places),
+            'page_loads': page_loads,
+            'duplicates_skipped': skipped,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'queries': queries,
+            'places': places,
+        }
+
+
+class BatchManager:
+    """Runs batches on a JobManager's executor, scrape function and result cache"""
+
+    def __init__(self, job_manager):
+        self.job_manager = job_manager
+        self.batches = {}
+        self._lock = threading.Lock()
+
+    def submit(self, queries, max_results=20, visit_websites=False, tenant=DEFAULT_TENANT):
+        """Queue every query of a batch (raises QueueFullError when the batch lane is full)"""
+        unique = OrderedDict()
+        for query in queries:
+            if query.strip():
+                unique.setdefault(normalize_query(query), query.strip())
+        unique = list(unique.values())
+        if not unique:
+            raise ValueError("No queries given")
+        if len(unique) > MAX_BATCH_QUERIES:
+            raise ValueError(f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+        batch = BatchScrape(unique, max_results, visit_websites, tenant)
+        # Admitted (or rejected) as a whole, in the batch lane: interactive scrapes keep their queue
+        self.job_manager.executor.submit_batch([(self._run_query, batch, index) for index in range(len(unique))],
+                                               tenant=tenant, cost=max_results)
+        with self._lock:
+            self.batches[batch.id] = batch
+            self._prune()
+        print(f"📦 Queued batch {batch.id} with {len(unique)} queries")
+        return batch
+
+    def get(self, batch_id):
+        with self._lock:
+            return self.batches.get(batch_id)
+
+    def _run_query(self, batch, index):
+        entry = batch.queries[index]
+        entry['status'] = 'running'
+        key = cache_key(entry['query'], scrape_profile(batch.visit_websites))
+        cached = self.job_manager.cache.get(key, batch.max_results)
+        try:
+            if cached and cached.covers:
+                entry['cached'] = True
+                for result in cached.results:
+                    batch.add_result(index, result)
+            else:
+                results = self.job_manager.scrape_fn(
+                    entry['query'], batch.max_results, batch.visit_websites,
+                    progress_callback=lambda event, payload: batch.handle_event(index, event, payload),
+                    claim_link=lambda link: batch.claim(index, link)
+                )
+                for result in results or []:
+                    if result:
+                        batch.add_result(index, result)
+            entry['status'] = 'completed'
+        except Exception as e:
+            entry['status'] = 'failed'
+            entry['error'] = str(e)
+            print(f"❌ Batch {batch.id} query '{entry['query']}' failed: {e}")
+
+        with batch._lock:
+            done = batch.finished and batch.finished_at is None
+            if done:
+                batch.finished_at = datetime.now()
+        if done:
+            print(f"✅ Batch {batch.id} completed: {len(batch.places)} places, "
+                  f"{batch.duplicates_skipped} duplicate page loads skipped")
+
+    def _prune(self):
+        """Drop the oldest finished batches beyond MAX_FINISHED_JOBS"""
+        finished = sorted((b for b in self.batches.values() if b.finished_at), key=lambda b: b.finished_at)
+        for batch in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.batches[batch.id]
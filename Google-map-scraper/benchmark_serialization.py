@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: response serialization for large result sets
+Compares the old path (a validated BusinessResult per row, then FastAPI's
+response_model validation and JSON encoding) with the trusted-row path
+(plain dicts in their final shape, encoded with orjson when installed)
+"""
+
+import json
+import time
+
+from pydantic import TypeAdapter
+
+import fast_json
+from simple_app import BusinessResult, SearchResponse, build_business_rows
+
+
+def make_results(count):
+    """Raw scraper dicts like the optimized scraper produces"""
+    return [
+        {
+            'name': f'Cafe {i}',
+            'address': f'{i} Fraser Road, Patna, Bihar 800001',
+            'rating': 4.3,
+            'category': 'Coffee shop',
+            'website': f'https://cafe{i}.example.com',
+            'mobile': '+91 98765 43210',
+            'email': f'hello@cafe{i}.example.com',
+            'google_maps_url': f'https://www.google.com/maps/place/cafe-{i}',
+            'search_query': 'cafes in Patna',
+            'website_visited': True,
+            'additional_contacts': 'Emails: owner@cafe.example.com',
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_path(results, query):
+    """What /scrape did before: model per row, then FastAPI re-validates and encodes"""
+    business_results = [
+        BusinessResult(
+            name=result.get('name', ''),
+            address=result.get('address', ''),
+            rating=result.get('rating'),
+            review_count=result.get('review_count'),
+            category=result.get('category', ''),
+            website=result.get('website'),
+            mobile=result.get('mobile'),
+            email=result.get('email'),
+            secondary_email=result.get('secondary_email'),
+            google_maps_url=result.get('google_maps_url', ''),
+            search_query=query,
+            website_visited=result.get('website_visited', False),
+            additional_contacts=result.get('additional_contacts', '')
+        )
+        for result in results
+    ]
+    response = SearchResponse(success=True, data=business_results,
+                              total_results=len(business_results), message='ok')
+
+    # FastAPI's serialize_response: dump, validate against response_model, dump as JSON
+    adapter = TypeAdapter(SearchResponse)
+    validated = adapter.validate_python(response.model_dump())
+    content = adapter.dump_python(validated, mode='json')
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def fast_path(results, query):
+    rows = build_business_rows(results, query)
+    return fast_json.search_response(rows, 'ok', success=True).body
+
+
+def timed(fn, *args, repeat=5):
+    """Best of `repeat` runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    encoder = 'orjson' if fast_json.orjson else 'json'
+    print(f"📊 Serialization benchmark (fast path encoder: {encoder})")
+    print("=" * 60)
+    for count in (1000, 10000):
+        results = make_results(count)
+        assert json.loads(legacy_path(results, 'q')) == json.loads(fast_path(results, 'q'))
+
+        legacy_ms = timed(legacy_path, results, 'cafes in Patna')
+        fast_ms = timed(fast_path, results, 'cafes in Patna')
+        print(f"{count:>6} rows | legacy {legacy_ms:8.1f} ms | fast {fast_ms:7.1f} ms | {legacy_ms / fast_ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
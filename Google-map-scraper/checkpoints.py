@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Checkpoints - Durable progress of running scrapes, so they survive restarts
+Key points:
+- Each running job records its harvested link list, which links are done
+  and what they produced, in a SQLite file (CHECKPOINT_PATH)
+- After a crash, deploy or OOM kill the job resumes from its checkpoint:
+  no new search or scrolling, and finished links are not visited again
+- The harvest covers the whole job, so the slices of a large job share
+  one search instead of each scrolling for its larger target
+- Checkpoints are deleted once the job completes; ones left behind belong
+  to jobs that were interrupted or failed and are picked up on the next start
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CHECKPOINT_PATH = os.environ.get(
+    'CHECKPOINT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'checkpoints.db')
+)
+# A job that keeps killing its process is given up on after this many resumes
+MAX_RESUMES = 3
+
+
+class CheckpointStore:
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                checkpoint_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                links TEXT,
+                links_target INTEGER NOT NULL DEFAULT 0,
+                resumes INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoint_links (
+                checkpoint_id TEXT NOT NULL,
+                link TEXT NOT NULL,
+                data TEXT,
+                PRIMARY KEY (checkpoint_id, link)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def open(self, checkpoint_id, params=None):
+        """Checkpoint handle for a job, created on first use"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO checkpoints (checkpoint_id, params, updated_at) VALUES (?, ?, ?)",
+                (checkpoint_id, json.dumps(params or {}), time.time())
+            )
+            self._conn.commit()
+        return Checkpoint(self, checkpoint_id, (params or {}).get('max_results', 0))
+
+    def load(self, checkpoint_id):
+        """(links, links_target, {link: result or None}) recorded so far"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT links, links_target FROM checkpoints WHERE checkpoint_id = ?", (checkpoint_id,)
+            ).fetchone()
+            done = self._conn.execute(
+                "SELECT link, data FROM checkpoint_links WHERE checkpoint_id = ?", (checkpoint_id,)
+            ).fetchall()
+        links = json.loads(row[0]) if row and row[0] else None
+        return links, row[1] if row else 0, {link: json.loads(data) if data else None for link, data in done}
+
+    def save_links(self, checkpoint_id, links, target):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE checkpoints SET links = ?, links_target = ?, updated_at = ? WHERE checkpoint_id = ?",
+                (json.dumps(list(links)), target, time.time(), checkpoint_id)
+            )
+            self._conn.commit()
+
+    def mark_done(self, checkpoint_id, link, result):
+        """Record a visited link; result None means the extraction failed"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_links (checkpoint_id, link, data) VALUES (?, ?, ?)",
+                (checkpoint_id, link, json.dumps(result, default=str) if result else None)
+            )
+            self._conn.execute("UPDATE checkpoints SET updated_at = ? WHERE checkpoint_id = ?",
+                               (time.time(), checkpoint_id))
+            self._conn.commit()
+
+    def delete(self, checkpoint_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoint_links WHERE checkpoint_id = ?", (checkpoint_id,))
+            self._conn.execute("DELETE FROM checkpoints WHERE checkpoint_id = ?", (checkpoint_id,))
+            self._conn.commit()
+
+    def claim_interrupted(self):
+        """(checkpoint_id, params) of interrupted jobs to resume, dropping those resumed too often"""
+        with self._lock:
+            rows = self._conn.execute("SELECT checkpoint_id, params, resumes FROM checkpoints").fetchall()
+            resumable = []
+            for checkpoint_id, params, resumes in rows:
+                if resumes >= MAX_RESUMES:
+                    print(f"⚠️ Giving up on checkpoint {checkpoint_id} after {resumes} resumes")
+                    self._conn.execute("DELETE FROM checkpoint_links WHERE checkpoint_id = ?", (checkpoint_id,))
+                    self._conn.execute("DELETE FROM checkpoints WHERE checkpoint_id = ?", (checkpoint_id,))
+                    continue
+                self._conn.execute("UPDATE checkpoints SET resumes = resumes + 1 WHERE checkpoint_id = ?",
+                                   (checkpoint_id,))
+                resumable.append((checkpoint_id, json.loads(params)))
+            self._conn.commit()
+        return resumable
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Checkpoint:
+    """One job's checkpoint, as handed to the scraper"""
+
+    def __init__(self, store, checkpoint_id, harvest_target=0):
+        self.store = store
+        self.id = checkpoint_id
+        # Links to harvest: the whole job's max_results, even when a slice asks for fewer
+        self.harvest_target = harvest_target
+
+    def links_for(self, target):
+        """Harvested links, if a harvest of at least `target` links was recorded"""
+        links, links_target, _ = self.store.load(self.id)
+        # A harvest that came up short means the search was exhausted; it still covers `target`
+        if links is None or (links_target < target and len(links) >= links_target):
+            return None
+        return links[:target]
+
+    def completed(self):
+        """{link: result or None} for links already visited"""
+        return self.store.load(self.id)[2]
+
+    def save_links(self, links, target):
+        self.store.save_links(self.id, links, target)
+
+    def mark_done(self, link, result):
+        self.store.mark_done(self.id, link, result)
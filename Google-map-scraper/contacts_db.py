@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Contacts DB - Queries behind main.py's contact endpoints
+Key points:
+- Location filters compare the indexed lower-case columns added by
+  contacts_schema.py against normalized input, instead of evaluating
+  LOWER() on every row
+- A category keyword is matched against the small contact_categories table
+  and joined to rows through contact_category_links, instead of three
+  LIKE '%kw%' scans over the whole contact table
+- Large results are read in keyset pages (`row_id > after ORDER BY row_id
+  LIMIT n`) or streamed as NDJSON/CSV a fetchmany batch at a time, so memory
+  stays flat however many rows match
+- Each query keeps one row per contact_key (the first by row_id) and
+  skips rows without a name, email or mobile, so repeats never leave the
+  database and every endpoint shares the same deduplication
+- The *_async variants run the same queries on an async_db_pool pool, for
+  main.py's async handlers
+"""
+
+import csv
+import io
+
+from contacts_schema import INDIA_TABLE, LINKEDIN_TABLE, STATE_TABLE
+from fast_json import dumps
+
+
+MAX_PAGE_SIZE = 1000
+# contact_key of a row with no name, email or mobile
+EMPTY_CONTACT_KEY = '||'
+EXPORT_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Response field -> table column, per endpoint
+LINKEDIN_FIELDS = {'name': 'Name', 'email': 'Email_Id', 'mobile': 'Mobile_No.', 'city': 'City_1'}
+LINKED_DATA_FIELDS = {
+    'name': 'Name', 'email': 'Email_Id', 'mobile': 'Mobile_No.', 'city': 'City_1', 'country': 'country',
+    'category': 'Category2', 'state': 'admin_name', 'address': 'Address',
+}
+
+
+def normalize(value):
+    """The form stored in the *_norm columns"""
+    return value.strip().lower()
+
+
+def distinct_contacts(table, conditions, params):
+    """SELECT of the first row (by row_id) of each contact_key matching every condition
+
+    Conditions name the row as `{a}`. A row is kept unless an earlier matching row has its key, which
+    the (contact_key, row_id) index answers per row: keyset pages and export batches stop at their
+    LIMIT instead of grouping every match first.
+    """
+    outer = ''.join(f" AND {condition.format(a='d')}" for condition in conditions)
+    earlier = ''.join(f" AND {condition.format(a='e')}" for condition in conditions)
+    query = (f"SELECT d.* FROM {table} d WHERE d.contact_key <> %s{outer}"
+             f" AND NOT EXISTS (SELECT 1 FROM {table} e"
+             f" WHERE e.contact_key = d.contact_key AND e.row_id < d.row_id{earlier})")
+    return query, [EMPTY_CONTACT_KEY] + list(params) + list(params)
+
+
+def build_linked_data_query(state=None, city=None, category=None, country=None):
+    """SELECT and params for /linked_data's optional filters"""
+    conditions, params = [], []
+
+    if country:
+        conditions.append("{a}.country_norm = %s")
+        params.append(normalize(country))
+
+    if state:
+        conditions.append("{a}.admin_name_norm = %s")
+        params.append(normalize(state))
+
+    if category:
+        # Substring match on the distinct category names, then their links by primary key
+        conditions.append("{a}.row_id IN (SELECT l.row_id FROM contact_category_links l WHERE l.category_id IN"
+                          " (SELECT c.id FROM contact_categories c WHERE c.name_norm LIKE %s))")
+        params.append(f"%{normalize(category)}%")
+
+    if city:
+        conditions.append("{a}.City_1 = %s")
+        params.append(city)
+
+    return distinct_contacts(INDIA_TABLE, conditions, params)
+
+
+def build_state_query(country, admin_name):
+    """SELECT and params for /linkedin/state"""
+    return distinct_contacts(STATE_TABLE, ["{a}.country = %s", "{a}.admin_name = %s"], [country, admin_name])
+
+
+def build_linkedin_query(category, city):
+    """SELECT and params for /linkedin"""
+    return distinct_contacts(LINKEDIN_TABLE, ["({a}.category1 LIKE %s OR {a}.category2 LIKE %s)", "{a}.city_1 = %s"],
+                             [f"%{category}%", f"%{category}%", city])
+
+
+def keyset(query, params, after=None, limit=None):
+    """A built query in row_id order, starting after row_id `after`"""
+    params = list(params)
+    if after is not None:
+        query += " AND d.row_id > %s"
+        params.append(after)
+    query += " ORDER BY d.row_id"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+def to_contacts(rows, fields, first_mobile=False):
+    """Contacts from already deduplicated rows"""
+    contacts = [{field: row.get(column) for field, column in fields.items()} for row in rows]
+    if first_mobile:
+        for contact in contacts:
+            contact['mobile'] = contact['mobile'].split(',')[0] if contact['mobile'] else None
+    return contacts
+
+
+def all_contacts(pool, query, params, fields, first_mobile=False):
+    """Every match in row_id order, as one list"""
+    return to_contacts(pool.query(*keyset(query, params)), fields, first_mobile)
+
+
+def _page(rows, fields, limit, first_mobile):
+    return {
+        'contacts': to_contacts(rows, fields, first_mobile),
+        'limit': limit,
+        'next_after': rows[-1]['row_id'] if len(rows) == limit else None,
+    }
+
+
+def contacts_page(pool, query, params, fields, after=None, limit=100, first_mobile=False):
+    """One keyset page, with the `after` value of the next page (None on the last one)"""
+    return _page(pool.query(*keyset(query, params, after, limit)), fields, limit, first_mobile)
+
+
+def _encoder(fields, fmt, first_mobile):
+    """Encodes an export one batch of rows at a time; the CSV header goes out with the first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(fields)
+
+    def encode(rows):
+        contacts = to_contacts(rows, fields, first_mobile)
+        if fmt != 'csv':
+            return b''.join(dumps(contact) + b'\n' for contact in contacts)
+        writer.writerows([contact[field] for field in fields] for contact in contacts)
+        chunk = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+    return encode
+
+
+def export_contacts(pool, query, params, fields, fmt='ndjson', after=None, first_mobile=False):
+    """Every matching contact as NDJSON lines or CSV, encoded one fetchmany batch at a time"""
+    encode = _encoder(fields, fmt, first_mobile)
+    sent = False
+    # Every batch is encoded and released before the next; the first chunk already means the query ran
+    for rows in pool.stream(*keyset(query, params, after)):
+        sent = True
+        yield encode(rows)
+    if not sent and fmt == 'csv':
+        yield encode([])
+
+
+# The same, awaiting an async_db_pool pool
+
+
+async def all_contacts_async(pool, query, params, fields, first_mobile=False):
+    return to_contacts(await pool.query(*keyset(query, params)), fields, first_mobile)
+
+
+async def contacts_page_async(pool, query, params, fields, after=None, limit=100, first_mobile=False):
+    return _page(await pool.query(*keyset(query, params, after, limit)), fields, limit, first_mobile)
+
+
+async def export_contacts_async(pool, query, params, fields, fmt='ndjson', after=None, first_mobile=False):
+    encode = _encoder(fields, fmt, first_mobile)
+    sent = False
+    batches = pool.stream(*keyset(query, params, after))
+    try:
+        async for rows in batches:
+            sent = True
+            yield encode(rows)
+    finally:
+        # Unlike a sync generator, an abandoned async one isn't closed as soon as it's dropped
+        await batches.aclose()
+    if not sent and fmt == 'csv':
+        yield encode([])
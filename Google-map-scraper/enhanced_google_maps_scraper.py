@@ -22,6 +22,7 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from website_enricher import enrich_with_websites
 
 
 class EnhancedGoogleMapsBusinessScraper:
@@ -789,6 +790,12 @@ class EnhancedGoogleMapsBusinessScraper:
                 delay = random.uniform(1.5, 3.5)
                 time.sleep(delay)
 
+            # Website enrichment over pooled HTTP connections
+            if self.visit_websites and results:
+                print(f"\n🌐 ENRICHING CONTACTS FROM WEBSITES")
+                enrich_with_websites(results, email_patterns=self.email_patterns)
+                self.contacts_found = sum(1 for r in results if r.get('email') or r.get('mobile'))
+
             # Enhanced final summary
             end_time = datetime.now()
             duration = end_time - start_time
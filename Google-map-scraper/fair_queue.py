@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Fair Queue - Wait queue that shares driver slots between priorities and tenants
+Key points:
+- Two priority classes: interactive (previews, small scrapes) and batch
+  (large runs); interactive gets the larger share of slots, batch still
+  gets its share whenever interactive work is waiting too
+- Within a class, tenants share slots by weight, so one client's burst
+  can't starve everyone else
+- Weighted fair queueing on virtual time: every dispatch advances its
+  class and tenant clock by cost / weight, and the lowest clock goes next
+- Costs are results to extract, so a 500-result slice "pays" for its size
+- Forced items (already admitted work) don't count against maxsize, so a
+  requeued slice or a big batch never turns interactive requests away
+"""
+
+import os
+import queue
+import threading
+from collections import deque
+
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITY_CLASSES = (INTERACTIVE, BATCH)
+CLASS_WEIGHTS = {INTERACTIVE: 8, BATCH: 1}
+DEFAULT_TENANT = 'anonymous'
+
+
+def parse_tenant_weights(value):
+    """'acme=3,beta=2' -> {'acme': 3.0, 'beta': 2.0}; unlisted tenants weigh 1"""
+    weights = {}
+    for part in (value or '').split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() and weight.strip():
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+TENANT_WEIGHTS = parse_tenant_weights(os.environ.get('TENANT_WEIGHTS', ''))
+
+
+class FairQueue:
+    """Bounded queue handing items out by weighted fair share instead of FIFO"""
+
+    def __init__(self, maxsize=0, class_weights=None, tenant_weights=None):
+        self.maxsize = maxsize
+        self.class_weights = class_weights or CLASS_WEIGHTS
+        self.tenant_weights = TENANT_WEIGHTS if tenant_weights is None else tenant_weights
+        self._cond = threading.Condition()
+        self._size = 0
+        # Waiting items that count against maxsize (forced ones don't)
+        self._admitted = 0
+        self._closed = False
+
+        # priority -> tenant -> deque of (item, cost); idle tenants are dropped
+        self._flows = {priority: {} for priority in self.class_weights}
+        self._class_time = {priority: 0.0 for priority in self.class_weights}
+        self._tenant_time = {priority: {} for priority in self.class_weights}
+        self._class_clock = 0.0
+        self._tenant_clock = {priority: 0.0 for priority in self.class_weights}
+
+    def put_nowait(self, item, priority=INTERACTIVE, tenant=DEFAULT_TENANT, cost=1, force=False):
+        """Queue an item; raises queue.Full at maxsize unless force (already admitted work)"""
+        if priority not in self._flows:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._cond:
+            if not force and self.maxsize and self._admitted >= self.maxsize:
+                raise queue.Full
+            flows = self._flows[priority]
+            if not flows:
+                # A class coming back from idle starts at the current clock, not with banked credit
+                self._class_time[priority] = max(self._class_time[priority], self._class_clock)
+            if tenant not in flows:
+                flows[tenant] = deque()
+                self._tenant_time[priority][tenant] = max(
+                    self._tenant_time[priority].get(tenant, 0.0), self._tenant_clock[priority])
+            flows[tenant].append((item, max(cost, 1), not force))
+            self._size += 1
+            self._admitted += not force
+            self._cond.notify()
+
+    def get(self):
+        """Next item by fair share; blocks while empty, returns None once closed"""
+        with self._cond:
+            while not self._size and not self._closed:
+                self._cond.wait()
+            if not self._size:
+                return None
+            return self._pop()
+
+    def _pop(self):
+        priority = min((p for p in self._flows if self._flows[p]), key=lambda p: self._class_time[p])
+        flows, times = self._flows[priority], self._tenant_time[priority]
+        tenant = min(flows, key=lambda t: times[t])
+        item, cost, admitted = flows[tenant].popleft()
+
+        self._class_clock = self._class_time[priority]
+        self._class_time[priority] += cost / self.class_weights[priority]
+        self._tenant_clock[priority] = times[tenant]
+        times[tenant] += cost / self.tenant_weights.get(tenant, 1)
+        if not flows[tenant]:
+            del flows[tenant]
+            del times[tenant]
+        self._size -= 1
+        self._admitted -= admitted
+        return item
+
+    def drain(self):
+        """Remove and return everything still waiting"""
+        with self._cond:
+            items = []
+            while self._size:
+                items.append(self._pop())
+            return items
+
+    def close(self):
+        """Wake all getters; get() returns None once the queue is empty"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def qsize(self):
+        with self._cond:
+            return self._size
+
+    def depths(self):
+        """Waiting items per priority class and per tenant"""
+        with self._cond:
+            by_class = {p: sum(len(q) for q in flows.values()) for p, flows in self._flows.items()}
+            by_tenant = {}
+            for flows in self._flows.values():
+                for tenant, q in flows.items():
+                    by_tenant[tenant] = by_tenant.get(tenant, 0) + len(q)
+        return by_class, by_tenant
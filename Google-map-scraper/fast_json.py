@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Fast JSON - Cheap serialization for large result sets
+Key points:
+- Business rows are built once, as plain dicts in their final shape, and
+  returned directly so FastAPI doesn't validate them a second time
+- orjson encodes them when installed; the standard json module otherwise
+"""
+
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up; everything works without it
+    orjson = None
+
+
+# BusinessResult fields, in response order
+BUSINESS_FIELDS = (
+    'name', 'address', 'rating', 'review_count', 'category', 'website', 'mobile', 'email',
+    'secondary_email', 'google_maps_url', 'search_query', 'website_visited', 'additional_contacts',
+)
+
+
+def select_fields(fields):
+    """Parse a comma-separated ?fields= value into BusinessResult field names"""
+    if not fields:
+        return None
+    selected = tuple(f.strip() for f in fields.split(',') if f.strip())
+    unknown = [f for f in selected if f not in BUSINESS_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def project_rows(rows, fields):
+    """Keep only the requested fields of each row"""
+    if not fields:
+        return rows
+    return [{f: row.get(f) for f in fields} for row in rows]
+
+
+def dumps(data):
+    """Encode to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def search_response(rows, message, success=None, partial=False):
+    """SearchResponse-shaped payload from already-final rows"""
+    return FastJSONResponse({
+        'success': bool(rows) if success is None else success,
+        'data': rows,
+        'total_results': len(rows),
+        'message': message,
+        'partial': partial,
+    })
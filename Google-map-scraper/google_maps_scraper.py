@@ -17,6 +17,7 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from lxml import html
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from website_enricher import enrich_with_websites
 
 
 class GoogleMapsBusinessScraper:
@@ -876,6 +877,12 @@ class GoogleMapsBusinessScraper:
                 delay = random.uniform(2, 4)
                 time.sleep(delay)
 
+            # Step 4: Visit business websites over plain HTTP (no browser)
+            if self.visit_websites and results:
+                print(f"\n🌐 STEP 4: Enriching contacts from business websites...")
+                enrich_with_websites(results, email_patterns=self.email_patterns)
+                self.contacts_found = sum(1 for r in results if r.get('email') or r.get('mobile'))
+
             # Final summary
             end_time = datetime.now()
             duration = end_time - start_time
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Host Scheduler - Per-host politeness for the website enrichment crawler
+Key points:
+- Global concurrency cap across all hosts
+- Per-host concurrency limit plus a token bucket, so requests to one host
+  are spaced while different hosts proceed in parallel
+- robots.txt fetched once per site and cached for the whole process (every
+  enrichment run shares ROBOTS_CACHE); Crawl-delay slows that host's
+  bucket down
+- robots.txt fetches take a host and a global slot like any other request
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from urllib import robotparser
+from urllib.parse import urlparse
+
+
+# Google's limit; anything beyond this is ignored
+MAX_ROBOTS_BYTES = 500 * 1024
+# Sites whose robots.txt is kept; the oldest is dropped beyond this
+MAX_ROBOTS_ENTRIES = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate, burst):
+        with self.lock:
+            self.rate = rate
+            self.capacity = burst
+            self.tokens = min(self.tokens, burst)
+
+    def acquire(self):
+        """Block until a token is available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class RobotsCache:
+    """Parsed robots.txt per site (scheme://host:port), shared by every scheduler in the process"""
+
+    def __init__(self, max_entries=MAX_ROBOTS_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def site_lock(self, site):
+        """Held while a site's robots.txt is fetched, so only one thread fetches it"""
+        with self.lock:
+            return self.locks.setdefault(site, threading.Lock())
+
+    def get(self, site, ttl):
+        with self.lock:
+            entry = self.entries.get(site)
+        if entry and time.time() - entry[1] <= ttl:
+            return entry[0]
+        return None
+
+    def put(self, site, parser):
+        with self.lock:
+            self.entries.pop(site, None)
+            self.entries[site] = (parser, time.time())
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                del self.entries[oldest]
+                self.locks.pop(oldest, None)
+
+
+ROBOTS_CACHE = RobotsCache()
+
+
+class _HostState:
+    def __init__(self, per_host_limit, rate, burst):
+        self.semaphore = threading.BoundedSemaphore(per_host_limit)
+        self.bucket = TokenBucket(rate, burst)
+        # The robots.txt whose Crawl-delay this host's bucket is set to
+        self.robots = None
+
+
+class HostScheduler:
+    def __init__(self, max_concurrency=20, per_host_limit=2, rate_per_host=1.0, burst=2,
+                 session=None, user_agent='*', respect_robots=True, robots_ttl=24 * 3600,
+                 max_crawl_delay=10.0, robots_timeout=5, robots_cache=None):
+        self.global_semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.per_host_limit = per_host_limit
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.session = session
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.robots_ttl = robots_ttl
+        self.max_crawl_delay = max_crawl_delay
+        self.robots_timeout = robots_timeout
+        self.robots_cache = robots_cache or ROBOTS_CACHE
+
+        self.hosts = {}
+        self.hosts_lock = threading.Lock()
+
+        self.requests_scheduled = 0
+        self.total_wait = 0.0
+        self.robots_blocked = 0
+
+    def _host(self, url):
+        host = (urlparse(url).hostname or '').lower()
+        with self.hosts_lock:
+            state = self.hosts.get(host)
+            if state is None:
+                state = _HostState(self.per_host_limit, self.rate_per_host, self.burst)
+                self.hosts[host] = state
+            return state
+
+    def allowed(self, url):
+        """True when robots.txt lets us fetch the URL"""
+        if not self.respect_robots or self.session is None:
+            return True
+
+        parsed = urlparse(url)
+        site = f"{parsed.scheme}://{parsed.netloc}".lower()
+        with self.robots_cache.site_lock(site):
+            robots = self.robots_cache.get(site, self.robots_ttl)
+            if robots is None:
+                robots = self._load_robots(site, url)
+                self.robots_cache.put(site, robots)
+
+        state = self._host(url)
+        if state.robots is not robots:
+            # Fetched by this or an earlier run: either way this scheduler's bucket follows its Crawl-delay
+            state.robots = robots
+            delay = robots.crawl_delay(self.user_agent)
+            if delay:
+                delay = min(float(delay), self.max_crawl_delay)
+                state.bucket.set_rate(min(self.rate_per_host, 1.0 / delay), 1)
+
+        if robots.can_fetch(self.user_agent, url):
+            return True
+        self.robots_blocked += 1
+        return False
+
+    def _load_robots(self, site, url):
+        robots_url = f"{site}/robots.txt"
+        parser = robotparser.RobotFileParser(robots_url)
+
+        try:
+            with self.slot(url), self.session.get(robots_url, timeout=self.robots_timeout,
+                                                  allow_redirects=True, stream=True) as response:
+                if response.status_code in (401, 403):
+                    parser.disallow_all = True
+                elif response.status_code >= 400:
+                    parser.allow_all = True
+                else:
+                    body = b''
+                    for chunk in response.iter_content(chunk_size=16 * 1024):
+                        body += chunk
+                        if len(body) >= MAX_ROBOTS_BYTES:
+                            break
+                    parser.parse(body[:MAX_ROBOTS_BYTES].decode('utf-8', errors='replace').splitlines())
+        except Exception:
+            # Unreachable robots.txt is treated as "no rules"
+            parser.allow_all = True
+        return parser
+
+    @contextmanager
+    def slot(self, url):
+        """Hold a per-host and a global slot for the duration of one request"""
+        state = self._host(url)
+        start = time.monotonic()
+
+        # Take the host slot first so a busy host never ties up a global slot
+        state.semaphore.acquire()
+        try:
+            state.bucket.acquire()
+            self.global_semaphore.acquire()
+            try:
+                self.requests_scheduled += 1
+                self.total_wait += time.monotonic() - start
+                yield
+            finally:
+                self.global_semaphore.release()
+        finally:
+            state.semaphore.release()
+
+    def stats(self):
+        return {
+            'hosts': len(self.hosts),
+            'requests_scheduled': self.requests_scheduled,
+            'total_wait_seconds': round(self.total_wait, 2),
+            'robots_blocked': self.robots_blocked,
+        }
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Job Store - Disk-backed results of finished scrape jobs
+Key points:
+- SQLite file with one row per business, keyed by (job_id, rank)
+- Pages are read with keyset pagination (rank > last rank), so each request
+  touches only `limit` rows no matter how large the job is
+- Cursors are opaque URL-safe tokens bound to their job
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+
+
+DEFAULT_JOB_STORE_PATH = os.environ.get(
+    'JOB_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_store.db')
+)
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursorError(ValueError):
+    """Raised for cursors that are malformed or belong to another job"""
+
+
+def encode_cursor(job_id, rank):
+    raw = json.dumps({'j': job_id, 'r': rank}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, job_id):
+    """Last rank seen, from a cursor issued for this job"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        rank = int(data['r'])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursorError("Malformed cursor")
+    if data.get('j') != job_id:
+        raise InvalidCursorError("Cursor belongs to a different job")
+    return rank
+
+
+class JobResultStore:
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, rank)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def save_results(self, job_id, results):
+        """Replace a job's stored results, keeping their order as rank"""
+        with self._lock:
+            self._conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            self._conn.executemany(
+                "INSERT INTO job_results (job_id, rank, data) VALUES (?, ?, ?)",
+                ((job_id, rank, json.dumps(result, default=str)) for rank, result in enumerate(results))
+            )
+            self._conn.commit()
+
+    def count(self, job_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+
+    def page(self, job_id, cursor=None, limit=100):
+        """One page of results in rank order, and the cursor for the next page (None at the end)"""
+        after = decode_cursor(cursor, job_id) if cursor else -1
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        with self._lock:
+            # One extra row tells us whether another page exists
+            rows = self._conn.execute(
+                "SELECT rank, data FROM job_results WHERE job_id = ? AND rank > ? ORDER BY rank LIMIT ?",
+                (job_id, after, limit + 1)
+            ).fetchall()
+
+        next_cursor = encode_cursor(job_id, rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(data) for _, data in rows[:limit]], next_cursor
+
+    def delete(self, job_ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM job_results WHERE job_id = ?", ((j,) for j in job_ids))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
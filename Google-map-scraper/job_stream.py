@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Job Stream - Incremental delivery of scrape results over one HTTP response
+Key points:
+- Replays a job's event log as NDJSON lines or Server-Sent Events
+- Each business is sent as soon as it is extracted; progress events
+  (links harvested, businesses done, rate per minute) are interleaved
+- A progress heartbeat goes out during long silences so proxies keep
+  the connection open; a final summary event closes the stream
+"""
+
+import asyncio
+import time
+
+from fast_json import dumps
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+SSE_MEDIA_TYPE = 'text/event-stream'
+
+
+def wants_sse(format=None, accept=None):
+    """Pick SSE when asked for explicitly or via the Accept header"""
+    if format:
+        return format.lower() == 'sse'
+    return SSE_MEDIA_TYPE in (accept or '')
+
+
+def encode_event(event, data, sse=False):
+    """One event as an NDJSON line or an SSE frame (bytes)"""
+    if sse:
+        return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+    return dumps({'event': event, 'data': data}) + b"\n"
+
+
+async def stream_job(job, serialize_result, sse=False, poll_interval=0.5, heartbeat=15):
+    """Yield a job's events until it finishes, ending with a summary"""
+    yield encode_event('job', {'job_id': job.id, 'query': job.query, 'status_url': f"/jobs/{job.id}"}, sse)
+
+    cursor = 0
+    last_sent = time.monotonic()
+    while True:
+        # Read the finished flag first so no event logged before it is missed
+        finished = job.finished
+        events, cursor = job.events_since(cursor)
+
+        for event, payload in events:
+            if event in ('result', 'update'):
+                payload = {'index': payload['index'], 'result': serialize_result(payload['result'], job.query)}
+            yield encode_event(event, payload, sse)
+        if events:
+            last_sent = time.monotonic()
+
+        if finished:
+            break
+        if time.monotonic() - last_sent >= heartbeat:
+            yield encode_event('progress', job.progress_snapshot(), sse)
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_interval)
+
+    yield encode_event('summary', job.summary(), sse)
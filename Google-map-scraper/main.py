@@ -1,6 +1,5 @@
-from typing import Optional
-import mysql.connector
-from mysql.connector import Error
+from typing import Literal, Optional
+import asyncio
 from pydantic import BaseModel, EmailStr
 import time
 from selenium import webdriver
@@ -20,9 +19,18 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from india_mart import search_indiamart
 from fastapi import FastAPI, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
 from fastapi import BackgroundTasks
 
+import metrics
+from async_db_pool import open_async_pool
+from contacts_db import (EXPORT_MEDIA_TYPES, LINKED_DATA_FIELDS, LINKEDIN_FIELDS, MAX_PAGE_SIZE, all_contacts_async,
+                         build_linked_data_query, build_linkedin_query, build_state_query, contacts_page_async,
+                         export_contacts_async)
+from contacts_schema import pending_migrations
+from db_pool import PoolTimeoutError, QueryTimeoutError, open_pool
+
 app = FastAPI()
 
 app.add_middleware(
@@ -33,6 +41,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Shared connection pools, one per database (CONTACTS_DB, DB_POOL_SIZE, ...); the contact
+# endpoints are async and await linkedin_db instead of holding a threadpool thread per query
+login_db = None
+linkedin_db = None
+
+@app.on_event("startup")
+async def open_db_pools():
+    global login_db, linkedin_db
+    login_db = open_pool('login')
+    linkedin_db = await open_async_pool('linkedin')
+    # Connections open on first use; a database that is down doesn't stop the Chrome endpoints
+    for health in (await asyncio.to_thread(login_db.health), await linkedin_db.health()):
+        print(f"{'✅' if health['healthy'] else '⚠️'} Database '{health['pool']}': "
+              f"{'reachable' if health['healthy'] else health['error']} (pool of {health['size']})")
+    await asyncio.to_thread(check_migrations)
+
+def check_migrations():
+    schema_db = open_pool('linkedin', size=1)
+    try:
+        pending = pending_migrations(schema_db)
+        if pending:
+            print(f"⚠️ Contact schema migrations pending: {pending}; run `python contacts_schema.py`")
+    except Exception as e:
+        print(f"⚠️ Could not check contact schema migrations: {e}")
+    finally:
+        schema_db.close()
+
+@app.on_event("shutdown")
+async def close_db_pools():
+    if login_db:
+        login_db.close()
+    if linkedin_db:
+        await linkedin_db.close()
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request, exc):
+    """Every connection is busy: shed load instead of queueing forever"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(QueryTimeoutError)
+async def query_timeout_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 class EmailInput(BaseModel):
     email: EmailStr
 
@@ -51,144 +102,16 @@ def create_driver():
 
 def get_user_from_db(username: str, password: str):
     try:
-        conn=mysql.connector.connect(
-            user='root',
-            password='root',
-            host='127.0.0.1',
-            database='login'
-        )
-
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM login WHERE username = %s AND password = %s", (username, password))
-
-        result = cursor.fetchone()
+        result = login_db.query_one("SELECT * FROM login WHERE username = %s AND password = %s", (username, password))
         print(result)
         return result
 
-    except Error as e:
-        print("MySQL Error:", e)
-        return None
-
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-def get_user_from_db4(admin_name=None, City_1=None, category_keyword=None, country=None):
-    try:
-        conn = mysql.connector.connect(
-            user='root',
-            host='127.0.0.1',
-            password='root',
-            database='linkedin'
-        )
-        cursor = conn.cursor(dictionary=True)
-
-        query = "SELECT * FROM merged_city_data_india WHERE 1=1"
-        params = []
-
-        if country:
-            query += " AND LOWER(country) = %s"
-            params.append(country.lower())
-
-        if admin_name:
-            query += " AND LOWER(admin_name) = %s"
-            params.append(admin_name.lower())
-
-        if category_keyword:
-            like_keyword = f"%{category_keyword}%"
-            query += """
-            AND (
-                category1 LIKE %s OR
-                category2 LIKE %s OR
-                category3 LIKE %s
-            )
-            """
-            params += [like_keyword] * 3
-
-        if City_1:
-            query += " AND City_1 = %s"
-            params.append(City_1)
-
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-
-        for row in result:
-            print(row)
-
-        return result
-
-    except mysql.connector.Error as e:
-        print("MySQL Error:", e)
-        return None
-
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
-
-def get_user_from_db3(country: str, admin_name: str):
-    try:
-        conn=mysql.connector.connect(
-            user='root',
-            password='root',
-            host='127.0.0.1',
-            database='linkedin'
-        )
-
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT * FROM merged_city_data WHERE country = %s AND admin_name = %s", (country, admin_name))
-        # query = "SELECT * FROM merged_city_data WHERE (category1 LIKE %s OR category2 LIKE %s) AND city_1 = %s"
-        # params = (f"%{category}%", f"%{category}%", city)
-
-
-        # cursor.execute(query, params)
-        result = cursor.fetchall()
-        for i in result:
-            print(i)
-        print(result)
-        return result
-
-    except Error as e:
-        print("MySQL Error:", e)
-        return None
-
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-def get_user_from_db2(category: str, city: str):
-    try:
-        conn=mysql.connector.connect(
-            user='root',
-            password='root',
-            host='127.0.0.1',
-            database='linkedin'
-        )
-
-        cursor = conn.cursor(dictionary=True)
-        # cursor.execute("SELECT * FROM combined_excel_data_try1 WHERE category2 = %s AND city_1 = %s", (category, city))
-        query = "SELECT * FROM combined_excel_data_try1 WHERE (category1 LIKE %s OR category2 LIKE %s) AND city_1 = %s"
-        params = (f"%{category}%", f"%{category}%", city)
-
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        for i in result:
-            print(i)
-        print(result)
-        return result
-
-    except Error as e:
+    except (PoolTimeoutError, QueryTimeoutError):
+        raise
+    except Exception as e:
         print("MySQL Error:", e)
         return None
 
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-
 def check_gmail_login(email):
     driver = create_driver()
     try:
@@ -260,124 +183,97 @@ def validate_email(email_data: EmailInput):
 def search_products(query: str = Query(...), city: str = Query("patna"), pages: int = Query(1)):
     return search_indiamart(query, city, pages)
 
+@app.get("/db/health")
+async def db_health():
+    """Connection pool usage and whether each database answers"""
+    return {"pools": [await asyncio.to_thread(login_db.health), await linkedin_db.health()]}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus metrics, including connection pool usage and query latency"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post('/login')
 async def login_check(username: str =Form(...),password:str =Form(...)):
-    user=get_user_from_db(username,password)
+    # The login pool is synchronous: wait for it on a thread, not on the event loop
+    user=await asyncio.to_thread(get_user_from_db,username,password)
     print(user)
     if user:
         return {'message': "login"}
     raise HTTPException(status_code=404,detail="invalid")
-@app.get('/linkedin')
-def get_users(category: str, city: str):
-    result = get_user_from_db2(category, city)
-    print(result)
-    if not result:
+async def list_contacts(query, params, fields, after=None, limit=None, format=None, first_mobile=False,
+                        on_contacts=None):
+    """What the contact endpoints share: a keyset page, a streamed export or the whole list"""
+    # ?after=/&limit= pages in row_id order; ?format= streams every match (not passed to on_contacts)
+    if format:
+        chunks = export_contacts_async(linkedin_db, query, params, fields, format, after, first_mobile)
+        # Run the query before answering, so pool and query timeouts still become 503/504
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = b''
+
+        async def body():
+            try:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                # A client that disconnects mid-export gives the connection back now, not at garbage collection
+                await chunks.aclose()
+        headers = {"Content-Disposition": 'attachment; filename="contacts.csv"'} if format == 'csv' else {}
+        return StreamingResponse(body(), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+    if after is not None or limit:
+        page = await contacts_page_async(linkedin_db, query, params, fields, after, limit or 100, first_mobile)
+        if page['contacts'] and on_contacts:
+            on_contacts(page['contacts'])
+        return page
+
+    # Rows come back one per contact_key: no repeats to transfer or skip here. Database errors
+    # (a missing migration, a dropped connection) surface as 500, not as "No users found"
+    contacts = await all_contacts_async(linkedin_db, query, params, fields, first_mobile)
+    print(f"📇 {len(contacts)} contacts")
+    if not contacts:
         raise HTTPException(status_code=404, detail="No users found")
-    seen=set()
-    contacts = []
-    for row in result:
-        name = row.get("Name")
-        email = row.get("Email_Id")
-        mobile = row.get("Mobile_No.")
-        city = row.get("City_1")
-        if not (name or email or mobile):
-            continue
-
-            # Create a tuple to identify duplicates
-        identifier = (name, email, mobile)
-        if identifier not in seen:
-            seen.add(identifier)
-            contacts.append({
-                "name": name,
-                "email": email,
-                "mobile": mobile,
-                "city": city
-            })
-
-    # return unique_contacts
-
+    if on_contacts:
+        on_contacts(contacts)
     return contacts
 
-    # mobile_numbers = [row.get("Mobile_No.") for row in results if row.get("Mobile_No.")]
-    # return result
-@app.get("/linkedin/state")
-def get_users1(country: str, admin_name: str):
-    result = get_user_from_db3(country, admin_name)
-    print(result)
-    if not result:
-        raise HTTPException(status_code=404, detail="No users found")
-    seen=set()
-    contacts = []
-    for row in result:
-        name = row.get("Name")
-        email = row.get("Email_Id")
-        mobile = row.get("Mobile_No.")
-        city = row.get("City_1")
-        if not (name or email or mobile):
-            continue
-
-            # Create a tuple to identify duplicates
-        identifier = (name, email, mobile)
-        if identifier not in seen:
-            seen.add(identifier)
-            contacts.append({
-                "name": name,
-                "email": email,
-                "mobile": mobile,
-                "city": city
-            })
-
-    # return unique_contacts
+@app.get('/linkedin')
+async def get_users(
+    category: str,
+    city: str,
+    after: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: Optional[Literal['ndjson', 'csv']] = None
+):
+    return await list_contacts(*build_linkedin_query(category, city), LINKEDIN_FIELDS, after, limit, format)
 
-    return contacts
+@app.get("/linkedin/state")
+async def get_users1(
+    country: str,
+    admin_name: str,
+    after: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: Optional[Literal['ndjson', 'csv']] = None
+):
+    return await list_contacts(*build_state_query(country, admin_name), LINKEDIN_FIELDS, after, limit, format)
 
 @app.get("/linked_data")
 # def get_user2(admin_name : str, City_1 : str, category_keyword : str, country :str):
-def get_user2(
+async def get_user2(
     state: Optional[str] = Query(None),
     city: Optional[str] = Query(None),
     category: Optional[str] = Query(None),
     country: Optional[str] = Query(None),
+    after: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: Optional[Literal['ndjson', 'csv']] = None,
     background_tasks: BackgroundTasks = None
 ):
-    result=get_user_from_db4(state,city, category, country)
-
-    print(result)
-    if not result:
-        raise HTTPException(status_code=404, detail="No users found")
-    seen = set()
-    contacts = []
-    for row in result:
-        name = row.get("Name")
-        email = row.get("Email_Id")
-        mobile = row.get("Mobile_No.")
-        city = row.get("City_1")
-        category = row.get("Category2")
-        state = row.get("admin_name")
-        country = row.get("country")
-        address = row.get("Address")
-        if not (name or email or mobile):
-            continue
-
-            # Create a tuple to identify duplicates
-        identifier = (name, email, mobile)
-        if identifier not in seen:
-            seen.add(identifier)
-            contacts.append({
-                "name": name,
-                "email": email,
-                "mobile": mobile.split(',')[0] if mobile else None,
-                "city": city,
-                "country": country,
-                "category": category,
-                "state": state,
-                "address": address
-            })
-    if contacts:
-        background_tasks.add_task(supabase_setup, contacts)
-    else:
-        pass
-
-    return contacts
+    # Full lists and pages are synced to Supabase; exports are not
+    return await list_contacts(*build_linked_data_query(state, city, category, country), LINKED_DATA_FIELDS,
+                         after, limit, format, first_mobile=True,
+                         on_contacts=lambda contacts: background_tasks.add_task(supabase_setup, contacts))
 
 
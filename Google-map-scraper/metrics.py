@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Metrics - Minimal Prometheus instrumentation for the scraper
+Key points:
+- Counters, gauges and histograms with labels, rendered in the Prometheus
+  text exposition format for GET /metrics
+- No client library needed; everything lives in one process-wide registry
+- Gauges can read their value from a callback at scrape time (queue depth,
+  busy drivers), so nothing has to be kept in sync by hand
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# Seconds; browser phases run from milliseconds to minutes
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        if self.callback:
+            return self.callback()
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        if self.callback:
+            try:
+                return self.header() + [f"{self.name} {_format_value(self.callback())}"]
+            except Exception:
+                return self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block took, even when it raises"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class RateWindow:
+    """Events per minute over a sliding window, for the businesses/minute gauge"""
+
+    def __init__(self, window=300):
+        self.window = window
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def mark(self):
+        with self._lock:
+            self._events.append(time.monotonic())
+
+    def per_minute(self):
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            while self._events and self._events[0] < cutoff:
+                self._events.popleft()
+            return round(len(self._events) * 60 / self.window, 2)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Modules may be re-imported (reloaders, tests); keep one series
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        gauge = self._register(Gauge(name, documentation, labelnames, callback))
+        if callback is not None:
+            # The latest owner (e.g. the app's job manager) provides the value
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+# Starlette appends the charset for text/* responses
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+# Scraper phases (Selenium)
+PHASE_SECONDS = REGISTRY.histogram(
+    'scrape_phase_seconds', 'Time spent per scraping phase', ['phase'])
+SELECTOR_HITS = REGISTRY.counter(
+    'scrape_selector_hits_total', 'Selectors that produced a value', ['field', 'selector'])
+SELECTOR_MISSES = REGISTRY.counter(
+    'scrape_selector_misses_total', 'Fields no selector could fill', ['field'])
+BUSINESSES_EXTRACTED = REGISTRY.counter(
+    'scrape_businesses_extracted_total', 'Businesses extracted from Google Maps')
+FAILURES = REGISTRY.counter(
+    'scrape_failures_total', 'Scrape failures by reason', ['reason'])
+BUSINESS_RATE = RateWindow()
+REGISTRY.gauge('scrape_businesses_per_minute', 'Businesses extracted per minute over the last 5 minutes',
+               callback=BUSINESS_RATE.per_minute)
+
+# Job executor (queue depth and busy drivers are callback gauges owned by the executor)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    'scrape_queue_wait_seconds', 'Time jobs (or job slices) waited for a free driver slot', ['priority'])
+JOBS = REGISTRY.counter(
+    'scrape_jobs_total', 'Finished scrape jobs by status', ['status'])
+JOBS_REJECTED = REGISTRY.counter(
+    'scrape_jobs_rejected_total', 'Jobs turned away because the queue was full')
+
+# Website enrichment
+WEBSITE_FETCH_SECONDS = REGISTRY.histogram(
+    'website_fetch_seconds', 'Website enrichment fetch latency', ['outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+
+
+def record_business_extracted():
+    BUSINESSES_EXTRACTED.inc()
+    BUSINESS_RATE.mark()
+
+
+def render():
+    return REGISTRY.render()
@@ -21,15 +21,38 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
+from metrics import FAILURES, PHASE_SECONDS, SELECTOR_HITS, SELECTOR_MISSES, record_business_extracted
+from time_budget import SECONDS_PER_BUSINESS
+from website_enricher import enrich_with_websites
 
 
 class OptimizedGoogleMapsScraper:
-    def __init__(self, search_query, max_results=50):
+    def __init__(self, search_query, max_results=50, visit_websites=False, progress_callback=None,
+                 skip_links=None, checkpoint=None, claim_link=None, time_budget=None):
         self.search_query = search_query
         self.max_results = max_results
+        self.visit_websites = visit_websites
+        self.progress_callback = progress_callback
+        # Businesses a previous, smaller scrape already extracted
+        self.skip_links = set(skip_links or ())
+        # Durable progress (checkpoints.Checkpoint) to resume from after a crash
+        self.checkpoint = checkpoint
+        # A sliced job harvests links for all its slices at once; this run extracts max_results of them
+        self.link_target = max(max_results, checkpoint.harvest_target if checkpoint else 0)
+        # Batch dedup: called before each detail page load, False means another query has it
+        self.claim_link = claim_link
+        # time_budget.TimeBudget: cut corners, then stop, instead of overrunning the deadline
+        self.budget = time_budget
+        self.partial = False
+        self.list_cards = {}
         self.extracted_count = 0
         self.contacts_found = 0
         
+        self.email_patterns = [
+            re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+            re.compile(r'mailto:([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,})'),
+        ]
+
         self.phone_patterns = [
             re.compile(r'\+?1?[-.]\s?\(?([0-9]{3})\)?[-.]\s?([0-9]{3})[-.]\s?([0-9]{4})'),
             re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'),
@@ -65,7 +88,12 @@ class OptimizedGoogleMapsScraper:
             'profile.default_content_settings.popups': 0
         })
 
-        self.driver = webdriver.Chrome(options=self.chrome_options)
+        try:
+            with PHASE_SECONDS.time(phase='browser_launch'):
+                self.driver = webdriver.Chrome(options=self.chrome_options)
+        except Exception:
+            FAILURES.inc(reason='browser_launch')
+            raise
         self.wait = WebDriverWait(self.driver, 20)
         print("✅ Browser setup completed")
 
@@ -76,20 +104,27 @@ class OptimizedGoogleMapsScraper:
             
             # Primary search URL
             search_url = f"https://www.google.com/maps/search/{self.search_query.replace(' ', '+')}"
-            self.driver.get(search_url)
-            time.sleep(8)
+            with PHASE_SECONDS.time(phase='search'):
+                self.driver.get(search_url)
+                time.sleep(self.budget.cap(8, 'search') if self.budget else 8)
             
             # Handle consent
-            self._handle_consent()
+            with PHASE_SECONDS.time(phase='consent'):
+                self._handle_consent()
             
             # Extract links with optimized scrolling
-            all_links = self._extract_links_optimized()
+            with PHASE_SECONDS.time(phase='harvest'):
+                all_links = self._extract_links_optimized()
+            if self.budget:
+                # Read while the list is still on screen: the fallback for places we run out of time for
+                self.list_cards = self._extract_list_cards()
             
             print(f"✅ Found {len(all_links)} business links")
-            return list(all_links)[:self.max_results]
+            return list(all_links)[:self.link_target]
             
         except Exception as e:
             print(f"❌ Search failed: {e}")
+            FAILURES.inc(reason='search')
             return []
 
     def _handle_consent(self):
@@ -103,7 +138,7 @@ class OptimizedGoogleMapsScraper:
             
             for selector in consent_buttons:
                 try:
-                    button = WebDriverWait(self.driver, 3).until(
+                    button = WebDriverWait(self.driver, self.budget.cap(3, 'search') if self.budget else 3).until(
                         EC.element_to_be_clickable((By.XPATH, selector))
                     )
                     button.click()
@@ -116,11 +151,16 @@ class OptimizedGoogleMapsScraper:
 
     def _extract_links_optimized(self):
         """Optimized link extraction with 200 scroll attempts"""
-        all_links = set()
+        all_links = {}  # Ordered, so links keep Google's ranking
         scroll_count = 0
         max_scrolls = 200  # Aggressive scrolling
         patience = 0
         max_patience = 30
+        harvest_deadline = None
+        if self.budget:
+            # Fewer scrolls: give up sooner on a list that stopped growing, and stop at the phase deadline
+            max_patience = 5
+            harvest_deadline = self.budget.phase_deadline('harvest')
         
         # Comprehensive selectors for business links
         selectors = [
@@ -131,24 +171,31 @@ class OptimizedGoogleMapsScraper:
             '//div[contains(@class, "lI9IFe")]//a[contains(@href, "/maps/place/")]'
         ]
         
-        while scroll_count < max_scrolls and len(all_links) < self.max_results:
+        while scroll_count < max_scrolls and len(all_links) < self.link_target:
+            if harvest_deadline and time.monotonic() >= harvest_deadline:
+                self._mark_partial(f"stopped scrolling at {len(all_links)} links")
+                break
             print(f"🔄 Scroll {scroll_count + 1}/{max_scrolls} - Found: {len(all_links)} links")
             
             # Extract links
             new_count = 0
             for selector in selectors:
+                found = 0
                 try:
                     elements = self.driver.find_elements(By.XPATH, selector)
                     for element in elements:
                         try:
                             href = element.get_attribute('href')
                             if href and '/maps/place/' in href and href not in all_links:
-                                all_links.add(href)
-                                new_count += 1
+                                all_links[href] = None
+                                found += 1
                         except:
                             continue
                 except:
                     continue
+                if found:
+                    SELECTOR_HITS.inc(found, field='links', selector=selector)
+                    new_count += found
             
             # Check progress
             if new_count == 0:
@@ -169,6 +216,56 @@ class OptimizedGoogleMapsScraper:
         
         return all_links
 
+    def _extract_list_cards(self):
+        """Name, rating, category and address from the result list, without opening each place"""
+        cards = {}
+        try:
+            articles = self.driver.find_elements(By.CSS_SELECTOR, 'div[role="article"]')
+        except Exception:
+            return cards
+        for article in articles:
+            try:
+                link = article.find_element(By.CSS_SELECTOR, 'a[href*="/maps/place/"]')
+                href = link.get_attribute('href')
+                name = link.get_attribute('aria-label') or article.get_attribute('aria-label')
+                if not href or not name:
+                    continue
+                data = {
+                    'name': name.strip(),
+                    'address': 'Address not found',
+                    'rating': None,
+                    'category': 'Category not found',
+                    'website': None,
+                    'mobile': None,
+                    'google_maps_url': href,
+                    'search_query': self.search_query,
+                    'list_only': True
+                }
+                try:
+                    match = re.search(r'(\d+\.?\d*)', article.find_element(By.CSS_SELECTOR, '.MW4etd').text)
+                    if match:
+                        data['rating'] = float(match.group(1))
+                except:
+                    pass
+                # Card lines read "Category · Address"
+                for line in article.find_elements(By.CSS_SELECTOR, '.W4Efsd .W4Efsd'):
+                    parts = [p.strip() for p in line.text.split('·') if p.strip()]
+                    if len(parts) >= 2:
+                        data['category'], data['address'] = parts[0], parts[-1]
+                        break
+                cards[href] = data
+            except:
+                continue
+        print(f"🗂️ Read {len(cards)} result cards from the list")
+        return cards
+
+    def _mark_partial(self, reason):
+        """The time budget changed the outcome: tell the caller the results are partial"""
+        print(f"⏱️ Time budget: {reason}")
+        if not self.partial:
+            self.partial = True
+            self._report('partial', reason=reason)
+
     def _scroll_optimized(self):
         """Optimized scrolling method"""
         try:
@@ -203,6 +300,10 @@ class OptimizedGoogleMapsScraper:
 
     def extract_business_data(self, business_url):
         """Extract business data from individual page"""
+        with PHASE_SECONDS.time(phase='extraction'):
+            return self._extract_business_data(business_url)
+
+    def _extract_business_data(self, business_url):
         try:
             self.driver.get(business_url)
             time.sleep(random.uniform(3, 5))
@@ -219,6 +320,7 @@ class OptimizedGoogleMapsScraper:
             }
 
             self.extracted_count += 1
+            record_business_extracted()
             if data.get('mobile'):
                 self.contacts_found += 1
 
@@ -227,6 +329,7 @@ class OptimizedGoogleMapsScraper:
 
         except Exception as e:
             print(f"❌ Extraction failed: {e}")
+            FAILURES.inc(reason=f'extraction:{type(e).__name__}')
             return None
 
     def _get_name(self):
@@ -237,9 +340,11 @@ class OptimizedGoogleMapsScraper:
                 element = self.driver.find_element(By.CSS_SELECTOR, selector)
                 name = element.text.strip()
                 if name and len(name) > 1:
+                    SELECTOR_HITS.inc(field='name', selector=selector)
                     return name
             except:
                 continue
+        SELECTOR_MISSES.inc(field='name')
         return 'Unknown Business'
 
     def _get_address(self):
@@ -253,9 +358,11 @@ class OptimizedGoogleMapsScraper:
                 element = self.driver.find_element(By.CSS_SELECTOR, selector)
                 address = element.text.strip()
                 if address and len(address) > 5:
+                    SELECTOR_HITS.inc(field='address', selector=selector)
                     return address
             except:
                 continue
+        SELECTOR_MISSES.inc(field='address')
         return 'Address not found'
 
     def _get_rating(self):
@@ -267,9 +374,11 @@ class OptimizedGoogleMapsScraper:
                 text = element.text.strip()
                 match = re.search(r'(\d+\.?\d*)', text)
                 if match:
+                    SELECTOR_HITS.inc(field='rating', selector=selector)
                     return float(match.group(1))
             except:
                 continue
+        SELECTOR_MISSES.inc(field='rating')
         return None
 
     def _get_category(self):
@@ -280,9 +389,11 @@ class OptimizedGoogleMapsScraper:
                 element = self.driver.find_element(By.CSS_SELECTOR, selector)
                 category = element.text.strip()
                 if category and len(category) > 2:
+                    SELECTOR_HITS.inc(field='category', selector=selector)
                     return category
             except:
                 continue
+        SELECTOR_MISSES.inc(field='category')
         return 'Category not found'
 
     def _get_website(self):
@@ -296,9 +407,11 @@ class OptimizedGoogleMapsScraper:
                 element = self.driver.find_element(By.CSS_SELECTOR, selector)
                 url = element.get_attribute('href')
                 if url and 'google.com' not in url:
+                    SELECTOR_HITS.inc(field='website', selector=selector)
                     return url
             except:
                 continue
+        SELECTOR_MISSES.inc(field='website')
         return None
 
     def _get_phone(self):
@@ -317,10 +430,12 @@ class OptimizedGoogleMapsScraper:
                     for element in elements:
                         phone = self._extract_phone_from_element(element)
                         if phone:
+                            SELECTOR_HITS.inc(field='phone', selector=selector)
                             return phone
                 except:
                     continue
             
+            SELECTOR_MISSES.inc(field='phone')
             return None
             
         except Exception as e:
@@ -348,6 +463,15 @@ class OptimizedGoogleMapsScraper:
         except:
             return None
 
+    def _report(self, event, **payload):
+        """Send a progress event to the caller, never letting it break scraping"""
+        if not self.progress_callback:
+            return
+        try:
+            self.progress_callback(event, payload)
+        except Exception as e:
+            print(f"⚠️ Progress callback error: {e}")
+
     def run_scraping(self):
         """Main scraping process"""
         start_time = datetime.now()
@@ -359,29 +483,86 @@ class OptimizedGoogleMapsScraper:
             print(f"🎯 Target: {self.max_results} businesses")
             print("=" * 60)
 
-            # Get business links
-            business_links = self.search_and_extract_links()
+            # Get business links (a checkpointed harvest saves the search and scrolling)
+            business_links = self.checkpoint.links_for(self.max_results) if self.checkpoint else None
+            if business_links:
+                print(f"♻️ Resuming from checkpoint: {len(business_links)} links")
+            else:
+                business_links = self.search_and_extract_links()
+                if business_links and self.checkpoint:
+                    self.checkpoint.save_links(business_links, self.link_target)
+                business_links = business_links[:self.max_results]
             if not business_links:
                 print("❌ No business links found")
+                FAILURES.inc(reason='no_results')
+                if self.budget and self.budget.expired():
+                    self._mark_partial("ran out of time before finding any links")
                 return []
-
-            print(f"\n📊 EXTRACTING DATA FROM {len(business_links)} BUSINESSES")
+            self._report('links', links_found=len(business_links))
+
+            pending = [link for link in business_links if link not in self.skip_links]
+            skipped = len(business_links) - len(pending)
+            completed = self.checkpoint.completed() if self.checkpoint else {}
+            for link in pending:
+                if completed.get(link):
+                    results.append(completed[link])
+                    self._report('result', result=completed[link])
+            if completed:
+                print(f"♻️ Restored {len(results)} businesses from the checkpoint")
+                pending = [link for link in pending if link not in completed]
+            done = len(business_links) - len(pending)
+            if done:
+                print(f"⏭️ Skipping {done} businesses already extracted")
+
+            extract_deadline = None
+            if self.budget:
+                extract_deadline = self.budget.phase_deadline('extract', full=not self.visit_websites)
+                affordable = int((extract_deadline - time.monotonic()) / SECONDS_PER_BUSINESS)
+                if affordable < len(pending):
+                    self._mark_partial(f"time for {affordable} of {len(pending)} detail pages; "
+                                       f"using list cards for the rest")
+
+            print(f"\n📊 EXTRACTING DATA FROM {len(pending)} BUSINESSES")
             print("=" * 60)
 
             # Extract data from each business
-            for i, link in enumerate(business_links, 1):
+            for i, link in enumerate(pending, done + 1):
+                if extract_deadline and time.monotonic() + SECONDS_PER_BUSINESS > extract_deadline:
+                    self._add_list_cards(pending[i - done - 1:], results)
+                    break
                 print(f"[{i:2d}/{len(business_links)}] Processing...")
+                if self.claim_link and not self.claim_link(link):
+                    print("⏭️ Already extracted for another query in this batch")
+                    self._report('progress', processed=i, total=len(business_links), extracted=len(results))
+                    continue
 
                 try:
                     business_data = self.extract_business_data(link)
                     if business_data:
                         results.append(business_data)
+                        self._report('result', result=business_data)
                 except Exception as e:
+                    business_data = None
                     print(f"❌ Error: {e}")
+                if self.checkpoint:
+                    self.checkpoint.mark_done(link, business_data)
+
+                self._report('progress', processed=i, total=len(business_links), extracted=len(results))
 
                 # Delay between requests
                 time.sleep(random.uniform(1.5, 3.0))
 
+            # Website enrichment runs over plain HTTP, so the browser is not needed
+            if self.visit_websites and results and self.budget and self.budget.remaining() < 1:
+                self._mark_partial("no time left for website enrichment")
+            elif self.visit_websites and results:
+                self._report('enriching', websites=sum(1 for r in results if r.get('website')))
+                time_limit = self.budget.phase_limit('enrich') if self.budget else None
+                enrich_with_websites(results, email_patterns=self.email_patterns, time_limit=time_limit)
+                if self.budget and self.budget.expired():
+                    self._mark_partial("website enrichment cut short")
+                self.contacts_found = sum(1 for r in results if r.get('email') or r.get('mobile'))
+
             # Final summary
             end_time = datetime.now()
             duration = end_time - start_time
@@ -391,16 +572,34 @@ class OptimizedGoogleMapsScraper:
             print(f"⏱️ Duration: {duration}")
             print(f"📊 Businesses found: {len(results)}")
             print(f"📞 Contacts found: {self.contacts_found}")
-            print(f"📈 Success rate: {(len(results)/len(business_links)*100):.1f}%")
+            print(f"📈 Success rate: {((skipped + len(results))/len(business_links)*100):.1f}%")
 
             return results
 
         except Exception as e:
             print(f"❌ Critical error: {e}")
+            if self.checkpoint:
+                # Fail loudly: the checkpoint keeps the work done so far for the retry
+                raise
+            if self.budget and results:
+                # A deadline-bound caller is better served by what we have than by nothing
+                self._mark_partial(f"stopped by an error after {len(results)} businesses")
+                return results
             return []
         finally:
             self.cleanup()
     
+    def _add_list_cards(self, links, results):
+        """Fall back to list-card data for links there is no time left to open"""
+        added = 0
+        for link in links:
+            card = self.list_cards.get(link)
+            if card and (not self.claim_link or self.claim_link(link)):
+                results.append(card)
+                self._report('result', result=card)
+                added += 1
+        self._mark_partial(f"deadline reached; {added} of {len(links)} remaining places from list cards")
+
     def cleanup(self):
         """Clean up resources"""
         try:
@@ -411,9 +610,13 @@ class OptimizedGoogleMapsScraper:
             pass
 
 
-def optimized_scrape_google_maps(query, max_results=50):
+def optimized_scrape_google_maps(query, max_results=50, visit_websites=False, progress_callback=None,
+                                 skip_links=None, checkpoint=None, claim_link=None, time_budget=None):
     """Convenience function for optimized scraping"""
-    scraper = OptimizedGoogleMapsScraper(query, max_results)
+    scraper = OptimizedGoogleMapsScraper(query, max_results, visit_websites=visit_websites,
+                                         progress_callback=progress_callback, skip_links=skip_links,
+                                         checkpoint=checkpoint, claim_link=claim_link,
+                                         time_budget=time_budget)
     return scraper.run_scraping()
 
 
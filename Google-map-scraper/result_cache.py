@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Result Cache - Query-level cache of finished scrape results
+Key points:
+- Keyed by normalized (query, profile, fields), so "Restaurants in  New York"
+  and "restaurants in new york" share one entry
+- Entries expire after a TTL; the cache is size-bounded with LRU eviction
+- Stale-while-revalidate: for a while after expiry an entry is still served
+  (marked stale) so the caller can refresh it in the background
+- Results are rank-ordered, so an entry covers any smaller result count;
+  a larger count gets the entry back as a partial hit to extend from
+- Hit/miss/eviction counters for monitoring
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', str(6 * 3600)))
+DEFAULT_RESULT_CACHE_STALE_TTL = int(os.environ.get('RESULT_CACHE_STALE_TTL', str(24 * 3600)))
+DEFAULT_RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '100'))
+
+
+def normalize_query(query):
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    query = re.sub(r'\s+', ' ', (query or '').lower()).strip()
+    return query.strip(' .,;:!?')
+
+
+def cache_key(query, profile, fields=None):
+    """Normalized key for one scrape configuration"""
+    fields = tuple(sorted({f.strip().lower() for f in fields})) if fields else ()
+    return (normalize_query(query), str(profile), fields)
+
+
+class CachedResult:
+    def __init__(self, results, stored_at, stale=False, max_results=None, covers=True):
+        self.results = results
+        self.stored_at = stored_at
+        self.stale = stale
+        self.max_results = max_results if max_results is not None else len(results)
+        self.covers = covers
+
+    @property
+    def age(self):
+        return time.time() - self.stored_at
+
+
+class ResultCache:
+    def __init__(self, ttl=DEFAULT_RESULT_CACHE_TTL, stale_ttl=DEFAULT_RESULT_CACHE_STALE_TTL,
+                 max_entries=DEFAULT_RESULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stores = 0
+
+    def get(self, key, limit=None):
+        """
+        Entry for key, trimmed to `limit` results, or None when missing/expired.
+        An entry with fewer than `limit` results comes back with covers=False
+        (a partial hit) unless the search behind it was exhausted.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            results, stored_at, max_results, complete = entry
+            age = time.time() - stored_at
+            if age > self.ttl + self.stale_ttl:
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            stale = age > self.ttl
+            covers = limit is None or complete or len(results) >= limit
+            if not covers and stale:
+                # Not worth extending old data; scrape it all again
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            if not covers:
+                self.partial_hits += 1
+            elif stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            if covers and limit is not None:
+                results = results[:limit]
+            return CachedResult([dict(r) for r in results], stored_at, stale, max_results, covers)
+
+    def put(self, key, results, max_results=None, complete=False):
+        """Store results; complete=True means the search had nothing more to give"""
+        with self.lock:
+            max_results = max_results if max_results is not None else len(results)
+            self.entries[key] = ([dict(r) for r in results], time.time(), max_results, complete)
+            self.entries.move_to_end(key)
+            self.stores += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.stale_hits + self.partial_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'stale_ttl_seconds': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'partial_hits': self.partial_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+            }
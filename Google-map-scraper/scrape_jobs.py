@@ -0,0 +1,756 @@
+#!/usr/bin/env python3
+"""
+Scrape Jobs - Background execution for long-running scrapes
+Key points:
+- Scrapes run on a background executor, never on the API event loop
+- Each job tracks status, progress and partial results as they arrive,
+  plus an append-only event log that streaming endpoints replay
+- Finished jobs are kept in memory (bounded) for polling and result fetches
+- Fixed worker slots sized to the container plus a bounded wait queue;
+  new work is rejected with QueueFullError (HTTP 429) once the queue is full.
+  Batch queries wait in their own bounded lane, outside that limit
+- Repeated queries are answered from the result cache; stale entries are
+  served immediately and refreshed by a background job
+- Single-flight: identical requests arriving while a scrape is queued or
+  running attach to that job instead of starting another browser
+- Result-count containment: a smaller max_results is answered from the
+  rank-ordered prefix of a larger cached or running scrape, and a larger one
+  extends a cached scrape, skipping businesses it already extracted
+- Finished results are written to the job store for paginated reads
+- Waiting jobs are scheduled by priority class and tenant fair share, and
+  large jobs run in slices so they give up their slot between slices
+- With a checkpoint store, jobs interrupted by a restart resume under the
+  same job ID from their last completed link; a failed job keeps its
+  checkpoint, so resubmitting the query continues where it stopped
+- A job with a time budget returns what it has when the deadline hits,
+  flagged partial; partial results are never cached
+"""
+
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+
+from fair_queue import BATCH, DEFAULT_TENANT, INTERACTIVE, PRIORITY_CLASSES, FairQueue
+from job_store import JobResultStore
+from metrics import FAILURES, JOBS, JOBS_REJECTED, QUEUE_WAIT_SECONDS, REGISTRY
+from result_cache import ResultCache, cache_key
+from time_budget import TimeBudget
+
+
+# Rough resident size of one headless Chrome plus its scrape
+CHROME_MEMORY_BYTES = 600 * 1024 * 1024
+
+
+def _container_memory_bytes():
+    """Memory limit of the container (cgroup v2/v1), falling back to physical RAM"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value)
+        except (OSError, ValueError):
+            continue
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return CHROME_MEMORY_BYTES
+
+
+def default_worker_count():
+    """One Chrome per CPU, but never more than the container's memory can hold"""
+    by_memory = _container_memory_bytes() // CHROME_MEMORY_BYTES
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+
+DEFAULT_SCRAPE_WORKERS = int(os.environ.get('SCRAPE_WORKERS', '0')) or default_worker_count()
+DEFAULT_QUEUE_SIZE = int(os.environ.get('SCRAPE_QUEUE_SIZE', '10'))
+# Batch queries allowed to wait, counted apart from SCRAPE_QUEUE_SIZE
+DEFAULT_BATCH_QUEUE_SIZE = int(os.environ.get('BATCH_QUEUE_SIZE', '200'))
+MAX_FINISHED_JOBS = int(os.environ.get('MAX_FINISHED_JOBS', '200'))
+# Jobs up to this size default to the interactive class
+INTERACTIVE_MAX_RESULTS = int(os.environ.get('INTERACTIVE_MAX_RESULTS', '20'))
+# Larger jobs run in slices of this many results, giving up their slot in between
+SCRAPE_SLICE_SIZE = int(os.environ.get('SCRAPE_SLICE_SIZE', '25'))
+
+
+class QueueFullError(Exception):
+    """Raised when the scrape wait queue is full; carries a Retry-After hint"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Scrape queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ScrapeExecutor:
+    """Fixed worker slots with a bounded, fair-share wait queue (admission control)"""
+
+    def __init__(self, max_workers=DEFAULT_SCRAPE_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_queue_size=DEFAULT_BATCH_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.batch_queue_size = batch_queue_size
+        self._queue = FairQueue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._batch_waiting = 0
+
+        self.busy = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+        REGISTRY.gauge('scrape_queue_depth', 'Jobs waiting for a driver slot', callback=self._queue.qsize)
+        REGISTRY.gauge('scrape_drivers_busy', 'Driver slots running a scrape', callback=lambda: self.busy)
+        REGISTRY.gauge('scrape_drivers_total', 'Driver slots (worker threads)', callback=lambda: self.max_workers)
+
+        self._threads = []
+        for i in range(max_workers):
+            thread = threading.Thread(target=self._worker, name=f'scrape-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, priority=INTERACTIVE, tenant=DEFAULT_TENANT, cost=1, requeue=False):
+        """Queue fn(*args); raises QueueFullError instead of waiting (requeued slices always fit)"""
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args, time.monotonic(), priority, False),
+                                   priority=priority, tenant=tenant, cost=cost, force=requeue)
+        except queue.Full:
+            self._reject()
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def submit_batch(self, calls, tenant=DEFAULT_TENANT, cost=1):
+        """Queue every (fn, *args) of a batch in the batch lane, all or none (raises QueueFullError)"""
+        with self._lock:
+            full = self._batch_waiting + len(calls) > self.batch_queue_size
+            if not full:
+                self._batch_waiting += len(calls)
+                self.submitted += len(calls)
+        if full:
+            self._reject()
+        futures = []
+        for fn, *args in calls:
+            future = Future()
+            # Forced: the lane has its own limit, so the batch never fills the interactive queue
+            self._queue.put_nowait((future, fn, tuple(args), time.monotonic(), BATCH, True),
+                                   priority=BATCH, tenant=tenant, cost=cost, force=True)
+            futures.append(future)
+        return futures
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        JOBS_REJECTED.inc()
+        raise QueueFullError(self.retry_after())
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, enqueued_at, priority, batched = item
+            if batched:
+                with self._lock:
+                    self._batch_waiting -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.monotonic()
+            waited = started - enqueued_at
+            with self._lock:
+                self.busy += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            QUEUE_WAIT_SECONDS.observe(waited, priority=priority)
+
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.completed += 1
+                    self.total_run += time.monotonic() - started
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely to free up"""
+        with self._lock:
+            avg_run = self.total_run / self.completed if self.completed else 60
+        return max(5, int(avg_run / self.max_workers))
+
+    def stats(self):
+        by_priority, by_tenant = self._queue.depths()
+        with self._lock:
+            started = self.completed + self.busy
+            return {
+                'workers': self.max_workers,
+                'busy_workers': self.busy,
+                'queue_depth': sum(by_priority.values()),
+                'queue_capacity': self.queue_size,
+                'batch_queue_depth': self._batch_waiting,
+                'batch_queue_capacity': self.batch_queue_size,
+                'queued_by_priority': by_priority,
+                'queued_by_tenant': by_tenant,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'completed': self.completed,
+                'avg_wait_seconds': round(self.total_wait / started, 2) if started else 0.0,
+                'max_wait_seconds': round(self.max_wait, 2),
+                'avg_run_seconds': round(self.total_run / self.completed, 2) if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        """Cancel queued work and stop the workers after their current job"""
+        for item in self._queue.drain():
+            item[0].cancel()
+        self._queue.close()
+
+
+def default_scrape(query, max_results, visit_websites, progress_callback=None, skip_links=None, checkpoint=None,
+                   claim_link=None, time_budget=None):
+    """Run the optimized scraper (what the deployed API uses)"""
+    # Imported here so the API can start even if Selenium is broken
+    from optimized_scraper import optimized_scrape_google_maps
+    return optimized_scrape_google_maps(
+        query=query,
+        max_results=max_results,
+        visit_websites=visit_websites,
+        progress_callback=progress_callback,
+        skip_links=skip_links,
+        checkpoint=checkpoint,
+        claim_link=claim_link,
+        time_budget=time_budget
+    )
+
+
+def scrape_profile(visit_websites):
+    """Scrape settings that change the results, as part of the cache key"""
+    # max_results is left out: results are rank-ordered, so counts nest
+    return 'websites' if visit_websites else 'maps'
+
+
+def default_priority(max_results):
+    """Small scrapes are somebody waiting on a response; large ones are batch runs"""
+    return INTERACTIVE if max_results <= INTERACTIVE_MAX_RESULTS else BATCH
+
+
+class ScrapeJob:
+    def __init__(self, query, max_results=100, visit_websites=True, priority=None, tenant=DEFAULT_TENANT,
+                 job_id=None, time_budget_s=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.query = query
+        self.max_results = max_results
+        self.visit_websites = visit_websites
+        self.priority = priority or default_priority(max_results)
+        self.tenant = tenant
+        self.slices = 0
+        self.cache_key = cache_key(query, scrape_profile(visit_websites))
+        self.cached = False
+        self.refresh = False
+        self.subscribers = 1
+        self.persisted = False
+        # Started now: time spent waiting for a slot counts against the budget
+        self.time_budget_s = time_budget_s
+        self.budget = TimeBudget(time_budget_s) if time_budget_s else None
+        # A retry of a failed job picks up that job's checkpoint instead of starting over
+        self.checkpoint_id = self.id
+        self.partial = False
+
+        self.status = 'queued'
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {'links_found': 0, 'processed': 0, 'total': 0, 'stage': 'queued'}
+        # Whether the scraper reported its harvest; links_found means nothing otherwise
+        self.links_reported = False
+
+        self.results = []
+        self.seed_results = []
+        self.events = []
+        self.followers = []
+        # Called with every scraper event, outside the lock (e.g. webhook chunking)
+        self.listeners = []
+        self.future = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed')
+
+    def handle_event(self, event, payload):
+        """Progress callback passed to the scraper"""
+        with self._lock:
+            if event == 'links':
+                self.links_reported = True
+                self.progress['links_found'] = payload.get('links_found', 0)
+                self.progress['total'] = payload.get('links_found', 0)
+                self.progress['stage'] = 'extracting'
+            elif event == 'result':
+                self.results.append(payload['result'])
+                self.events.append(('result', {'index': len(self.results) - 1, 'result': payload['result']}))
+            elif event == 'progress':
+                self.progress['processed'] = payload.get('processed', 0)
+                self.progress['total'] = payload.get('total', self.progress['total'])
+            elif event == 'enriching':
+                self.progress['stage'] = 'enriching'
+            elif event == 'partial':
+                self.partial = True
+            if event != 'result':
+                self.events.append(('progress', self._progress_payload()))
+            satisfied = self._forward(event, payload)
+            listeners = list(self.listeners)
+
+        # Settled outside the lock: resolving a future runs its callbacks
+        for follower in satisfied:
+            follower.settle(follower.snapshot_results())
+        for listener in listeners:
+            try:
+                listener(event, payload)
+            except Exception as e:
+                print(f"⚠️ Job listener error: {e}")
+
+    def _forward(self, event, payload):
+        """Pass an event on to smaller jobs riding on this one; call with the lock held"""
+        satisfied = []
+        for follower in self.followers:
+            if follower.finished:
+                continue
+            if event == 'result':
+                if len(follower.results) < follower.max_results:
+                    follower.handle_event(event, payload)
+            elif event in ('links', 'progress'):
+                clamped = {k: min(v, follower.max_results) for k, v in payload.items() if isinstance(v, int)}
+                follower.handle_event(event, clamped)
+            else:
+                follower.handle_event(event, payload)
+
+            # Without website enrichment the prefix is final as soon as it is extracted
+            if not follower.visit_websites and len(follower.results) >= follower.max_results:
+                satisfied.append(follower)
+        return satisfied
+
+    def seed(self, results):
+        """Start from a smaller scrape's results; only the rest gets extracted"""
+        self.seed_results = list(results)
+        self.results = list(results)
+        self.events = [('result', {'index': i, 'result': r}) for i, r in enumerate(results)]
+
+    def add_follower(self, follower):
+        """Serve a smaller max_results from this job's rank-ordered prefix"""
+        with self._lock:
+            if self.finished:
+                results, error = list(self.results), self.error
+            else:
+                follower.status = 'running'
+                follower.started_at = datetime.now()
+                for result in self.results[:follower.max_results]:
+                    follower.handle_event('result', {'result': result})
+                self.followers.append(follower)
+                self.subscribers += 1
+                if follower.visit_websites or len(follower.results) < follower.max_results:
+                    return
+                results, error = follower.snapshot_results(), None
+        follower.settle(results[:follower.max_results], error)
+
+    def settle(self, results, error=None, partial=False):
+        """Finish a job that has no scrape of its own (cached or following)"""
+        with self._lock:
+            if self.finished:
+                return
+            self.started_at = self.started_at or datetime.now()
+            self.finished_at = datetime.now()
+            self.partial = self.partial or partial
+            if error:
+                self.status = 'failed'
+                self.error = error
+                self.progress['stage'] = 'failed'
+            else:
+                self._set_final_results(results)
+                self.status = 'completed'
+                self.progress['stage'] = 'done'
+        self.future.set_result(self.results)
+
+    def _set_final_results(self, results):
+        """The final list is authoritative (enrichment may have filled fields in); call with the lock held"""
+        streamed = len(self.results)
+        self.results = [r for r in (results or []) if r]
+        if self.visit_websites:
+            self.events.extend(('update', {'index': i, 'result': r})
+                               for i, r in enumerate(self.results[:streamed]))
+        # Rows the scraper returned without a 'result' event still reach streaming clients before the summary
+        self.events.extend(('result', {'index': i, 'result': r})
+                           for i, r in enumerate(self.results[streamed:], streamed))
+
+    def _progress_payload(self):
+        """Progress plus extraction rate; call with the lock held"""
+        payload = dict(self.progress)
+        payload['extracted'] = len(self.results)
+        elapsed = (datetime.now() - self.started_at).total_seconds() if self.started_at else 0
+        payload['rate_per_minute'] = round(self.progress['processed'] * 60 / elapsed, 1) if elapsed else 0.0
+        return payload
+
+    def events_since(self, cursor):
+        """Events logged after position `cursor`, and the new cursor"""
+        with self._lock:
+            return self.events[cursor:], len(self.events)
+
+    def progress_snapshot(self):
+        with self._lock:
+            return self._progress_payload()
+
+    def summary(self):
+        """Final event for streaming clients"""
+        with self._lock:
+            end = self.finished_at or datetime.now()
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'total_results': len(self.results),
+                'contacts_found': sum(1 for r in self.results if r.get('email') or r.get('mobile')),
+                'duration_seconds': round((end - self.started_at).total_seconds(), 1) if self.started_at else 0.0,
+                'partial': self.partial,
+                'error': self.error,
+            }
+
+    def snapshot_results(self):
+        with self._lock:
+            return list(self.results)
+
+    def to_dict(self, include_results=False):
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'status': self.status,
+                'query': self.query,
+                'max_results': self.max_results,
+                'visit_websites': self.visit_websites,
+                'priority': self.priority,
+                'slices': self.slices,
+                'cached': self.cached,
+                'subscribers': self.subscribers,
+                'progress': dict(self.progress),
+                'results_count': len(self.results),
+                'partial': self.partial,
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            }
+            if include_results:
+                data['results'] = list(self.results)
+        return data
+
+
+class JobManager:
+    def __init__(self, scrape_fn=default_scrape, max_workers=DEFAULT_SCRAPE_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 cache=None, store=None, slice_size=SCRAPE_SLICE_SIZE, checkpoints=None,
+                 batch_queue_size=DEFAULT_BATCH_QUEUE_SIZE):
+        self.scrape_fn = scrape_fn
+        self.slice_size = slice_size
+        # CheckpointStore; the scrape_fn must then accept a checkpoint argument
+        self.checkpoints = checkpoints
+        self.executor = ScrapeExecutor(max_workers=max_workers, queue_size=queue_size,
+                                       batch_queue_size=batch_queue_size)
+        self.cache = cache if cache is not None else ResultCache()
+        self.store = store if store is not None else JobResultStore()
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # cache_key -> checkpoint of a failed job, for the next submit of that query
+        self._failed_checkpoints = {}
+        self.refreshes = 0
+        self.coalesced = 0
+        self.extended = 0
+
+    def submit(self, query, max_results=100, visit_websites=True, use_cache=True, priority=None,
+               tenant=DEFAULT_TENANT, time_budget_s=None):
+        """Queue a scrape and return its job immediately (raises QueueFullError)"""
+        if priority is not None and priority not in PRIORITY_CLASSES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITY_CLASSES)}")
+        if time_budget_s is not None and time_budget_s <= 0:
+            raise ValueError("time_budget_s must be positive")
+        job = ScrapeJob(query, max_results, visit_websites, priority, tenant, time_budget_s=time_budget_s)
+
+        cached = self.cache.get(job.cache_key, max_results) if use_cache else None
+        if cached and cached.covers:
+            self._complete_from_cache(job, cached.results)
+            print(f"⚡ Cache {'stale hit' if cached.stale else 'hit'} for '{query}' ({len(job.results)} results)")
+            if cached.stale:
+                self._refresh(job, max(max_results, cached.max_results))
+            with self._lock:
+                self.jobs[job.id] = job
+                self._prune()
+            return job
+
+        with self._lock:
+            leader = self._inflight.get(job.cache_key)
+            if leader and leader.budget and not job.budget:
+                # A budgeted scrape may stop early; don't hand its partial results to a caller without one
+                leader = None
+            # A budgeted caller riding on a scrape that may outlast its budget follows it with its own deadline
+            own_deadline = bool(leader and job.budget and
+                                (not leader.budget or leader.budget.deadline > job.budget.deadline))
+            if leader and job.priority == INTERACTIVE:
+                # Someone is waiting on it now: the leader's remaining slices jump ahead
+                leader.priority = INTERACTIVE
+            if leader and leader.max_results == max_results and not own_deadline:
+                leader.subscribers += 1
+                self.coalesced += 1
+                print(f"🔗 Attached to running job {leader.id} for '{query}' ({leader.subscribers} subscribers)")
+                return leader
+
+            if leader and leader.max_results >= max_results:
+                self.coalesced += 1
+                job.future = Future()
+                self.jobs[job.id] = job
+                self._prune()
+            else:
+                leader = None
+                if cached:
+                    # A smaller scrape of this query is cached: extend it
+                    job.seed(cached.results)
+                    self.extended += 1
+                job.checkpoint_id = self._failed_checkpoints.pop(job.cache_key, job.id)
+                self._dispatch(job)
+                self._inflight[job.cache_key] = job
+                self.jobs[job.id] = job
+                self._prune()
+
+        if leader:
+            leader.add_follower(job)
+            if own_deadline:
+                self._settle_at_deadline(job)
+            print(f"🔗 Serving top {max_results} for '{query}' from running job {leader.id}")
+        elif job.seed_results:
+            print(f"📥 Queued job {job.id} for '{query}', extending {len(job.seed_results)} cached results")
+        else:
+            print(f"📥 Queued job {job.id} for '{query}'")
+        return job
+
+    def _settle_at_deadline(self, job):
+        """Finish a following job with the results it has when its own time budget runs out"""
+        def expire():
+            if not job.finished:
+                print(f"⏱️ Job {job.id} hit its time budget before running job finished")
+                job.settle(job.snapshot_results(), partial=True)
+        timer = threading.Timer(job.budget.remaining(), expire)
+        timer.daemon = True
+        timer.start()
+
+    def _complete_from_cache(self, job, results):
+        """Turn a job into an already finished one holding cached results"""
+        job.cached = True
+        job.status = 'completed'
+        job.started_at = job.finished_at = datetime.now()
+        job.results = results
+        job.events = [('result', {'index': i, 'result': r}) for i, r in enumerate(results)]
+        job.progress.update(links_found=len(results), processed=len(results), total=len(results), stage='done')
+        job.future = Future()
+        job.future.set_result(results)
+
+    def _refresh(self, job, max_results):
+        """Re-scrape a stale entry in the background (one refresh per key)"""
+        refresh = ScrapeJob(job.query, max_results, job.visit_websites, BATCH, job.tenant)
+        refresh.refresh = True
+        with self._lock:
+            if job.cache_key in self._inflight:
+                return
+            try:
+                self._dispatch(refresh)
+            except QueueFullError:
+                # Interactive work comes first; the next stale hit will try again
+                return
+            self._inflight[refresh.cache_key] = refresh
+            self.jobs[refresh.id] = refresh
+            self.refreshes += 1
+        print(f"🔄 Refreshing cached results for '{job.query}' (job {refresh.id})")
+
+    def stats(self):
+        stats = self.executor.stats()
+        with self._lock:
+            stats['coalesced_requests'] = self.coalesced
+            stats['in_flight'] = [
+                {'job_id': j.id, 'query': j.query, 'max_results': j.max_results, 'status': j.status,
+                 'priority': j.priority, 'slices': j.slices, 'subscribers': j.subscribers}
+                for j in self._inflight.values()
+            ]
+        return stats
+
+    def cache_stats(self):
+        stats = self.cache.stats()
+        stats['background_refreshes'] = self.refreshes
+        stats['extended_scrapes'] = self.extended
+        return stats
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def results_page(self, job, cursor=None, limit=100):
+        """A page of a finished job's results from the store (raises InvalidCursorError)"""
+        self._persist(job)
+        return self.store.page(job.id, cursor, limit)
+
+    def _persist(self, job):
+        """Write a finished job's results to the store once"""
+        with job._lock:
+            if job.persisted or not job.finished:
+                return
+            results = list(job.results)
+            job.persisted = True
+        try:
+            self.store.save_results(job.id, results)
+        except Exception as e:
+            # Results are still served from memory; the next page request retries
+            job.persisted = False
+            print(f"⚠️ Could not store results of job {job.id}: {e}")
+
+    def _dispatch(self, job, requeue=False):
+        """Queue the job's next slice on the executor (raises QueueFullError unless requeued)"""
+        cost = min(job.max_results - len(job.seed_results), self.slice_size or job.max_results)
+        if job.future is None:
+            job.future = Future()
+        slot = self.executor.submit(self._run, job, priority=job.priority, tenant=job.tenant,
+                                    cost=cost, requeue=requeue)
+        # Executor shutdown cancels queued slices; don't leave waiters hanging
+        slot.add_done_callback(lambda f: f.cancelled() and job.future.cancel())
+
+    def _run(self, job):
+        if job.started_at is None:
+            job.started_at = datetime.now()
+            print(f"🚀 Job {job.id} started: '{job.query}'")
+        job.status = 'running'
+        job.progress['stage'] = 'searching'
+
+        kwargs = {'progress_callback': job.handle_event}
+        skip_links = {r.get('google_maps_url') for r in job.seed_results}
+        if skip_links:
+            kwargs['skip_links'] = skip_links
+        if self.checkpoints:
+            kwargs['checkpoint'] = self.checkpoints.open(job.checkpoint_id, {
+                'query': job.query, 'max_results': job.max_results, 'visit_websites': job.visit_websites,
+                'priority': job.priority, 'tenant': job.tenant, 'time_budget_s': job.time_budget_s,
+            })
+        if job.budget:
+            kwargs['time_budget'] = job.budget
+        target = job.max_results
+        # Budgeted jobs run in one go: requeueing a slice would spend their budget waiting
+        if self.slice_size and not job.budget and job.max_results - len(job.seed_results) > self.slice_size:
+            target = len(job.seed_results) + self.slice_size
+
+        try:
+            if job.budget and job.budget.expired():
+                # The budget ran out in the queue: return the seeded results without starting Chrome
+                print(f"⏱️ Job {job.id} spent its time budget waiting for a slot")
+                job.handle_event('partial', {'reason': 'queued'})
+                results = []
+            else:
+                results = self.scrape_fn(job.query, target, job.visit_websites, **kwargs)
+            # Scrapers that can't skip return seeded businesses again; keep the cached copies
+            new = [r for r in (results or []) if r and r.get('google_maps_url') not in skip_links]
+            with job._lock:
+                job._set_final_results(job.seed_results + new)
+                # A full slice means there are more links to go; without a links count, a full result list
+                if job.links_reported:
+                    full = job.progress['links_found'] >= target
+                else:
+                    full = len(job.results) >= target
+                more = bool(new) and target < job.max_results and full
+                if more:
+                    job.seed_results = list(job.results)
+                    job.slices += 1
+                    job.progress['stage'] = 'queued'
+            if more:
+                # Give the slot back; the rest waits its fair turn behind other work
+                self._dispatch(job, requeue=True)
+                print(f"⏸️ Job {job.id} yielded after {len(job.results)}/{job.max_results} results")
+                return job.results
+            if job.results and not job.partial:
+                # Fewer links than asked for means the search is exhausted; unreported links prove nothing
+                complete = job.links_reported and job.progress['links_found'] < job.max_results
+                self.cache.put(job.cache_key, job.results, job.max_results, complete)
+            with job._lock:
+                job.status = 'completed'
+                # With the status, so _prune never sees a finished job without finished_at
+                job.finished_at = datetime.now()
+                job.progress['stage'] = 'done'
+                followers = list(job.followers)
+            self._persist(job)
+            self._discard_checkpoint(job)
+            JOBS.inc(status='completed')
+            print(f"✅ Job {job.id} completed with {len(job.results)} results"
+                  f"{' (partial: time budget)' if job.partial else ''}")
+        except Exception as e:
+            with job._lock:
+                job.status = 'failed'
+                job.finished_at = datetime.now()
+                job.error = str(e)
+                job.progress['stage'] = 'failed'
+                followers = list(job.followers)
+            JOBS.inc(status='failed')
+            FAILURES.inc(reason=f'job:{type(e).__name__}')
+            print(f"❌ Job {job.id} failed: {e}")
+            traceback.print_exc()
+
+        with self._lock:
+            if self._inflight.get(job.cache_key) is job:
+                del self._inflight[job.cache_key]
+            if job.status == 'failed' and self.checkpoints:
+                # The work done so far is kept: a resubmit (or the next start) resumes from it
+                self._failed_checkpoints[job.cache_key] = job.checkpoint_id
+
+        for follower in followers:
+            follower.settle(job.results[:follower.max_results], job.error)
+        job.future.set_result(job.results)
+        return job.results
+
+    def _discard_checkpoint(self, job):
+        if not self.checkpoints:
+            return
+        try:
+            self.checkpoints.delete(job.checkpoint_id)
+        except Exception as e:
+            print(f"⚠️ Could not delete checkpoint of job {job.id}: {e}")
+
+    def resume_interrupted(self):
+        """Requeue jobs a previous process left checkpointed (crash, deploy, OOM kill)"""
+        if not self.checkpoints:
+            return []
+        resumed = []
+        for job_id, params in self.checkpoints.claim_interrupted():
+            job = ScrapeJob(params['query'], params['max_results'], params['visit_websites'],
+                            params.get('priority'), params.get('tenant', DEFAULT_TENANT), job_id=job_id,
+                            time_budget_s=params.get('time_budget_s'))
+            with self._lock:
+                self._dispatch(job, requeue=True)
+                self._inflight.setdefault(job.cache_key, job)
+                self.jobs[job.id] = job
+            resumed.append(job)
+            print(f"♻️ Resuming interrupted job {job.id}: '{job.query}'")
+        return resumed
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS"""
+        finished = [j for j in self.jobs.values() if j.finished]
+        if len(finished) <= MAX_FINISHED_JOBS:
+            return
+        finished.sort(key=lambda j: j.finished_at)
+        expired = finished[:len(finished) - MAX_FINISHED_JOBS]
+        for job in expired:
+            del self.jobs[job.id]
+        self.store.delete([job.id for job in expired if job.persisted])
+
+    def shutdown(self):
+        self.executor.shutdown()
@@ -1,13 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
+import asyncio
 import uvicorn
 import os
 import time
 import sys
 
+from fast_json import FastJSONResponse, project_rows, search_response, select_fields
+from job_store import InvalidCursorError
+import metrics
+from job_stream import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, stream_job, wants_sse
+from batch_scrape import BatchManager
+from checkpoints import CheckpointStore
+from fair_queue import DEFAULT_TENANT
+from scrape_jobs import JobManager, QueueFullError
+from webhooks import JobWebhook, WebhookSender, validate_callback_url
+from work_queue import DEFAULT_REMOTE_SLOTS, QueueScraper, open_work_queue
+
 print("Starting Google Maps Scraper API...")
 print(f"PORT environment variable: {os.environ.get('PORT', 'NOT SET')}")
 
@@ -21,11 +34,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Scrapes run here, off the event loop, so /health keeps answering.
+# With SCRAPE_QUEUE set they run on separate worker processes (worker.py) instead
+work_queue = open_work_queue()
+if work_queue is not None:
+    job_manager = JobManager(scrape_fn=QueueScraper(work_queue), max_workers=DEFAULT_REMOTE_SLOTS)
+else:
+    # Checkpointed, so a restart resumes interrupted scrapes instead of losing them
+    job_manager = JobManager(checkpoints=CheckpointStore())
+    job_manager.resume_interrupted()
+batch_manager = BatchManager(job_manager)
+# Webhooks go out on their own threads, never on the scrape workers
+webhook_sender = WebhookSender()
+# How long /scrape waits past a request's time budget before answering with what it has
+BUDGET_GRACE_SECONDS = float(os.environ.get('BUDGET_GRACE_SECONDS', '3'))
+
+def request_tenant(http_request):
+    """Fair-share tenant of a request: the X-Tenant header, else the client address"""
+    tenant = http_request.headers.get('x-tenant')
+    if tenant:
+        return tenant[:64]
+    return http_request.client.host if http_request.client else DEFAULT_TENANT
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request, exc):
+    """Backpressure: tell clients when to come back instead of queueing forever"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "retry_after": exc.retry_after, "queue": job_manager.stats()},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Pydantic models for API requests and responses
 class SearchRequest(BaseModel):
     query: str
     max_results: Optional[int] = 100
     visit_websites: Optional[bool] = True
+    use_cache: Optional[bool] = True
+    # interactive or batch; by default small scrapes are interactive
+    priority: Optional[Literal['interactive', 'batch']] = None
+    # POST results here when the job finishes (or every callback_chunk_size results)
+    callback_url: Optional[str] = None
+    callback_chunk_size: Optional[int] = None
+    # Seconds the whole scrape may take; whatever was found by then comes back with partial=true
+    time_budget_s: Optional[float] = Field(None, gt=0)
 
 class BusinessResult(BaseModel):
     name: str
@@ -42,11 +94,47 @@ class BusinessResult(BaseModel):
     website_visited: bool
     additional_contacts: str
 
+class BatchRequest(BaseModel):
+    queries: List[str]
+    max_results: Optional[int] = 20
+    visit_websites: Optional[bool] = False
+
 class SearchResponse(BaseModel):
     success: bool
     data: List[BusinessResult]
     total_results: int
     message: str
+    partial: bool = False
+
+
+def build_business_rows(results, query):
+    """Raw scraper dicts as BusinessResult-shaped dicts, built once in their final form"""
+    # Trusted path: no per-row model, FastAPI doesn't validate them again
+    return [
+        {
+            'name': result.get('name') or '',
+            'address': result.get('address') or '',
+            'rating': result.get('rating'),
+            'review_count': result.get('review_count'),
+            'category': result.get('category') or '',
+            'website': result.get('website'),
+            'mobile': result.get('mobile'),
+            'email': result.get('email'),
+            'secondary_email': result.get('secondary_email'),
+            'google_maps_url': result.get('google_maps_url') or '',
+            'search_query': query,
+            'website_visited': bool(result.get('website_visited', False)),
+            'additional_contacts': result.get('additional_contacts') or ''
+        }
+        for result in results or []
+        if isinstance(result, dict)
+    ]
+
+
+def serialize_business(result, query):
+    """One raw result as a BusinessResult dict for streaming"""
+    rows = build_business_rows([result], query)
+    return rows[0] if rows else None
 
 @app.get("/")
 async def root():
@@ -55,7 +143,7 @@ async def root():
         "version": "1.0.0",
         "status": "active",
         "port": os.environ.get('PORT', 'NOT SET'),
-        "endpoints": ["/", "/health", "/test-dependencies", "/test-chrome", "/test-google-maps", "/test-import", "/debug-scrape", "/debug-search", "/scrape"]
+        "endpoints": ["/", "/health", "/test-dependencies", "/test-chrome", "/test-google-maps", "/test-import", "/debug-scrape", "/debug-search", "/scrape", "/scrape/stream", "/scrape/batch", "/jobs", "/jobs/{job_id}/deliveries", "/queue", "/cache", "/metrics"]
     }
 
 @app.get("/health")
@@ -522,73 +610,204 @@ async def test_google_maps_scraper():
 
 
 @app.post("/scrape", response_model=SearchResponse)
-async def scrape_google_maps(request: SearchRequest):
+async def scrape_google_maps(request: SearchRequest, http_request: Request):
     """
     Main Google Maps scraping endpoint using optimized scraper
     """
     try:
         print(f"🔍 Received scraping request: {request.query}")
-        print(f"📊 Max results: {request.max_results}")
+        print(f"📊 Max results: {request.max_results}, Visit websites: {request.visit_websites}")
 
-        # Import the optimized scraper function
-        from optimized_scraper import optimized_scrape_google_maps
-
-        # Run extraction with optimized scraper
+        # Run on the job executor and wait without blocking the event loop
         print("🚀 Starting optimized extraction process...")
-        results = optimized_scrape_google_maps(
-            query=request.query,
-            max_results=request.max_results
-        )
-        print(f"✅ Extraction completed. Found {len(results) if results else 0} results")
+        job = job_manager.submit(request.query, request.max_results, request.visit_websites, request.use_cache,
+                                 request.priority, request_tenant(http_request), request.time_budget_s)
+        future = asyncio.wrap_future(job.future)
+        timed_out = False
+        if request.time_budget_s:
+            try:
+                # The scraper stops itself at the deadline; the grace covers closing Chrome and handing back
+                results = await asyncio.wait_for(asyncio.shield(future), request.time_budget_s + BUDGET_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                # Attached to a job without a budget, or the scraper overran: answer with what it has
+                timed_out = True
+                results = job.snapshot_results()
+        else:
+            results = await future
+        if job.status == 'failed':
+            raise Exception(job.error)
+        partial = timed_out or job.partial
+        print(f"✅ Extraction completed. Found {len(results) if results else 0} results"
+              f"{' (partial: time budget)' if partial else ''}")
 
         if results and isinstance(results, list) and len(results) > 0:
-            # Convert results to BusinessResult objects
-            business_results = []
-            for result in results:
-                if isinstance(result, dict):
-                    business_result = BusinessResult(
-                        name=result.get('name', ''),
-                        address=result.get('address', ''),
-                        rating=result.get('rating'),
-                        review_count=result.get('review_count'),
-                        category=result.get('category', ''),
-                        website=result.get('website'),
-                        mobile=result.get('mobile'),
-                        email=result.get('email'),
-                        secondary_email=result.get('secondary_email'),
-                        google_maps_url=result.get('google_maps_url', ''),
-                        search_query=request.query,
-                        website_visited=result.get('website_visited', False),
-                        additional_contacts=result.get('additional_contacts', '')
-                    )
-                    business_results.append(business_result)
-
-            return SearchResponse(
+            rows = build_business_rows(results, request.query)
+            return search_response(
+                rows,
+                f"{'Partially' if partial else 'Successfully'} scraped {len(rows)} businesses"
+                + (" (cached)" if job.cached else "") + (" before the time budget ran out" if partial else ""),
                 success=True,
-                data=business_results,
-                total_results=len(business_results),
-                message=f"Successfully scraped {len(business_results)} businesses"
+                partial=partial
             )
         else:
-            return SearchResponse(
-                success=False,
-                data=[],
-                total_results=0,
-                message="No results found or extraction failed"
-            )
+            return search_response([], "No results found or extraction failed", partial=partial)
 
+    except QueueFullError:
+        raise
     except Exception as e:
         print(f"❌ Scraping error: {str(e)}")
         error_msg = f"Scraping failed: {str(e)}"
         print(f"❌ {error_msg}")
         import traceback
         traceback.print_exc()
-        return SearchResponse(
-            success=False,
-            data=[],
-            total_results=0,
-            message=error_msg
-        )
+        return search_response([], error_msg)
+
+
+@app.post("/scrape/stream")
+async def scrape_google_maps_stream(request: SearchRequest, http_request: Request, format: Optional[str] = None):
+    """
+    Stream businesses as they are extracted (NDJSON by default, SSE with
+    ?format=sse or Accept: text/event-stream), then a summary event
+    """
+    job = job_manager.submit(request.query, request.max_results, request.visit_websites, request.use_cache,
+                             request.priority, request_tenant(http_request), request.time_budget_s)
+    sse = wants_sse(format, http_request.headers.get('accept'))
+    return StreamingResponse(
+        stream_job(job, serialize_business, sse=sse),
+        media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+        # Stop nginx-style proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/scrape/batch", status_code=202)
+async def create_batch_scrape(request: BatchRequest, http_request: Request):
+    """
+    Scrape many queries at once; places shared between queries are extracted
+    only once. Poll the status URL for per-query membership and results.
+    """
+    try:
+        batch = batch_manager.submit(request.queries, request.max_results, request.visit_websites,
+                                     request_tenant(http_request))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "batch_id": batch.id,
+        "total_queries": len(batch.queries),
+        "status_url": f"/scrape/batch/{batch.id}"
+    }
+
+
+@app.get("/scrape/batch/{batch_id}")
+async def get_batch_scrape(batch_id: str):
+    """Batch progress, each query's place IDs in rank order, and the places found so far"""
+    batch = batch_manager.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return FastJSONResponse(batch.to_dict(lambda r: serialize_business(r, r.get('search_query', ''))))
+
+
+@app.post("/jobs", status_code=202)
+async def create_scrape_job(request: SearchRequest, http_request: Request):
+    """Start a scrape in the background and return its job ID immediately"""
+    if request.callback_url:
+        try:
+            validate_callback_url(request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job = job_manager.submit(request.query, request.max_results, request.visit_websites, request.use_cache,
+                             request.priority, request_tenant(http_request), request.time_budget_s)
+    if request.callback_url:
+        JobWebhook(webhook_sender, job, request.callback_url, request.callback_chunk_size,
+                   lambda result: serialize_business(result, request.query)).attach()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "results_url": f"/jobs/{job.id}/results",
+        "deliveries_url": f"/jobs/{job.id}/deliveries" if request.callback_url else None
+    }
+
+
+@app.get("/queue")
+async def queue_stats():
+    """Worker slots, queue depth and wait times of the scrape executor"""
+    stats = job_manager.stats()
+    if work_queue is not None:
+        stats['work_queue'] = await asyncio.to_thread(work_queue.depth)
+    return stats
+
+
+@app.get("/cache")
+async def cache_stats():
+    """Result cache size and hit/miss counters"""
+    return job_manager.cache_stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: phase latency histograms, selector hits, queue and driver gauges"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/jobs/{job_id}")
+async def get_scrape_job(job_id: str):
+    """Job status, progress and the results extracted so far"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job.to_dict(include_results=True))
+
+
+@app.get("/jobs/{job_id}/deliveries")
+async def get_scrape_job_deliveries(job_id: str):
+    """Webhook delivery log of a job: every attempt with its status code or error"""
+    return {"job_id": job_id, "deliveries": webhook_sender.log(job_id)}
+
+
+@app.get("/jobs/{job_id}/results", response_model=SearchResponse)
+async def get_scrape_job_results(job_id: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                                 fields: Optional[str] = None):
+    """
+    Final results of a finished job. With cursor/limit/fields the results
+    are paged from the job store in rank order; follow next_cursor until it is null
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status}")
+    if job.status != 'failed' and (cursor or limit or fields):
+        return await get_scrape_job_results_page(job, cursor, limit or 100, fields)
+    if job.status == 'failed':
+        return search_response([], f"Scraping failed: {job.error}")
+
+    rows = build_business_rows(job.snapshot_results(), job.query)
+    return search_response(
+        rows,
+        f"Successfully scraped {len(rows)} businesses" if rows else "No results found or extraction failed",
+        partial=job.partial
+    )
+
+
+async def get_scrape_job_results_page(job, cursor, limit, fields):
+    """One page of stored results, optionally projected to some fields"""
+    try:
+        selected = select_fields(fields)
+        results, next_cursor = await asyncio.to_thread(job_manager.results_page, job, cursor, limit)
+    except (ValueError, InvalidCursorError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = project_rows(build_business_rows(results, job.query), selected)
+    return FastJSONResponse({
+        "success": True,
+        "job_id": job.id,
+        "data": rows,
+        "count": len(rows),
+        "total_results": len(job.results),
+        "next_cursor": next_cursor,
+        "message": f"Returned {len(rows)} of {len(job.results)} businesses"
+    })
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for the contact schema migration and /linked_data query builder
+Uses the SQLite stand-in, so no MySQL server is needed
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+
+from benchmark_contacts_db import create_tables, generate_rows, legacy_query
+from contacts_db import (LINKED_DATA_FIELDS, LINKEDIN_FIELDS, all_contacts, build_linked_data_query,
+                         build_linkedin_query, build_state_query, contacts_page, export_contacts, keyset)
+from contacts_schema import INDIA_TABLE, LINKEDIN_TABLE, STATE_TABLE, migrate, pending_migrations
+from db_pool import open_pool
+
+
+def _names(rows):
+    return sorted(row['Name'] for row in rows)
+
+
+def test_migration_keeps_results():
+    """Every filter combination returns the same rows through the indexed columns"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = open_pool('linkedin', f"sqlite:///{os.path.join(tmp, 'contacts.db')}", size=1)
+        create_tables(pool)
+        generate_rows(pool, 3000)
+        lookups = [
+            ('Bihar', 'Patna', 'steel furniture', 'India'),
+            ('KARNATAKA', None, 'Copper', None),
+            ('maharashtra', 'Pune', None, 'india'),
+            (None, None, 'bamboo handicrafts exporters', None),
+            (None, 'Gaya', None, None),
+        ]
+        before = [_names(pool.query(*legacy_query(*lookup))) for lookup in lookups]
+
+        assert migrate(pool) == [1, 2, 3, 4]
+        assert migrate(pool) == [] and pending_migrations(pool) == []
+        for lookup, expected in zip(lookups, before):
+            assert _names(pool.query(*build_linked_data_query(*lookup))) == expected, lookup
+        assert any(before), "lookups should match something"
+        assert _names(pool.query(*build_linked_data_query(' Maharashtra ', 'Pune', None, 'India '))) == before[2]
+
+        query, params = build_linked_data_query('Bihar', 'Patna', None, 'India')
+        plan = ' '.join(row['detail'] for row in pool.query("EXPLAIN QUERY PLAN " + query, params))
+        assert 'idx_india_location' in plan, plan
+        pool.close()
+    print("✅ Contact schema migration working!")
+
+
+def test_triggers_keep_categories_linked():
+    """Rows inserted, recategorized or deleted after the migration are found (or not) by keyword"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = open_pool('linkedin', f"sqlite:///{os.path.join(tmp, 'contacts.db')}", size=1)
+        create_tables(pool)
+        migrate(pool)
+
+        def find(keyword):
+            return _names(pool.query(*build_linked_data_query(category=keyword)))
+
+        pool.execute(f"INSERT INTO {INDIA_TABLE} (Name, City_1, admin_name, country, Category1, Category2) "
+                     f"VALUES (%s, %s, %s, %s, %s, %s)", ('New Bakery', 'Patna', 'Bihar', 'India', 'Bakery', 'Cafe'))
+        assert find('bakery') == ['New Bakery'] and find('CAFE') == ['New Bakery']
+        pool.execute(f"UPDATE {INDIA_TABLE} SET Category1 = %s WHERE Name = %s", ('Sweet Shop', 'New Bakery'))
+        assert find('bakery') == [] and find('sweet') == ['New Bakery']
+        pool.execute(f"DELETE FROM {INDIA_TABLE} WHERE Name = %s", ('New Bakery',))
+        assert find('sweet') == [] and pool.query("SELECT * FROM contact_category_links") == []
+        pool.close()
+
+
+def _migrated_pool(tmp, rows=2500):
+    pool = open_pool('linkedin', f"sqlite:///{os.path.join(tmp, 'contacts.db')}", size=2)
+    create_tables(pool)
+    generate_rows(pool, rows)
+    migrate(pool)
+    return pool
+
+
+def test_keyset_pages():
+    """Pages chain through every match in row_id order, with no overlap"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _migrated_pool(tmp)
+        query, params = build_linked_data_query('Bihar', None, None, 'India')
+        expected = [row['Name'] for row in pool.query(query + " ORDER BY d.row_id", params)]
+
+        names, after, pages = [], None, 0
+        while True:
+            page = contacts_page(pool, query, params, LINKED_DATA_FIELDS, after, limit=50, first_mobile=True)
+            names += [contact['name'] for contact in page['contacts']]
+            pages += 1
+            after = page['next_after']
+            if after is None:
+                break
+        assert names == expected and pages == len(expected) // 50 + 1
+        assert set(page['contacts'][0]) == set(LINKED_DATA_FIELDS)
+        pool.close()
+
+
+def test_streaming_export():
+    """NDJSON and CSV exports hold every match and give their connection back"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _migrated_pool(tmp)
+        pool.execute("INSERT INTO combined_excel_data_try1 (Name, Email_Id, `Mobile_No.`, City_1, Category1) "
+                     "VALUES (%s, %s, %s, %s, %s)",
+                     [(f'Shop {i}', f's{i}@example.com', '98765', 'Patna', 'Bakery') for i in range(2500)], many=True)
+        query, params = build_linkedin_query('bakery', 'Patna')
+
+        chunks = list(export_contacts(pool, query, params, LINKEDIN_FIELDS, 'ndjson'))
+        assert len(chunks) == 3, "one chunk per fetchmany batch"
+        contacts = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        assert len(contacts) == 2500 and contacts[0] == {
+            'name': 'Shop 0', 'email': 's0@example.com', 'mobile': '98765', 'city': 'Patna'}
+
+        text = b''.join(export_contacts(pool, query, params, LINKEDIN_FIELDS, 'csv', after=2000)).decode()
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert len(rows) == 500 and rows[0]['name'] == 'Shop 2000'
+        empty = b''.join(export_contacts(pool, *build_linkedin_query('nothing', 'Patna'), LINKEDIN_FIELDS, 'csv'))
+        assert empty == b'name,email,mobile,city\r\n'
+        assert pool.stats()['in_use'] == 0
+
+        # A client that disconnects mid-export: the connection holding unread rows is closed, not reused
+        abandoned = export_contacts(pool, query, params, LINKEDIN_FIELDS, 'ndjson')
+        next(abandoned)
+        assert pool.stats()['in_use'] == 1
+        abandoned.close()
+        assert pool.stats()['in_use'] == 0 and pool.stats()['idle'] == pool.stats()['open']
+        pool.close()
+    print("✅ Keyset pages and exports working!")
+
+
+def test_contact_key_dedup():
+    """Each endpoint's query returns one row per contact, the first one, and no empty rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = open_pool('linkedin', f"sqlite:///{os.path.join(tmp, 'contacts.db')}", size=1)
+        create_tables(pool)
+        migrate(pool)
+        # (name, email, mobile): the first three are one contact, then a different one, then an empty row
+        people = [
+            ('Ravi Traders', 'ravi@example.com', '9876500001'),
+            (' ravi traders', 'RAVI@example.com ', '9876500001, 9876500002'),
+            ('RAVI TRADERS', 'ravi@example.com', '9876500001,0612000000'),
+            ('Ravi Traders', 'ravi@example.com', '9876500003'),
+            (None, '', None),
+        ]
+        pool.execute(f"INSERT INTO {INDIA_TABLE} (Name, Email_Id, `Mobile_No.`, City_1, admin_name, country, "
+                     f"Category1) VALUES (%s, %s, %s, 'Patna', 'Bihar', 'India', 'Steel Furniture Dealers')",
+                     people, many=True)
+        pool.execute(f"INSERT INTO {STATE_TABLE} (Name, Email_Id, `Mobile_No.`, City_1, admin_name, country) "
+                     f"VALUES (%s, %s, %s, 'Patna', 'Bihar', 'India')", people, many=True)
+        pool.execute(f"INSERT INTO {LINKEDIN_TABLE} (Name, Email_Id, `Mobile_No.`, City_1, Category1) "
+                     f"VALUES (%s, %s, %s, 'Patna', 'Bakery')", people, many=True)
+
+        for query, params in (build_linked_data_query('bihar', 'Patna', 'steel', 'india'),
+                              build_state_query('India', 'Bihar'), build_linkedin_query('Bakery', 'Patna')):
+            contacts = all_contacts(pool, query, params, LINKEDIN_FIELDS)
+            assert [contact['mobile'] for contact in contacts] == ['9876500001', '9876500003'], contacts
+            assert contacts[0]['name'] == 'Ravi Traders'
+
+        contacts = all_contacts(pool, *build_linked_data_query(city='Patna'), LINKED_DATA_FIELDS, first_mobile=True)
+        assert len(contacts) == 2 and contacts[0]['category'] is None and contacts[1]['state'] == 'Bihar'
+        page = contacts_page(pool, *build_state_query('India', 'Bihar'), LINKEDIN_FIELDS, limit=1)
+        page = contacts_page(pool, *build_state_query('India', 'Bihar'), LINKEDIN_FIELDS, page['next_after'], 1)
+        assert [contact['mobile'] for contact in page['contacts']] == ['9876500003']
+
+        # A later row that repeats a contact is still not returned, whichever table it lands in
+        pool.execute(f"INSERT INTO {STATE_TABLE} (Name, Email_Id, `Mobile_No.`, admin_name, country) "
+                     f"VALUES (%s, %s, %s, 'Bihar', 'India')", ('ravi TRADERS', 'ravi@EXAMPLE.com', '9876500003'))
+        assert len(all_contacts(pool, *build_state_query('India', 'Bihar'), LINKEDIN_FIELDS)) == 2
+        # The first row of a contact that doesn't match the filters doesn't hide a later one that does
+        pool.execute(f"INSERT INTO {STATE_TABLE} (Name, Email_Id, `Mobile_No.`, admin_name, country) "
+                     f"VALUES (%s, %s, %s, %s, 'India')",
+                     [('Asha Stores', 'asha@example.com', '9000000001', 'Goa'),
+                      ('Asha Stores', 'asha@example.com', '9000000001', 'Bihar'),
+                      ('ASHA STORES', 'asha@example.com', '9000000001', 'Bihar')], many=True)
+        names = [contact['name'] for contact in all_contacts(pool, *build_state_query('India', 'Bihar'),
+                                                             LINKEDIN_FIELDS)]
+        assert names == ['Ravi Traders', 'Ravi Traders', 'Asha Stores'], names
+
+        # Pages check each row for an earlier duplicate on the index, with no GROUP BY over every match
+        query, params = keyset(*build_state_query('India', 'Bihar'), after=1, limit=10)
+        plan = ' '.join(row['detail'] for row in pool.query("EXPLAIN QUERY PLAN " + query, params))
+        assert 'idx_state_contact_key' in plan and 'GROUP BY' not in plan, plan
+        pool.close()
+    print("✅ Contact key deduplication working!")
+
+
+if __name__ == "__main__":
+    test_migration_keeps_results()
+    test_triggers_keep_categories_linked()
+    test_keyset_pages()
+    test_streaming_export()
+    test_contact_key_dedup()
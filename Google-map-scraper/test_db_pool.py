@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the contact database connection pool
+Uses the SQLite stand-in, so no MySQL server is needed
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from db_pool import POOL_TIMEOUTS, PoolTimeoutError, QueryTimeoutError, open_pool
+
+
+# Counts to ten million: several seconds of work for SQLite
+SLOW_QUERY = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 10000000)
+    SELECT COUNT(*) AS total FROM n
+"""
+
+
+def _pool(tmp, **kwargs):
+    pool = open_pool('linkedin', f"sqlite:///{os.path.join(tmp, 'contacts.db')}", **kwargs)
+    connects = []
+    connect = pool.backend.connect
+    pool.backend.connect = lambda: connects.append(1) or connect()
+    return pool, connects
+
+
+def test_connections_are_reused():
+    """Many concurrent queries share at most `size` connections"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool, connects = _pool(tmp, size=3)
+        with pool.connection() as conn:
+            conn.execute('CREATE TABLE merged_city_data ("Name" TEXT, country TEXT, admin_name TEXT)')
+            conn.executemany("INSERT INTO merged_city_data VALUES (?, ?, ?)",
+                             [(f'Shop {i}', 'India', 'Bihar') for i in range(20)])
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(pool.query(
+                "SELECT * FROM merged_city_data WHERE country = %s AND admin_name = %s", ('India', 'Bihar'))))
+            for _ in range(30)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 30 and all(len(rows) == 20 for rows in results)
+        assert results[0][0] == {'Name': 'Shop 0', 'country': 'India', 'admin_name': 'Bihar'}
+        stats = pool.stats()
+        assert len(connects) <= 3 and stats['open'] <= 3 and stats['in_use'] == 0
+        assert stats['checkouts'] == 31
+        pool.close()
+    print("✅ Connection reuse working!")
+
+
+def test_checkout_timeout():
+    """With every connection busy, a request fails after the checkout timeout"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool, _ = _pool(tmp, size=1, checkout_timeout=0.2)
+        before = POOL_TIMEOUTS.value(pool='linkedin')
+        with pool.connection():
+            start = time.time()
+            try:
+                pool.query("SELECT 1 AS one")
+                raise AssertionError("query ran without a free connection")
+            except PoolTimeoutError:
+                pass
+            assert 0.15 < time.time() - start < 1
+        assert pool.query_one("SELECT 1 AS one") == {'one': 1}, "the connection came back"
+        assert POOL_TIMEOUTS.value(pool='linkedin') == before + 1
+        assert pool.health()['healthy']
+        pool.close()
+
+
+def test_health_check_replaces_dead_connections():
+    """An idle connection the server dropped is replaced before anyone uses it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool, connects = _pool(tmp, size=1, health_check_interval=0)
+        with pool.connection() as conn:
+            pass
+        conn.close()  # What a server-side wait_timeout does to an idle connection
+        time.sleep(0.01)
+        assert pool.query_one("SELECT 1 AS one") == {'one': 1}
+        assert pool.stats()['replaced'] == 1 and len(connects) == 2
+        pool.close()
+
+
+def test_query_timeout():
+    """A runaway query is stopped and its connection stays usable"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool, connects = _pool(tmp, size=1, query_timeout=0.2)
+        start = time.time()
+        try:
+            pool.query(SLOW_QUERY)
+            raise AssertionError("slow query was not stopped")
+        except QueryTimeoutError:
+            pass
+        assert time.time() - start < 2
+        assert pool.query_one("SELECT 1 AS one") == {'one': 1}
+        assert len(connects) == 1
+        pool.close()
+    print("✅ Query timeouts working!")
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_checkout_timeout()
+    test_health_check_replaces_dead_connections()
+    test_query_timeout()
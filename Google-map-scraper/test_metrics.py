@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script for the Prometheus metrics registry
+"""
+
+from metrics import Registry, RateWindow
+
+
+def test_render_exposition_format():
+    """Counters, callback gauges and cumulative histogram buckets render as Prometheus text"""
+    registry = Registry()
+    hits = registry.counter('selector_hits_total', 'Selector hits', ['field'])
+    registry.gauge('queue_depth', 'Jobs waiting', callback=lambda: 3)
+    phases = registry.histogram('phase_seconds', 'Phase latency', ['phase'], buckets=(1, 5))
+
+    hits.inc(field='name')
+    hits.inc(2, field='name')
+    for seconds in (0.5, 1, 3, 10):
+        phases.observe(seconds, phase='harvest')
+    with phases.time(phase='search'):
+        pass
+
+    text = registry.render()
+    assert '# TYPE selector_hits_total counter' in text
+    assert 'selector_hits_total{field="name"} 3' in text
+    assert 'queue_depth 3' in text
+    assert 'phase_seconds_bucket{phase="harvest",le="1"} 2' in text
+    assert 'phase_seconds_bucket{phase="harvest",le="5"} 3' in text
+    assert 'phase_seconds_bucket{phase="harvest",le="+Inf"} 4' in text
+    assert 'phase_seconds_sum{phase="harvest"} 14.5' in text
+    assert phases.count(phase='search') == 1
+
+    try:
+        hits.inc(selector='h1')
+        raise AssertionError("wrong labels accepted")
+    except ValueError:
+        pass
+    print("✅ Metrics rendering working!")
+
+
+def test_rate_window():
+    rate = RateWindow(window=60)
+    for _ in range(30):
+        rate.mark()
+    assert rate.per_minute() == 30
+
+
+if __name__ == "__main__":
+    test_render_exposition_format()
+    test_rate_window()
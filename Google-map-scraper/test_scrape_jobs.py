@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+Test script for the background scrape job manager
+Uses a fake scraper, so no Chrome is needed
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+from batch_scrape import BatchManager
+from checkpoints import CheckpointStore
+from fair_queue import FairQueue
+from job_store import InvalidCursorError, JobResultStore
+from job_stream import stream_job
+from result_cache import ResultCache, cache_key
+from scrape_jobs import JobManager, QueueFullError
+
+
+def _temp_store():
+    """A throwaway result store, so tests never write into the repo's job_store.db"""
+    return JobResultStore(os.path.join(tempfile.mkdtemp(), 'job_store.db'))
+
+
+def fake_scrape(query, max_results, visit_websites, progress_callback=None, skip_links=None):
+    """Pretends to scrape: emits the same events as the optimized scraper"""
+    progress_callback('links', {'links_found': max_results})
+    results = []
+    for i in range(1, max_results + 1):
+        if f'https://maps/{i}' in (skip_links or ()):
+            continue
+        time.sleep(0.05)
+        result = {'name': f'{query} #{i}', 'address': 'Somewhere', 'google_maps_url': f'https://maps/{i}'}
+        results.append(result)
+        progress_callback('result', {'result': result})
+        progress_callback('progress', {'processed': i, 'total': max_results, 'extracted': i})
+    return results
+
+
+def failing_scrape(query, max_results, visit_websites, progress_callback=None):
+    raise RuntimeError("Chrome crashed")
+
+
+def checkpointed_scrape(visited, crash_after=None, killed=None):
+    """Fake scraper using a checkpoint; hangs after `crash_after` page loads like a killed process"""
+    def scrape(query, max_results, visit_websites, progress_callback=None, skip_links=None, checkpoint=None,
+               time_budget=None):
+        links = checkpoint.links_for(max_results)
+        if links is None:
+            # Like the optimized scraper: harvest for the whole job, extract this slice
+            visited.append('search')
+            harvest = max(max_results, checkpoint.harvest_target)
+            links = [f'https://maps/{i}' for i in range(1, harvest + 1)]
+            checkpoint.save_links(links, harvest)
+            links = links[:max_results]
+        progress_callback('links', {'links_found': len(links)})
+
+        completed = checkpoint.completed()
+        results = [completed[link] for link in links if completed.get(link)]
+        for result in results:
+            progress_callback('result', {'result': result})
+        for link in links:
+            if link in completed:
+                continue
+            if crash_after is not None and len(visited) > crash_after:
+                killed.wait()
+                raise RuntimeError("process killed")
+            visited.append(link)
+            result = {'name': f'{query} {link[-1]}', 'google_maps_url': link}
+            checkpoint.mark_done(link, result)
+            results.append(result)
+            progress_callback('result', {'result': result})
+        return results
+    return scrape
+
+
+def test_job_lifecycle():
+    """Submit returns immediately; status shows progress; results arrive at the end"""
+    manager = JobManager(scrape_fn=fake_scrape, max_workers=1, store=_temp_store())
+
+    start = time.time()
+    job = manager.submit("cafes in Patna", max_results=10, visit_websites=False)
+    assert time.time() - start < 0.1, "submit must not wait for the scrape"
+    assert manager.get(job.id) is job
+
+    time.sleep(0.25)
+    status = job.to_dict(include_results=True)
+    assert status['status'] == 'running', status
+    assert 0 < len(status['results']) < 10, "partial results should be visible"
+    assert status['progress']['total'] == 10
+
+    job.future.result(timeout=5)
+    assert job.status == 'completed'
+    assert len(job.snapshot_results()) == 10
+    assert job.to_dict()['progress']['stage'] == 'done'
+    manager.shutdown()
+
+    failing = JobManager(scrape_fn=failing_scrape, store=_temp_store())
+    job = failing.submit("anything")
+    job.future.result(timeout=5)
+    assert job.status == 'failed' and job.error == 'Chrome crashed'
+    failing.shutdown()
+    print("✅ Job lifecycle working!")
+
+
+def test_queue_backpressure():
+    """One worker + two queue slots: the fourth submit is rejected with a retry hint"""
+    manager = JobManager(scrape_fn=fake_scrape, max_workers=1, queue_size=2, store=_temp_store())
+
+    jobs = [manager.submit("query 0", max_results=4, visit_websites=False)]
+    while jobs[0].status == 'queued':
+        time.sleep(0.01)
+    jobs += [manager.submit(f"query {i}", max_results=4, visit_websites=False) for i in (1, 2)]
+    stats = manager.stats()
+    assert stats['busy_workers'] == 1 and stats['queue_depth'] == 2, stats
+
+    try:
+        manager.submit("one too many", max_results=4)
+        raise AssertionError("submit should have been rejected")
+    except QueueFullError as e:
+        assert e.retry_after >= 1
+
+    for job in jobs:
+        job.future.result(timeout=5)
+    stats = manager.stats()
+    assert stats['rejected'] == 1 and stats['completed'] == 3, stats
+    assert stats['max_wait_seconds'] >= 0.2, "queued jobs should have waited"
+    manager.shutdown()
+    print("✅ Queue backpressure working!")
+
+
+def test_stream_job():
+    """Results stream one by one, interleaved with progress, ending in a summary"""
+    manager = JobManager(scrape_fn=fake_scrape, max_workers=1, store=_temp_store())
+    job = manager.submit("cafes in Patna", max_results=5, visit_websites=False)
+
+    async def collect():
+        lines = []
+        async for line in stream_job(job, lambda result, query: result, poll_interval=0.01):
+            lines.append((time.time(), json.loads(line)))
+        return lines
+
+    lines = asyncio.run(collect())
+    events = [event['event'] for _, event in lines]
+    assert events[0] == 'job' and events[-1] == 'summary', events
+    assert events.count('result') == 5
+
+    results = [(t, event['data']) for t, event in lines if event['event'] == 'result']
+    assert results[-1][0] - results[0][0] >= 0.15, "results should arrive incrementally"
+    assert [data['index'] for _, data in results] == list(range(5))
+
+    progress = [event['data'] for _, event in lines if event['event'] == 'progress']
+    assert progress[-1]['processed'] == 5 and progress[-1]['rate_per_minute'] > 0
+    assert lines[-1][1]['data']['total_results'] == 5
+    manager.shutdown()
+
+    # A scraper that only returns its list (app.py's extractor) still streams every row before the summary
+    def quiet_scrape(query, max_results, visit_websites, progress_callback=None):
+        return [{'name': f'{query} #{i}', 'google_maps_url': f'https://maps/{i}'} for i in range(1, max_results + 1)]
+
+    manager = JobManager(scrape_fn=quiet_scrape, max_workers=1, store=_temp_store())
+    job = manager.submit("gyms in Goa", max_results=2, visit_websites=False)
+    events = [event for _, event in asyncio.run(collect())]
+    assert [event['event'] for event in events if event['event'] in ('result', 'summary')] == \
+        ['result', 'result', 'summary'], events
+    assert [event['data']['result']['name'] for event in events[:-1] if event['event'] == 'result'] == \
+        ['gyms in Goa #1', 'gyms in Goa #2']
+    manager.shutdown()
+    print("✅ Job streaming working!")
+
+
+def test_result_cache():
+    """Keys normalize, TTL expires, LRU evicts"""
+    assert cache_key(" Restaurants  in New York. ", "20:maps") == cache_key("restaurants in new york", "20:maps")
+    assert cache_key("cafes", "20:maps") != cache_key("cafes", "20:websites")
+
+    cache = ResultCache(ttl=60, stale_ttl=60, max_entries=2)
+    for name in ('a', 'b', 'c'):
+        cache.put(name, [{'name': name}])
+    assert cache.get('a') is None, "oldest entry should be evicted"
+    assert cache.get('c').results == [{'name': 'c'}]
+
+    cache.ttl = 0
+    assert cache.get('c').stale
+    cache.stale_ttl = 0
+    time.sleep(0.01)
+    assert cache.get('c') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['misses'], stats['evictions']) == (1, 1, 2, 1), stats
+
+
+def test_cached_submit():
+    """A repeated query is answered instantly; a stale hit triggers one background refresh"""
+    manager = JobManager(scrape_fn=fake_scrape, max_workers=1, store=_temp_store())
+    first = manager.submit("cafes in Patna", max_results=3, visit_websites=False)
+    first.future.result(timeout=5)
+
+    start = time.time()
+    again = manager.submit("Cafes in  Patna", max_results=3, visit_websites=False)
+    assert time.time() - start < 0.05
+    assert again.cached and again.finished and len(again.future.result()) == 3
+    forced = manager.submit("cafes in Patna", max_results=3, visit_websites=False, use_cache=False)
+    assert not forced.cached
+    forced.future.result(timeout=5)
+
+    manager.cache.ttl = 0
+    stale = manager.submit("cafes in Patna", max_results=3, visit_websites=False)
+    manager.submit("cafes in Patna", max_results=3, visit_websites=False)
+    assert stale.cached and manager.refreshes == 1
+    assert manager.cache_stats()['stale_hits'] == 2
+    manager.shutdown()
+    print("✅ Result cache working!")
+
+
+def test_single_flight():
+    """Identical concurrent requests share one scrape and one result stream"""
+    calls = []
+
+    def counting_scrape(query, max_results, visit_websites, progress_callback=None):
+        calls.append(query)
+        return fake_scrape(query, max_results, visit_websites, progress_callback)
+
+    manager = JobManager(scrape_fn=counting_scrape, max_workers=2, store=_temp_store())
+    leader = manager.submit("cafes in Patna", max_results=5, visit_websites=False)
+    followers = [manager.submit("CAFES in patna", max_results=5, visit_websites=False) for _ in range(3)]
+    other = manager.submit("cafes in Patna", max_results=5, visit_websites=True)
+
+    assert all(f is leader for f in followers) and other is not leader
+    assert leader.subscribers == 4
+    stats = manager.stats()
+    assert stats['coalesced_requests'] == 3
+    assert {j['job_id']: j['subscribers'] for j in stats['in_flight']}[leader.id] == 4
+
+    leader.future.result(timeout=5)
+    other.future.result(timeout=5)
+    assert len(calls) == 2
+    assert manager.stats()['in_flight'] == []
+    manager.shutdown()
+    print("✅ Single-flight working!")
+
+
+def test_result_count_containment():
+    """Smaller counts come from a larger job's prefix; larger counts extend the cache"""
+    calls = []
+
+    def recording_scrape(query, max_results, visit_websites, progress_callback=None, skip_links=None):
+        calls.append((max_results, len(skip_links or ())))
+        return fake_scrape(query, max_results, visit_websites, progress_callback, skip_links)
+
+    manager = JobManager(scrape_fn=recording_scrape, max_workers=2, store=_temp_store())
+    big = manager.submit("cafes in Patna", max_results=10, visit_websites=False)
+    small = manager.submit("cafes in patna", max_results=3, visit_websites=False)
+    assert small is not big and not small.finished
+
+    # The small request finishes as soon as the big one has extracted 3
+    assert [r['name'] for r in small.future.result(timeout=5)] == [f'cafes in Patna #{i}' for i in (1, 2, 3)]
+    assert not big.finished and big.subscribers == 2
+    big.future.result(timeout=5)
+
+    cached = manager.submit("cafes in Patna", max_results=4, visit_websites=False)
+    assert cached.cached and len(cached.results) == 4
+
+    start = time.time()
+    extended = manager.submit("cafes in Patna", max_results=13, visit_websites=False)
+    assert len(extended.future.result(timeout=5)) == 13
+    assert time.time() - start < 0.4, "only the 3 new businesses should be extracted"
+    assert [r['google_maps_url'] for r in extended.results] == [f'https://maps/{i}' for i in range(1, 14)]
+    assert calls == [(10, 0), (13, 10)]
+    assert manager.cache_stats()['extended_scrapes'] == 1
+    manager.shutdown()
+
+    # A scraper that reports no links count: 5 results for 5 asked doesn't mean the search had only 5
+    def quiet_scrape(query, max_results, visit_websites, progress_callback=None, skip_links=None):
+        return [{'name': f'{query} #{i}', 'google_maps_url': f'https://maps/{i}'}
+                for i in range(1, max_results + 1) if f'https://maps/{i}' not in (skip_links or ())]
+
+    manager = JobManager(scrape_fn=quiet_scrape, max_workers=1, store=_temp_store())
+    manager.submit("spas in Goa", max_results=5, visit_websites=False).future.result(timeout=5)
+    larger = manager.submit("spas in Goa", max_results=8, visit_websites=False)
+    assert not larger.cached and len(larger.future.result(timeout=5)) == 8
+    manager.shutdown()
+    print("✅ Result-count containment working!")
+
+
+def test_paginated_results():
+    """Pages follow rank order, cursors chain to the end and are bound to their job"""
+    store = JobResultStore(os.path.join(tempfile.mkdtemp(), 'job_store.db'))
+    manager = JobManager(scrape_fn=fake_scrape, max_workers=1, store=store)
+    job = manager.submit("cafes in Patna", max_results=7, visit_websites=False)
+    job.future.result(timeout=5)
+    assert store.count(job.id) == 7
+
+    pages, cursor = [], None
+    while True:
+        results, cursor = manager.results_page(job, cursor, limit=3)
+        pages.append([r['google_maps_url'] for r in results])
+        if not cursor:
+            break
+    assert [len(p) for p in pages] == [3, 3, 1]
+    assert sum(pages, []) == [f'https://maps/{i}' for i in range(1, 8)]
+
+    _, cursor = store.page(job.id, limit=2)
+    for job_id, bad_cursor in (('another-job', cursor), (job.id, 'not-a-cursor')):
+        try:
+            store.page(job_id, bad_cursor)
+            raise AssertionError("bad cursor accepted")
+        except InvalidCursorError:
+            pass
+    manager.shutdown()
+    store.close()
+    print("✅ Paginated results working!")
+
+
+def test_fair_share():
+    """Interactive work gets most turns, and tenants of one class share by weight"""
+    fair = FairQueue(maxsize=10, tenant_weights={'big': 2})
+    for i in range(3):
+        fair.put_nowait(f'batch-{i}', priority='batch', tenant='acme', cost=25)
+    for i in range(4):
+        fair.put_nowait(f'big-{i}', tenant='big', cost=5)
+    for i in range(2):
+        fair.put_nowait(f'small-{i}', tenant='small', cost=5)
+
+    order = [fair.get() for _ in range(9)]
+    # Batch gets one early turn, then waits until interactive has used its 8x share
+    assert order == ['big-0', 'batch-0', 'small-0', 'big-1', 'big-2', 'small-1', 'big-3',
+                     'batch-1', 'batch-2'], order
+    fair.close()
+    assert fair.get() is None
+    print("✅ Fair share working!")
+
+
+def test_sliced_job_yields():
+    """A large batch job gives its slot to interactive work between slices"""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = JobManager(scrape_fn=fake_scrape, max_workers=1, cache=ResultCache(), slice_size=3,
+                             store=JobResultStore(os.path.join(tmp, 'jobs.db')))
+        batch = manager.submit("gyms", 9, visit_websites=False, priority='batch')
+        time.sleep(0.05)
+        preview = manager.submit("cafes", 2, visit_websites=False, tenant='someone-else')
+        assert preview.priority == 'interactive'
+
+        preview.future.result(timeout=5)
+        assert not batch.finished, "the preview should not wait for the whole batch job"
+        batch.future.result(timeout=10)
+        assert batch.status == 'completed'
+        assert [r['name'] for r in batch.results] == [f'gyms #{i}' for i in range(1, 10)]
+        assert batch.to_dict()['slices'] == 2
+        manager.shutdown()
+
+        # A scraper that never reports its links is still run to max_results, not stopped after one slice
+        def quiet_scrape(query, max_results, visit_websites, progress_callback=None, skip_links=None):
+            return [{'name': f'{query} #{i}', 'google_maps_url': f'https://maps/{i}'}
+                    for i in range(1, max_results + 1) if f'https://maps/{i}' not in (skip_links or ())]
+
+        manager = JobManager(scrape_fn=quiet_scrape, max_workers=1, cache=ResultCache(), slice_size=3,
+                             store=JobResultStore(os.path.join(tmp, 'quiet.db')))
+        quiet = manager.submit("spas", 7, visit_websites=False)
+        assert len(quiet.future.result(timeout=5)) == 7 and quiet.slices == 2
+        manager.shutdown()
+
+        # With a checkpoint, the slices share one search
+        visited = []
+        manager = JobManager(scrape_fn=checkpointed_scrape(visited), max_workers=1, cache=ResultCache(),
+                             slice_size=2, store=JobResultStore(os.path.join(tmp, 'sliced.db')),
+                             checkpoints=CheckpointStore(os.path.join(tmp, 'checkpoints.db')))
+        sliced = manager.submit("bakeries", 6, visit_websites=False)
+        assert len(sliced.future.result(timeout=5)) == 6 and sliced.slices == 2
+        assert visited == ['search'] + [f'https://maps/{i}' for i in range(1, 7)], visited
+        manager.shutdown()
+    print("✅ Sliced jobs working!")
+
+
+def test_resume_from_checkpoint():
+    """A job interrupted mid-run resumes under its ID without searching or revisiting links"""
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = CheckpointStore(os.path.join(tmp, 'checkpoints.db'))
+        visited, killed = [], threading.Event()
+        crashed = JobManager(scrape_fn=checkpointed_scrape(visited, crash_after=3, killed=killed), max_workers=1,
+                             cache=ResultCache(), store=JobResultStore(os.path.join(tmp, 'a.db')),
+                             slice_size=0, checkpoints=checkpoints)
+        job = crashed.submit("florists", 6, visit_websites=False)
+        deadline = time.time() + 5
+        while len(visited) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        assert visited == ['search', 'https://maps/1', 'https://maps/2', 'https://maps/3']
+
+        # A new process starts on the same checkpoint file
+        resumed_visits = []
+        restarted = JobManager(scrape_fn=checkpointed_scrape(resumed_visits), max_workers=1,
+                               cache=ResultCache(), store=JobResultStore(os.path.join(tmp, 'b.db')),
+                               slice_size=0, checkpoints=CheckpointStore(checkpoints.path))
+        [resumed] = restarted.resume_interrupted()
+        assert resumed.id == job.id and restarted.get(job.id) is resumed
+        resumed.future.result(timeout=5)
+        assert resumed_visits == ['https://maps/4', 'https://maps/5', 'https://maps/6']
+        assert [r['google_maps_url'] for r in resumed.results] == [f'https://maps/{i}' for i in range(1, 7)]
+        assert restarted.resume_interrupted() == [], "finished jobs drop their checkpoint"
+
+        killed.set()
+        crashed.shutdown()
+        restarted.shutdown()
+    print("✅ Checkpoint resume working!")
+
+
+def test_failed_job_keeps_checkpoint():
+    """A scraper crash keeps the checkpoint: a resubmit or the next start continues from it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = CheckpointStore(os.path.join(tmp, 'checkpoints.db'))
+        crashed = threading.Event()
+        crashed.set()
+        visited = []
+        manager = JobManager(scrape_fn=checkpointed_scrape(visited, crash_after=2, killed=crashed), max_workers=1,
+                             cache=ResultCache(), store=JobResultStore(os.path.join(tmp, 'a.db')),
+                             slice_size=0, checkpoints=checkpoints)
+        failed = manager.submit("florists", 5, visit_websites=False)
+        failed.future.result(timeout=5)
+        assert failed.status == 'failed' and visited == ['search', 'https://maps/1', 'https://maps/2']
+
+        retry_visits = []
+        manager.scrape_fn = checkpointed_scrape(retry_visits)
+        retry = manager.submit("florists", 5, visit_websites=False)
+        assert len(retry.future.result(timeout=5)) == 5 and retry.status == 'completed'
+        assert retry_visits == ['https://maps/3', 'https://maps/4', 'https://maps/5'], retry_visits
+
+        # A budgeted job that fails is resumed on the next start with its budget
+        manager.scrape_fn = checkpointed_scrape([], crash_after=0, killed=crashed)
+        budgeted = manager.submit("gyms", 3, visit_websites=False, time_budget_s=60)
+        budgeted.future.result(timeout=5)
+        assert budgeted.status == 'failed'
+        restarted = JobManager(scrape_fn=checkpointed_scrape([]), max_workers=1, cache=ResultCache(),
+                               store=JobResultStore(os.path.join(tmp, 'b.db')), slice_size=0,
+                               checkpoints=CheckpointStore(checkpoints.path))
+        [resumed] = restarted.resume_interrupted()
+        assert resumed.id == budgeted.id and resumed.time_budget_s == 60 and resumed.budget
+        assert len(resumed.future.result(timeout=5)) == 3
+        manager.shutdown()
+        restarted.shutdown()
+    print("✅ Failed job checkpoints working!")
+
+
+def overlapping_scrape(loads):
+    """Fake scraper where 'north' finds places 1-5 and 'south' places 3-7, under search-specific URLs"""
+    def scrape(query, max_results, visit_websites, progress_callback=None, claim_link=None):
+        first = 1 if 'north' in query else 3
+        results = []
+        for i in range(first, first + 5):
+            link = f'https://www.google.com/maps/place/P{i}/data=!3m1!1s0x{i:x}:0x{i * 7:x}!8m2?authuser=0&q={query}'
+            if claim_link and not claim_link(link):
+                continue
+            loads.append(link)
+            result = {'name': f'Place {i}', 'address': 'Somewhere', 'google_maps_url': link, 'search_query': query}
+            results.append(result)
+            progress_callback('result', {'result': result})
+        return results
+    return scrape
+
+
+def budgeted_scrape(query, max_results, visit_websites, progress_callback=None, time_budget=None):
+    """Fake scraper that extracts one business every 0.1s until its time budget runs out"""
+    progress_callback('links', {'links_found': max_results})
+    results = []
+    for i in range(1, max_results + 1):
+        if time_budget and time_budget.remaining() < 0.1:
+            progress_callback('partial', {'reason': f'deadline reached after {len(results)} businesses'})
+            break
+        time.sleep(0.1)
+        result = {'name': f'{query} #{i}', 'address': 'Somewhere', 'google_maps_url': f'https://maps/{i}'}
+        results.append(result)
+        progress_callback('result', {'result': result})
+    return results
+
+
+def test_time_budget():
+    """A budgeted job returns what it has at the deadline, flagged partial and never cached"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache()
+        manager = JobManager(scrape_fn=budgeted_scrape, max_workers=1, cache=cache,
+                             store=JobResultStore(os.path.join(tmp, 'jobs.db')))
+        started = time.time()
+        job = manager.submit("bakeries", 50, visit_websites=False, time_budget_s=0.5)
+        job.future.result(timeout=5)
+        assert time.time() - started < 1.5
+        assert job.status == 'completed' and job.partial
+        assert 0 < len(job.results) < 50
+        assert job.to_dict()['partial'] and job.summary()['partial']
+        assert cache.get(job.cache_key, 50) is None, "partial results must not be cached"
+
+        # Without a budget the request doesn't attach to a budgeted job that may stop early
+        slow = manager.submit("bakeries", 50, visit_websites=False, time_budget_s=0.3)
+        full = manager.submit("bakeries", 50, visit_websites=False)
+        assert full is not slow
+        try:
+            manager.submit("bakeries", 5, time_budget_s=0)
+            raise AssertionError("zero budget accepted")
+        except ValueError:
+            pass
+        manager.shutdown()
+
+        # A budgeted request for a scrape already running without one keeps its own deadline
+        manager = JobManager(scrape_fn=budgeted_scrape, max_workers=1, cache=ResultCache(),
+                             store=JobResultStore(os.path.join(tmp, 'jobs2.db')))
+        unbudgeted = manager.submit("florists", 20, visit_websites=False)
+        time.sleep(0.25)
+        started = time.time()
+        rushed = manager.submit("florists", 20, visit_websites=False, time_budget_s=0.4)
+        assert rushed is not unbudgeted and manager.coalesced == 1
+        rushed.future.result(timeout=5)
+        assert time.time() - started < 1 and rushed.partial and 0 < len(rushed.results) < 20
+        unbudgeted.future.result(timeout=5)
+        assert len(unbudgeted.results) == 20 and not unbudgeted.partial
+        manager.shutdown()
+    print("✅ Time budgets working!")
+
+
+def test_batch_dedup():
+    """Each place in a batch is loaded once, and every query still lists all its places"""
+    loads = []
+    manager = JobManager(scrape_fn=overlapping_scrape(loads), max_workers=2, cache=ResultCache(),
+                         store=_temp_store())
+    batches = BatchManager(manager)
+    batch = batches.submit(['cafes north', 'cafes south', 'Cafes  North'], max_results=5, visit_websites=False)
+    deadline = time.time() + 5
+    while not batch.finished and time.time() < deadline:
+        time.sleep(0.02)
+
+    data = batch.to_dict()
+    assert data['status'] == 'completed' and data['total_queries'] == 2, "duplicate queries are merged"
+    assert len(loads) == 7 and data['page_loads'] == 7 and data['duplicates_skipped'] == 3
+    assert data['total_places'] == 7
+    north, south = data['queries']
+    assert north['place_ids'] == [f'0x{i:x}:0x{i * 7:x}' for i in range(1, 6)]
+    assert south['place_ids'] == [f'0x{i:x}:0x{i * 7:x}' for i in range(3, 8)]
+    assert batches.get(batch.id) is batch
+    try:
+        batches.submit(['  '])
+        raise AssertionError("empty batch accepted")
+    except ValueError:
+        pass
+    manager.shutdown()
+    print("✅ Batch dedup working!")
+
+
+def test_batch_lane():
+    """A batch larger than the queue waits in its own lane: interactive submits are still admitted"""
+    def scrape(query, max_results, visit_websites, progress_callback=None, claim_link=None):
+        return fake_scrape(query, max_results, visit_websites, progress_callback)
+
+    manager = JobManager(scrape_fn=scrape, max_workers=1, queue_size=2, batch_queue_size=40,
+                         cache=ResultCache(), store=_temp_store())
+    batches = BatchManager(manager)
+    batch = batches.submit([f'query {i}' for i in range(30)], max_results=2, visit_websites=False)
+
+    interactive = [manager.submit(f"cafes {i}", max_results=2, visit_websites=False) for i in range(2)]
+    stats = manager.stats()
+    assert stats['batch_queue_depth'] >= 29 and stats['rejected'] == 0, stats
+    try:
+        batches.submit([f'more {i}' for i in range(20)], max_results=2)
+        raise AssertionError("batch lane overfilled")
+    except QueueFullError:
+        pass
+
+    for job in interactive:
+        assert len(job.future.result(timeout=10)) == 2
+    assert not batch.finished, "interactive jobs should not wait for the whole batch"
+    manager.shutdown()
+    print("✅ Batch lane working!")
+
+
+if __name__ == "__main__":
+    test_job_lifecycle()
+    test_queue_backpressure()
+    test_stream_job()
+    test_result_cache()
+    test_cached_submit()
+    test_single_flight()
+    test_result_count_containment()
+    test_paginated_results()
+    test_fair_share()
+    test_sliced_job_yields()
+    test_resume_from_checkpoint()
+    test_failed_job_keeps_checkpoint()
+    test_time_budget()
+    test_batch_dedup()
+    test_batch_lane()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for webhook delivery
+Runs a local HTTP receiver as the client's callback endpoint
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from job_store import JobResultStore
+from result_cache import ResultCache
+from scrape_jobs import JobManager
+from test_scrape_jobs import fake_scrape
+from webhooks import SIGNATURE_HEADER, JobWebhook, WebhookSender, verify_signature
+
+
+SECRET = 'test-secret'
+
+
+class Receiver:
+    """Local callback endpoint that fails the first `failures` requests with a 503"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.received = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if receiver.failures:
+                    receiver.failures -= 1
+                    self.send_response(503)
+                else:
+                    assert verify_signature(body, self.headers[SIGNATURE_HEADER], SECRET)
+                    receiver.received.append(json.loads(body))
+                    self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hook'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def wait_for(self, count, timeout=10):
+        deadline = time.time() + timeout
+        while len(self.received) < count and time.time() < deadline:
+            time.sleep(0.02)
+        return self.received
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _manager(tmp):
+    return JobManager(scrape_fn=fake_scrape, max_workers=1, cache=ResultCache(),
+                      store=JobResultStore(os.path.join(tmp, 'jobs.db')))
+
+
+def test_chunked_delivery_with_retries():
+    """Chunks arrive as results stream in, a failing receiver is retried, every attempt is logged"""
+    receiver = Receiver(failures=2)
+    sender = WebhookSender(workers=2, secret=SECRET, base_delay=0.05)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = _manager(tmp)
+        job = manager.submit('cafes', 5, visit_websites=False)
+        JobWebhook(sender, job, receiver.url, chunk_size=2).attach()
+
+        received = sorted(receiver.wait_for(3), key=lambda payload: payload['sequence'])
+        assert [p['event'] for p in received] == ['job.results', 'job.results', 'job.completed']
+        assert [p['offset'] for p in received] == [0, 2, 4]
+        assert [r['name'] for p in received for r in p['results']] == [f'cafes #{i}' for i in range(1, 6)]
+        assert received[-1]['summary']['total_results'] == 5
+
+        log = sender.log(job.id)
+        assert all(d['status'] == 'delivered' for d in log)
+        assert sum(len(d['attempts']) for d in log) == 5, "two 503s were retried"
+        assert any(a['status_code'] == 503 for d in log for a in d['attempts'])
+        manager.shutdown()
+    sender.shutdown()
+    receiver.close()
+    print("✅ Chunked webhooks working!")
+
+
+def test_gives_up_after_max_attempts():
+    """Deliveries to a dead endpoint stop after max_attempts and are logged as failed"""
+    sender = WebhookSender(workers=1, secret=SECRET, max_attempts=3, base_delay=0.01)
+    delivery = sender.send('job-1', 'http://127.0.0.1:9/unreachable', {'event': 'job.completed'})
+    deadline = time.time() + 5
+    while delivery['status'] != 'failed' and time.time() < deadline:
+        time.sleep(0.02)
+    assert delivery['status'] == 'failed' and len(delivery['attempts']) == 3
+    assert sender.stats()['failed'] == 1
+    sender.shutdown()
+
+
+if __name__ == "__main__":
+    test_chunked_delivery_with_retries()
+    test_gives_up_after_max_attempts()
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Test script for website enrichment against a local HTTP server
+No Chrome or internet access needed
+"""
+
+import os
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from host_scheduler import HostScheduler, RobotsCache
+from website_cache import WebsiteCache, normalize_cache_key
+from website_enricher import WebsiteEnricher, normalize_website_url, rank_contact_links
+
+
+class FakeBusinessSite(BaseHTTPRequestHandler):
+    """Serves a small homepage per path with a slow response"""
+
+    requests_seen = []
+
+    def do_GET(self):
+        FakeBusinessSite.requests_seen.append(self.path)
+        if self.path == '/robots.txt':
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == '/busy':
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        time.sleep(0.2)  # Simulate a real site's latency
+        slug = self.path.strip('/') or 'home'
+        etag = f'"{slug}-v1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        if self.path.startswith('/bakery'):
+            body = self._bakery_page().encode()
+        else:
+            body = (
+                f"<html><body><h1>{slug}</h1>"
+                f"<a href='mailto:info@{slug}.test'>Mail us</a>"
+                f"<p>Sales: sales@{slug}.test</p>"
+                f"<img src='logo@2x.png'>"
+                f"<a href='tel:+1 555-123-4567'>Call</a>"
+                f"</body></html>"
+            ).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _bakery_page(self):
+        """A homepage with no contacts that links to its contact pages"""
+        if self.path == '/bakery/kontakt':
+            return "<p>Write to hello@bakery.test or call (555) 987-6543</p>"
+        if self.path == '/bakery/about-us':
+            return "<p>Family run since 1950. owner@bakery.test</p>"
+        return (
+            "<html><body><h1>Bakery</h1>"
+            "<a href='/bakery/menu'>Menu</a>"
+            "<a href='/bakery/about-us'>About us</a>"
+            "<a href='/bakery/kontakt'><span>Kontakt</span></a>"
+            "<a href='https://facebook.com/contact'>Contact on Facebook</a>"
+            "<a href='/bakery/menu.pdf'>Contact PDF</a>"
+            "</body></html>"
+        )
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StreamingSite(BaseHTTPRequestHandler):
+    """Endless and non-HTML responses for the streaming scan"""
+
+    def do_GET(self):
+        self.send_response(200)
+        if self.path == '/brochure':
+            self.send_header('Content-Type', 'application/pdf')
+        else:
+            self.send_header('Content-Type', 'text/html')
+        self.end_headers()
+
+        sent = 0
+        try:
+            if self.path == '/split':
+                # The email straddles the first 16 KB chunk boundary
+                padding = b'<p>' + b'x' * (16 * 1024 - 3 - 8) + b' '
+                self.wfile.write(padding + b'info@split-site.test <a href="tel:5551234567">x</a>')
+                sent = len(padding)
+            while sent < 50 * 1024 * 1024:
+                self.wfile.write(b'<div>' + b'y' * 8192 + b'</div>')
+                sent += 8203
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PoliteSite(BaseHTTPRequestHandler):
+    """A host whose robots.txt asks for a crawl delay"""
+
+    requests_seen = []
+
+    def do_GET(self):
+        PoliteSite.requests_seen.append(self.path)
+        if self.path == '/robots.txt':
+            body = b"User-agent: *\nDisallow: /private\nCrawl-delay: 1\n"
+        else:
+            body = b"<p>hi@polite.test</p>"
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain' if self.path == '/robots.txt' else 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(handler=FakeBusinessSite):
+    # Listen on every loopback address so 127.0.0.N can stand in for N hosts
+    server = ThreadingHTTPServer(('0.0.0.0', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_enrich_businesses():
+    """100 homepages on 100 hosts should be enriched concurrently in a few seconds"""
+    server = start_server()
+    port = server.server_address[1]
+
+    try:
+        businesses = [
+            {'name': f'Shop {i}', 'website': f'http://127.0.0.{i + 2}:{port}/shop{i}', 'mobile': None,
+             'email': None, 'secondary_email': None, 'website_visited': False,
+             'additional_contacts': ''}
+            for i in range(100)
+        ]
+        businesses.append({'name': 'No website', 'website': None})
+
+        enricher = WebsiteEnricher(max_workers=20, timeout=5)
+        start = time.time()
+        enricher.enrich_businesses(businesses)
+        elapsed = time.time() - start
+        enricher.close()
+
+        print(f"⏱️ Enriched 100 sites in {elapsed:.2f}s")
+        assert elapsed < 10, f"Enrichment too slow: {elapsed:.1f}s"
+
+        first = businesses[0]
+        assert first['website_visited'] is True
+        assert first['email'] == 'info@shop0.test'
+        assert first['secondary_email'] == 'sales@shop0.test'
+        assert first['mobile'] == '+1 555-123-4567'
+        assert all(b['email'] for b in businesses[:100])
+        assert 'email' not in businesses[-1]
+        print("✅ Website enrichment working!")
+    finally:
+        server.shutdown()
+
+
+def test_enrich_time_limit():
+    """Enrichment stops at its time limit and leaves unfinished businesses untouched"""
+    server = start_server()
+    port = server.server_address[1]
+
+    try:
+        businesses = [
+            {'name': f'Shop {i}', 'website': f'http://127.0.0.{i + 2}:{port}/shop{i}', 'email': None,
+             'website_visited': False}
+            for i in range(40)
+        ]
+        enricher = WebsiteEnricher(max_workers=2, timeout=5)
+        start = time.time()
+        enricher.enrich_businesses(businesses, time_limit=0.5)
+        elapsed = time.time() - start
+        returned = [dict(b) for b in businesses]
+
+        # The session is closed only once the stragglers are done, and they write nothing back
+        idle = threading.Event()
+        enricher.when_idle(idle.set)
+        assert not idle.is_set(), "websites still in flight at the time limit"
+        assert idle.wait(timeout=10)
+        enricher.close()
+        assert businesses == returned
+
+        assert elapsed < 1.5, f"Time limit ignored: {elapsed:.1f}s"
+        visited = [b for b in businesses if b['website_visited']]
+        assert 0 < len(visited) < 40
+        assert all(b['email'] is None for b in businesses if not b['website_visited'])
+        print("✅ Enrichment time limit working!")
+    finally:
+        server.shutdown()
+
+
+def test_website_cache():
+    """Fresh hits skip the network, stale hits revalidate, dead domains fail fast, busy ones are retried"""
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    # Grab a port with nothing listening for the dead-domain case
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    dead_url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+    sock.close()
+
+    cache_path = os.path.join(tempfile.mkdtemp(), 'website_cache.db')
+    cache = WebsiteCache(cache_path, ttl=3600)
+    enricher = WebsiteEnricher(max_workers=4, timeout=2, cache=cache)
+
+    try:
+        FakeBusinessSite.requests_seen.clear()
+        first = enricher.fetch_contacts(f"{base}/cafe")
+        assert first['emails'] == ['info@cafe.test', 'sales@cafe.test']
+        assert enricher.fetch_contacts(f"{base}/cafe/") == first
+        assert FakeBusinessSite.requests_seen == ['/robots.txt', '/cafe'], FakeBusinessSite.requests_seen
+        assert enricher.cache_hits == 1
+
+        # Expire the entry: the next fetch must revalidate and get a 304
+        cache.ttl = 0
+        assert enricher.fetch_contacts(f"{base}/cafe") == first
+        assert enricher.cache_revalidated == 1
+
+        assert enricher.fetch_contacts(dead_url) is None
+        start = time.time()
+        assert enricher.fetch_contacts(dead_url + 'contact') is None
+        assert time.time() - start < 0.1
+        assert enricher.negative_hits == 1
+        assert cache.get(dead_url)['status'] == 'dead'
+
+        # A 5xx is remembered for retry_ttl only, not the day a refused connection gets
+        assert enricher.fetch_contacts(f"{base}/busy") is None
+        busy = cache.get(base)
+        assert (busy['status'], busy['reason']) == ('unreachable', 'HTTP 503'), busy
+        assert cache.is_dead_domain(f"{base}/cafe")
+        cache.retry_ttl = 0
+        assert not cache.is_dead_domain(f"{base}/cafe")
+        assert cache.is_dead_domain(dead_url)
+        print("✅ Website cache working!")
+    finally:
+        enricher.close()
+        cache.close()
+        server.shutdown()
+
+
+def test_contact_page_crawl():
+    """Contacts missing from the homepage are found on ranked contact pages"""
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        FakeBusinessSite.requests_seen.clear()
+        business = {'name': 'Bakery', 'website': f'{base}/bakery'}
+        enricher = WebsiteEnricher(max_workers=4, timeout=5, max_contact_pages=2)
+        enricher.enrich_business(business)
+        enricher.close()
+
+        assert business['email'] == 'hello@bakery.test'
+        assert business['mobile'] == '(555) 987-6543'
+        assert '/bakery/menu' not in FakeBusinessSite.requests_seen
+        assert enricher.contact_pages_fetched <= 2
+        print("✅ Contact page crawl working!")
+    finally:
+        server.shutdown()
+
+
+def test_rank_contact_links():
+    html = (
+        "<a href='/menu'>Menu</a>"
+        "<a href='/about'>About</a>"
+        "<a href='https://www.shop.test/contact-us/'>Get in touch</a>"
+        "<a href='https://other.test/contact'>Contact</a>"
+        "<a href='mailto:x@shop.test'>Contact</a>"
+    )
+    links = rank_contact_links(html, 'https://shop.test/', limit=3)
+    assert links == ['https://www.shop.test/contact-us/', 'https://shop.test/about'], links
+
+
+def test_streaming_scan():
+    """Endless pages stop at the byte cap, split matches are found, PDFs are skipped"""
+    server = start_server(StreamingSite)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    enricher = WebsiteEnricher(max_workers=2, timeout=5, max_contact_pages=0, max_page_bytes=256 * 1024)
+
+    try:
+        start = time.time()
+        contacts = enricher.fetch_contacts(f"{base}/endless")
+        assert contacts == {'emails': [], 'phones': []}, contacts
+        assert time.time() - start < 5
+        assert enricher.capped_fetches == 1
+
+        contacts = enricher.fetch_contacts(f"{base}/split")
+        assert contacts['emails'] == ['info@split-site.test'], contacts
+        assert contacts['phones'] == ['5551234567'], contacts
+        assert enricher.early_aborts == 1
+
+        assert enricher.fetch_contacts(f"{base}/brochure") == {'emails': [], 'phones': []}
+        assert enricher.non_html_skipped == 1
+        print("✅ Streaming scan working!")
+    finally:
+        enricher.close()
+        server.shutdown()
+
+
+class ChunkedResponse:
+    """Just enough of a requests response for _scan_stream, cut into fixed-size chunks"""
+
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk = chunk_size
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+        self.url = 'http://split.test/'
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.chunk):
+            yield self.body[start:start + self.chunk]
+
+
+def test_split_matches_are_whole():
+    """An email or phone cut by any chunk boundary is found whole, never truncated"""
+    enricher = WebsiteEnricher(max_workers=1, max_contact_pages=0)
+    page = ('<p>' + 'x ' * 400 + '</p><p>Mail info@business.com or call <b>(555) 987-6543</b></p>'
+            + '<footer>' + 'y ' * 400 + '</footer>').encode()
+    single = ChunkedResponse(page, len(page))
+    expected = enricher._scan_stream(single, None, False)[0]
+    assert expected == {'emails': ['info@business.com'], 'phones': ['(555) 987-6543']}, expected
+
+    try:
+        for chunk_size in (1, 7, 13, 39, 64, 100, 511, 513, 1000):
+            contacts = enricher._scan_stream(ChunkedResponse(page, chunk_size), None, False)[0]
+            assert contacts == expected, (chunk_size, contacts)
+        # A short page arrives in one chunk and still ends complete
+        short = b'<p>hi@short.test</p>'
+        assert enricher._scan_stream(ChunkedResponse(short, 5), None, False)[0]['emails'] == ['hi@short.test']
+
+        # Numbers inside a script longer than any window are code, not contacts, as on the whole page
+        script = ('<html><script>var config = {' + 'a: 1, ' * 6000 + 'support: "(800) 555-1212"};</script>'
+                  '<style>' + '.x{}' * 2000 + '</style><p>Call (555) 987-6543</p></html>').encode()
+        assert enricher.extract_contacts(script.decode())['phones'] == ['(555) 987-6543']
+        for chunk_size in (100, 4096, 16 * 1024):
+            phones = enricher._scan_stream(ChunkedResponse(script, chunk_size), None, False)[0]['phones']
+            assert phones == ['(555) 987-6543'], (chunk_size, phones)
+    finally:
+        enricher.close()
+
+
+def test_host_scheduler():
+    """Same-host requests are spaced by Crawl-delay; robots.txt rules are honored"""
+    polite = start_server(PoliteSite)
+    fast = start_server()
+    polite_base = f"http://127.0.0.1:{polite.server_address[1]}"
+    fast_port = fast.server_address[1]
+    enricher = WebsiteEnricher(max_workers=8, timeout=5, max_contact_pages=0)
+
+    try:
+        assert enricher.fetch_contacts(f"{polite_base}/private") is None
+        assert enricher.scheduler.robots_blocked == 1
+
+        start = time.time()
+        for page in ('a', 'b', 'c'):
+            assert enricher.fetch_contacts(f"{polite_base}/{page}")['emails'] == ['hi@polite.test']
+        assert time.time() - start >= 1.0, "Crawl-delay not applied"
+
+        # Different hosts are not slowed down by each other
+        businesses = [{'website': f'http://127.0.0.{i + 2}:{fast_port}/shop{i}'} for i in range(8)]
+        start = time.time()
+        enricher.enrich_businesses(businesses)
+        assert time.time() - start < 2.0
+        assert all(b.get('email') for b in businesses)
+
+        # The next run reuses the robots.txt (and its Crawl-delay) instead of fetching it again
+        again = WebsiteEnricher(max_workers=8, timeout=5, max_contact_pages=0)
+        start = time.time()
+        for page in ('d', 'e'):
+            assert again.fetch_contacts(f"{polite_base}/{page}")['emails'] == ['hi@polite.test']
+        again.close()
+        assert time.time() - start >= 0.5, "Crawl-delay not applied from the cached robots.txt"
+        assert PoliteSite.requests_seen.count('/robots.txt') == 1, PoliteSite.requests_seen
+
+        # A robots.txt fetch waits for a global slot like any other request
+        session = requests.Session()
+        scheduler = HostScheduler(max_concurrency=1, session=session, robots_cache=RobotsCache())
+        checked = threading.Event()
+        with scheduler.slot(f'http://127.0.0.2:{fast_port}/'):
+            threading.Thread(target=lambda: scheduler.allowed(f"{polite_base}/a") and checked.set(),
+                             daemon=True).start()
+            assert not checked.wait(0.3), "robots.txt fetched without a global slot"
+        assert checked.wait(5)
+        session.close()
+        print("✅ Host scheduler working!")
+    finally:
+        enricher.close()
+        polite.shutdown()
+        fast.shutdown()
+
+
+def test_normalize_cache_key():
+    assert normalize_cache_key('https://WWW.Shop.test/') == normalize_cache_key('http://shop.test')
+    assert normalize_cache_key('http://shop.test/about/#team') == 'http://shop.test/about'
+
+
+def test_normalize_website_url():
+    assert normalize_website_url('example.com') == 'http://example.com'
+    assert normalize_website_url('https://www.google.com/url?q=https://shop.test/&sa=U') == 'https://shop.test/'
+    assert normalize_website_url('javascript:void(0)') is None
+    assert normalize_website_url(None) is None
+
+
+if __name__ == "__main__":
+    test_normalize_website_url()
+    test_normalize_cache_key()
+    test_rank_contact_links()
+    test_enrich_businesses()
+    test_enrich_time_limit()
+    test_website_cache()
+    test_contact_page_crawl()
+    test_streaming_scan()
+    test_split_matches_are_whole()
+    test_host_scheduler()
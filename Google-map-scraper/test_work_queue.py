@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for the distributed work queue and scrape workers
+Uses the SQLite queue and a fake scraper, so no Chrome or Redis is needed
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from job_store import JobResultStore
+from result_cache import ResultCache
+from scrape_jobs import JobManager
+from test_scrape_jobs import failing_scrape
+from work_queue import QueueScraper, SQLiteWorkQueue
+from worker import run_worker
+
+
+WORKER_SCRIPT = """
+import sys, time
+from test_scrape_jobs import fake_scrape
+from work_queue import SQLiteWorkQueue
+from worker import run_worker
+run_worker(SQLiteWorkQueue(sys.argv[1]), concurrency=2, scrape_fn=fake_scrape, idle_sleep=0.1)
+time.sleep(120)
+"""
+
+
+def _wait(job, timeout=20):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.05)
+    assert job.finished, f"job still {job.status}"
+
+
+def test_lease_expiry():
+    """A task whose worker stops heartbeating goes to the next worker; the old one can't finish it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteWorkQueue(os.path.join(tmp, 'queue.db'), lease_seconds=0.2, max_attempts=2)
+        task_id = queue.enqueue({'query': 'cafes'})
+
+        first = queue.lease('worker-a')
+        assert first['task_id'] == task_id and first['attempts'] == 1
+        assert queue.lease('worker-b') is None
+
+        time.sleep(0.3)
+        second = queue.lease('worker-b')
+        assert second['task_id'] == task_id and second['attempts'] == 2
+        assert not queue.heartbeat(task_id, 'worker-a')
+        assert not queue.finish(task_id, 'worker-a', [{'name': 'stale'}])
+
+        queue.add_result(task_id, 0, {'name': 'partial'})
+        assert queue.heartbeat(task_id, 'worker-b', {'processed': 1})
+        assert queue.status(task_id)['progress'] == {'processed': 1}
+        assert queue.finish(task_id, 'worker-b', [{'name': 'a'}, {'name': 'b'}])
+        assert queue.status(task_id)['status'] == 'done'
+        assert [r['name'] for _, r in queue.results(task_id)] == ['a', 'b']
+        assert queue.depth() == {'done': 1}
+        queue.close()
+    print("✅ Lease expiry working!")
+
+
+def test_worker_process():
+    """The API enqueues; a separate worker process runs the scrape and streams results back"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'queue.db')
+        queue = SQLiteWorkQueue(path)
+        manager = JobManager(scrape_fn=QueueScraper(queue, poll_interval=0.05), max_workers=4,
+                             cache=ResultCache(), store=JobResultStore(os.path.join(tmp, 'jobs.db')))
+        worker = subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT, path],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            jobs = [manager.submit(f'query {i}', 5, visit_websites=False) for i in range(3)]
+            for job in jobs:
+                _wait(job)
+                assert job.status == 'completed', job.error
+                assert [r['name'] for r in job.results] == [f'{job.query} #{i}' for i in range(1, 6)]
+                assert job.progress['processed'] == 5
+                # Results arrived one by one, not just at the end
+                assert sum(1 for event, _ in job.events if event == 'result') == 5
+            assert queue.depth() == {'done': 3}
+        finally:
+            worker.kill()
+            worker.wait()
+            manager.shutdown()
+            queue.close()
+    print("✅ Worker process working!")
+
+
+def test_failed_task_retries():
+    """A failing task is retried up to max_attempts, then fails the API job"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteWorkQueue(os.path.join(tmp, 'queue.db'), max_attempts=2)
+        manager = JobManager(scrape_fn=QueueScraper(queue, poll_interval=0.05), max_workers=1,
+                             cache=ResultCache(), store=JobResultStore(os.path.join(tmp, 'jobs.db')))
+        stop = threading.Event()
+        run_worker(queue, scrape_fn=failing_scrape, stop_event=stop, idle_sleep=0.05)
+        try:
+            job = manager.submit('cafes', 5)
+            _wait(job)
+            assert job.status == 'failed' and 'Chrome crashed' in job.error
+            assert queue.depth() == {'failed': 1}
+        finally:
+            stop.set()
+            manager.shutdown()
+    print("✅ Task retries working!")
+
+
+def test_wait_gives_up():
+    """With no worker, polling backs off and the job fails at the wait limit instead of hanging"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteWorkQueue(os.path.join(tmp, 'queue.db'))
+        polls = []
+        status = queue.status
+        queue.status = lambda task_id: polls.append(time.time()) or status(task_id)
+        scraper = QueueScraper(queue, poll_interval=0.05, max_poll_interval=0.2, timeout=1)
+        started = time.time()
+        try:
+            scraper('cafes', 5, visit_websites=False)
+            assert False, 'expected a timeout'
+        except TimeoutError as e:
+            assert 'queued' in str(e)
+        assert 1 <= time.time() - started < 1.5
+        # Backed off: far fewer polls than one per poll_interval
+        assert len(polls) < 12
+        assert queue.depth() == {'queued': 1}
+        queue.close()
+    print("✅ Queue wait limit working!")
+
+
+if __name__ == "__main__":
+    test_lease_expiry()
+    test_worker_process()
+    test_failed_task_retries()
+    test_wait_gives_up()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Time Budget - One deadline shared by every phase of a scrape
+Key points:
+- The clock starts when the request is accepted, so time spent waiting
+  for a driver slot counts against the budget
+- Each phase gets a share of whatever is left when it starts: a slow
+  search leaves less time for scrolling instead of overrunning the deadline
+- Scrapers check the budget between steps, switch to cheaper strategies
+  when it is short and return what they have once it runs out
+"""
+
+import time
+
+
+# Share of the remaining time each phase may use
+PHASE_SHARES = {
+    'search': 0.2,      # page load and consent
+    'harvest': 0.3,     # scrolling the result list
+    'extract': 0.75,    # detail pages, leaving the rest for website enrichment
+    'enrich': 1.0,
+}
+
+# What a detail page visit costs on average, including the politeness delay
+SECONDS_PER_BUSINESS = 5.0
+
+
+class TimeBudget:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def phase_limit(self, phase, full=False):
+        """Seconds the phase may take; full=True when no later phase needs time"""
+        return self.remaining() * (1.0 if full else PHASE_SHARES[phase])
+
+    def phase_deadline(self, phase, full=False):
+        """Monotonic time by which the phase should stop"""
+        return time.monotonic() + self.phase_limit(phase, full)
+
+    def cap(self, seconds, phase):
+        """A fixed wait, shortened to the phase's share when time is short"""
+        return min(seconds, self.phase_limit(phase))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Webhooks - POST job results to a client's callback URL
+Key points:
+- Jobs created with a callback_url get their results POSTed when they
+  finish, or in chunks of callback_chunk_size as they are extracted
+- Deliveries run on the sender's own threads; scrape workers only hand
+  payloads over and never wait on a client's server
+- Failed deliveries (network errors, 408/429/5xx) are retried with
+  exponential backoff and jitter; other 4xx responses are final
+- Bodies are signed with HMAC-SHA256 (WEBHOOK_SECRET) in the
+  X-Webhook-Signature header: "t=<unix time>,v1=<hex of t.body>"
+- Every attempt is kept in a per-job delivery log
+"""
+
+import heapq
+import hashlib
+import hmac
+import itertools
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fast_json import dumps
+from metrics import REGISTRY
+from scrape_jobs import MAX_FINISHED_JOBS
+
+
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+DEFAULT_WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', '4'))
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+RETRY_STATUSES = {408, 429}
+
+WEBHOOK_DELIVERIES = REGISTRY.counter(
+    'webhook_deliveries_total', 'Webhook delivery attempts by outcome', ['outcome'])
+
+
+def sign(body, secret, timestamp=None):
+    """Signature header value for a request body"""
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(body, header, secret, tolerance=300):
+    """What a receiver runs: True if the header signs this body and is recent"""
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (ValueError, KeyError, AttributeError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(body, secret, timestamp), header)
+
+
+def validate_callback_url(url):
+    parsed = urlparse(url or '')
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        raise ValueError("callback_url must be an absolute http(s) URL")
+    return url
+
+
+class WebhookSender:
+    """Delivers payloads on its own thread pool, retrying with exponential backoff"""
+
+    def __init__(self, workers=DEFAULT_WEBHOOK_WORKERS, secret=WEBHOOK_SECRET, max_attempts=6,
+                 base_delay=2.0, max_delay=600.0, timeout=10):
+        self.secret = secret
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # (due time, tiebreak, delivery) heap shared by the sender threads
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._logs = OrderedDict()
+        self.delivered = 0
+        self.failed = 0
+
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f'webhook-{i}', daemon=True).start()
+
+    def send(self, job_id, url, payload):
+        """Queue a delivery and return its log record"""
+        delivery = {
+            'delivery_id': uuid.uuid4().hex,
+            'job_id': job_id,
+            'url': url,
+            'event': payload.get('event'),
+            'sequence': payload.get('sequence'),
+            'status': 'pending',
+            'attempts': [],
+            'body': dumps(payload),
+        }
+        with self._cond:
+            self._logs.setdefault(job_id, []).append(delivery)
+            self._logs.move_to_end(job_id)
+            while len(self._logs) > MAX_FINISHED_JOBS:
+                self._logs.popitem(last=False)
+            self._schedule(delivery, time.monotonic())
+        return delivery
+
+    def _schedule(self, delivery, due):
+        """Call with the condition held"""
+        heapq.heappush(self._heap, (due, next(self._counter), delivery))
+        self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._heap or self._heap[0][0] > time.monotonic()):
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                if self._closed:
+                    return
+                _, _, delivery = heapq.heappop(self._heap)
+            self._attempt(delivery)
+
+    def _attempt(self, delivery):
+        body = delivery['body']
+        headers = {'Content-Type': 'application/json', 'X-Webhook-Delivery': delivery['delivery_id']}
+        if self.secret:
+            headers[SIGNATURE_HEADER] = sign(body, self.secret)
+
+        attempt = {'at': datetime.now().isoformat(), 'status_code': None, 'error': None}
+        try:
+            response = self.session.post(delivery['url'], data=body, headers=headers, timeout=self.timeout)
+            attempt['status_code'] = response.status_code
+            ok = response.status_code < 300
+            retry = not ok and (response.status_code >= 500 or response.status_code in RETRY_STATUSES)
+        except requests.RequestException as e:
+            attempt['error'] = str(e)
+            ok, retry = False, True
+
+        with self._cond:
+            delivery['attempts'].append(attempt)
+            if ok:
+                delivery['status'] = 'delivered'
+                self.delivered += 1
+            elif retry and len(delivery['attempts']) < self.max_attempts:
+                delivery['status'] = 'retrying'
+                delay = min(self.max_delay, self.base_delay * 2 ** (len(delivery['attempts']) - 1))
+                # Jitter so a recovering receiver isn't hit by every retry at once
+                self._schedule(delivery, time.monotonic() + delay * random.uniform(0.5, 1.0))
+            else:
+                delivery['status'] = 'failed'
+                self.failed += 1
+        WEBHOOK_DELIVERIES.inc(outcome='delivered' if ok else 'retried' if delivery['status'] == 'retrying'
+                               else 'failed')
+        if delivery['status'] == 'failed':
+            print(f"❌ Webhook to {delivery['url']} for job {delivery['job_id']} failed after "
+                  f"{len(delivery['attempts'])} attempts")
+
+    def log(self, job_id):
+        """Delivery records of a job, without their bodies"""
+        with self._cond:
+            return [
+                {k: v for k, v in d.items() if k != 'body'} | {'attempts': list(d['attempts'])}
+                for d in self._logs.get(job_id, [])
+            ]
+
+    def stats(self):
+        with self._cond:
+            return {'pending': len(self._heap), 'delivered': self.delivered, 'failed': self.failed}
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class JobWebhook:
+    """Feeds one job's results to one callback URL, in chunks or all at the end"""
+
+    def __init__(self, sender, job, url, chunk_size=None, serialize_result=None):
+        self.sender = sender
+        self.job = job
+        self.url = url
+        self.chunk_size = chunk_size
+        self.serialize_result = serialize_result or (lambda result: result)
+        self.sent = 0
+        self.sequence = 0
+        self._lock = threading.Lock()
+
+    def attach(self):
+        """Start listening; results the job already has count towards the first chunk"""
+        with self.job._lock:
+            self.job.listeners.append(self.on_event)
+        if self.chunk_size:
+            self._flush_chunks()
+        self.job.future.add_done_callback(lambda future: self.finish())
+        return self
+
+    def on_event(self, event, payload):
+        if event == 'result' and self.chunk_size:
+            self._flush_chunks()
+
+    def _flush_chunks(self):
+        results = self.job.snapshot_results()
+        with self._lock:
+            while len(results) - self.sent >= self.chunk_size:
+                self._send('job.results', results[self.sent:self.sent + self.chunk_size], self.sent)
+                self.sent += self.chunk_size
+
+    def finish(self):
+        job = self.job
+        with job._lock:
+            job.listeners = [l for l in job.listeners if l != self.on_event]
+        results = job.snapshot_results()
+        with self._lock:
+            event = 'job.completed' if job.status == 'completed' else 'job.failed'
+            if self.chunk_size and not job.visit_websites:
+                self._send(event, results[self.sent:], self.sent, job.summary())
+            else:
+                # Enrichment may have changed chunked rows: the final list is authoritative
+                self._send(event, results, 0, job.summary())
+            self.sent = len(results)
+
+    def _send(self, event, results, offset, summary=None):
+        """Call with self._lock held"""
+        payload = {
+            'event': event,
+            'job_id': self.job.id,
+            'query': self.job.query,
+            'sequence': self.sequence,
+            'offset': offset,
+            'results': [row for row in map(self.serialize_result, results) if row],
+        }
+        if summary:
+            payload['summary'] = summary
+        self.sequence += 1
+        self.sender.send(self.job.id, self.url, payload)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Website Cache - Disk-backed cache for website enrichment fetches
+Key points:
+- SQLite file keyed by normalized URL, safe to share between threads
+- Stores body hash, extracted contacts, ETag and Last-Modified
+- Fresh entries serve contacts with no network; stale entries are revalidated
+  with If-None-Match / If-Modified-Since
+- Negative cache for dead or parked domains so they fail fast; timeouts
+  and server errors are only remembered for retry_ttl, so a site that was
+  briefly down is tried again soon
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse, urlunparse
+
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    'WEBSITE_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'website_cache.db')
+)
+
+
+def domain_cache_key(url):
+    """Cache key for a whole site, used by the negative cache"""
+    parsed = urlparse(url.strip())
+    return normalize_cache_key(f"{parsed.scheme or 'http'}://{parsed.netloc}/")
+
+
+def normalize_cache_key(url):
+    """Normalize a URL so trivially different spellings share one entry"""
+    parsed = urlparse(url.strip())
+    scheme = (parsed.scheme or 'http').lower()
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    port = parsed.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+
+    path = parsed.path.rstrip('/') or '/'
+    # http and https versions of a site are the same business page
+    return urlunparse(('http', host, path, '', parsed.query, ''))
+
+
+class WebsiteCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, negative_ttl=24 * 3600, retry_ttl=15 * 60):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.retry_ttl = retry_ttl
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS website_cache (
+                url_key TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                body_hash TEXT,
+                contacts TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                reason TEXT,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, url):
+        """Return the cache entry for a URL as a dict, or None"""
+        key = normalize_cache_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, body_hash, contacts, etag, last_modified, reason, fetched_at "
+                "FROM website_cache WHERE url_key = ?", (key,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        status, body_hash, contacts, etag, last_modified, reason, fetched_at = row
+        return {
+            'url_key': key,
+            'status': status,
+            'body_hash': body_hash,
+            'contacts': json.loads(contacts) if contacts else {'emails': [], 'phones': []},
+            'etag': etag,
+            'last_modified': last_modified,
+            'reason': reason,
+            'fetched_at': fetched_at,
+        }
+
+    def is_fresh(self, entry):
+        """True when the entry can be served without touching the network"""
+        return entry['status'] == 'ok' and time.time() - entry['fetched_at'] < self.ttl
+
+    def is_dead_domain(self, url):
+        """True when the URL's site is in the negative cache and not expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, fetched_at FROM website_cache "
+                "WHERE url_key = ? AND status IN ('dead', 'unreachable')",
+                (domain_cache_key(url),)
+            ).fetchone()
+        if not row:
+            return False
+        status, fetched_at = row
+        ttl = self.negative_ttl if status == 'dead' else self.retry_ttl
+        return time.time() - fetched_at < ttl
+
+    def conditional_headers(self, entry):
+        """Revalidation headers for a stale entry"""
+        headers = {}
+        if entry and entry['status'] == 'ok':
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, body_hash, contacts, etag=None, last_modified=None):
+        """Save a successful fetch"""
+        self._write(url, 'ok', body_hash, json.dumps(contacts), etag, last_modified, None)
+
+    def mark_dead(self, url, reason):
+        """Negative-cache a dead or parked site (the whole domain)"""
+        self._write(domain_cache_key(url), 'dead', None, None, None, None, reason)
+
+    def mark_unreachable(self, url, reason):
+        """Negative-cache a site that failed in a way that may pass (timeout, 5xx) for retry_ttl only"""
+        self._write(domain_cache_key(url), 'unreachable', None, None, None, None, reason)
+
+    def touch(self, url):
+        """Record a successful 304 revalidation"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE website_cache SET fetched_at = ? WHERE url_key = ?",
+                (time.time(), normalize_cache_key(url))
+            )
+            self._conn.commit()
+
+    def _write(self, url, status, body_hash, contacts, etag, last_modified, reason):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO website_cache "
+                "(url_key, status, body_hash, contacts, etag, last_modified, reason, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_cache_key(url), status, body_hash, contacts, etag, last_modified,
+                 reason, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,674 @@
+#!/usr/bin/env python3
+"""
+Website Enricher - Contact extraction from business websites
+Key points:
+- Plain HTTP over a pooled requests.Session (never touches the Selenium driver)
+- Bounded thread pool so 100 homepages take seconds, not minutes
+- Reuses the scrapers' email/phone patterns to fill email, secondary_email,
+  website_visited and additional_contacts
+- Optional WebsiteCache serves repeat sites without re-downloading them
+- Bounded contact-page crawl: up to K ranked same-site links per business,
+  stopping once an email and a phone are known or the byte cap is spent
+- Bodies are streamed and scanned chunk by chunk; downloads abort on the
+  first email+phone or at the byte cap, and non-HTML is skipped after headers
+- Every request goes through a HostScheduler (per-host limits, token
+  buckets, robots.txt) so shared hosts are not hammered
+"""
+
+import bisect
+import codecs
+import hashlib
+import html as html_lib
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from urllib.parse import urlparse, parse_qs, urljoin, urldefrag
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from host_scheduler import HostScheduler
+from metrics import WEBSITE_FETCH_SECONDS
+from website_cache import WebsiteCache
+
+
+DEFAULT_EMAIL_PATTERNS = [
+    re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
+    re.compile(r'mailto:([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,})'),
+    re.compile(r'email[:\s]*([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,})', re.IGNORECASE),
+]
+
+DEFAULT_PHONE_PATTERNS = [
+    re.compile(r'\+?1?[-.]\s?\(?([0-9]{3})\)?[-.]\s?([0-9]{3})[-.]\s?([0-9]{4})'),
+    re.compile(r'\(\d{3}\)\s?\d{3}[-.]?\d{4}'),
+    re.compile(r'\+\d{1,3}\s?\d{3,4}\s?\d{3}\s?\d{4}'),
+]
+
+# Addresses that show up in page source but are never a business contact
+IGNORED_EMAIL_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.css', '.js')
+IGNORED_EMAIL_DOMAINS = ('example.com', 'domain.com', 'sentry.io', 'wixpress.com', 'sentry-next.wixpress.com')
+
+# Text that only shows up on domain-parking / for-sale placeholder pages
+PARKED_DOMAIN_MARKERS = (
+    'this domain is for sale', 'this domain may be for sale', 'buy this domain',
+    'domain is parked', 'parked free', 'sedoparking', 'parkingcrew', 'bodis.com',
+    'hugedomains.com', 'domain has expired',
+)
+
+# Anchor text / path keywords that point at contact details, with weights
+CONTACT_LINK_KEYWORDS = (
+    ('contact', 10), ('kontakt', 10), ('contacto', 10), ('contatti', 10),
+    ('impressum', 9), ('imprint', 9), ('get in touch', 8), ('reach us', 6),
+    ('about', 5), ('ueber-uns', 5), ('uber-uns', 5), ('team', 3),
+    ('location', 2), ('support', 2), ('legal', 2),
+)
+SKIPPED_LINK_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.zip', '.mp4', '.doc', '.docx')
+
+# Streaming scan settings: overlap must cover the longest match we care about
+STREAM_CHUNK_BYTES = 16 * 1024
+STREAM_OVERLAP_CHARS = 512
+PARKED_SCAN_BYTES = 20000
+
+ANCHOR_PATTERN = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\']+)["\'][^>]*>(.*?)</a\s*>',
+                            re.IGNORECASE | re.DOTALL)
+TEL_LINK_PATTERN = re.compile(r'href=["\']tel:([^"\']+)["\']', re.IGNORECASE)
+# An unclosed block runs to the end: the rest of the page (or window) is still script
+SCRIPT_STYLE_PATTERN = re.compile(r'<(script|style)\b.*?(?:</\1\s*>|\Z)', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+MARKUP_PATTERN = re.compile(SCRIPT_STYLE_PATTERN.pattern + '|' + TAG_PATTERN.pattern, re.IGNORECASE | re.DOTALL)
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+
+def normalize_website_url(url):
+    """Return a fetchable http(s) URL, unwrapping Google redirect links"""
+    if not url:
+        return None
+
+    url = url.strip()
+    parsed = urlparse(url)
+
+    # Google Maps sometimes hands out https://www.google.com/url?q=<real site>
+    if 'google.' in parsed.netloc and parsed.path == '/url':
+        target = parse_qs(parsed.query).get('q', [None])[0]
+        if not target:
+            return None
+        url = target
+        parsed = urlparse(url)
+
+    if not parsed.scheme:
+        url = f"http://{url}"
+        parsed = urlparse(url)
+
+    if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+        return None
+
+    return url
+
+
+def _site_host(host):
+    host = (host or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _score_contact_links(html, base_url, scores):
+    """Add same-site link scores found in an HTML fragment to scores"""
+    base_host = _site_host(urlparse(base_url).hostname)
+    base_page = urldefrag(base_url)[0].rstrip('/')
+
+    for href, anchor in ANCHOR_PATTERN.findall(html):
+        href = html_lib.unescape(href.strip())
+        if href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+            continue
+
+        url = urldefrag(urljoin(base_url, href))[0]
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or _site_host(parsed.hostname) != base_host:
+            continue
+        if url.rstrip('/') == base_page or parsed.path.lower().endswith(SKIPPED_LINK_EXTENSIONS):
+            continue
+
+        text = TAG_PATTERN.sub(' ', anchor).lower()
+        path = parsed.path.lower()
+        score = 0
+        for keyword, weight in CONTACT_LINK_KEYWORDS:
+            if keyword in text:
+                score += weight
+            if keyword.replace(' ', '-') in path:
+                score += weight
+        # Shallow pages are more likely to be the site's real contact page
+        score -= path.strip('/').count('/')
+
+        if score > 0 and score > scores.get(url, 0):
+            scores[url] = score
+    return scores
+
+
+def _top_links(scores, limit):
+    return sorted(scores, key=lambda u: (-scores[u], len(u)))[:limit]
+
+
+def rank_contact_links(html, base_url, limit=3):
+    """Rank same-site links by how likely they lead to contact details"""
+    return _top_links(_score_contact_links(html, base_url, {}), limit)
+
+
+def _strip_markup(html):
+    """html with script/style blocks and tags each replaced by a space, and a map from text offsets back to html"""
+    parts, text_starts, html_starts = [], [], []
+    pos = length = 0
+    for match in MARKUP_PATTERN.finditer(html):
+        text_starts.append(length)
+        html_starts.append(pos)
+        parts.append(html[pos:match.start()] + ' ')
+        length += match.start() - pos + 1
+        pos = match.end()
+    text_starts.append(length)
+    html_starts.append(pos)
+    parts.append(html[pos:])
+
+    def to_html(offset):
+        i = bisect.bisect_right(text_starts, offset) - 1
+        return html_starts[i] + offset - text_starts[i]
+    return ''.join(parts), to_html
+
+
+def _block_at(html, pos):
+    """Name of the script/style block that html[pos] is inside, or None"""
+    for match in SCRIPT_STYLE_PATTERN.finditer(html):
+        if match.start() >= pos:
+            break
+        if match.end() > pos:
+            return match.group(1).lower()
+    return None
+
+
+def _extend_unique(target, values):
+    for value in values:
+        if value not in target:
+            target.append(value)
+
+
+class _SiteCrawl:
+    """Per-business crawl state: byte budget and early-stop bookkeeping"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def spend(self, size):
+        with self.lock:
+            self.bytes_used += size
+
+    def exhausted(self):
+        return self.bytes_used >= self.max_bytes
+
+
+def _merge_contacts(pages):
+    merged = {'emails': [], 'phones': []}
+    for contacts in pages:
+        for key in ('emails', 'phones'):
+            _extend_unique(merged[key], contacts.get(key, []))
+    return merged
+
+
+def _interleave_by_host(businesses):
+    """Round-robin businesses across hosts so one busy host doesn't block the pool"""
+    by_host = {}
+    for business in businesses:
+        url = normalize_website_url(business.get('website')) or ''
+        by_host.setdefault(_site_host(urlparse(url).hostname), []).append(business)
+
+    ordered = []
+    queues = list(by_host.values())
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def _has_email_and_phone(contacts):
+    return bool(contacts.get('emails')) and bool(contacts.get('phones'))
+
+
+def _is_dead_host(error):
+    """True for a DNS failure or refused connection somewhere in a requests error's chain"""
+    pending, seen = [error], set()
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, (socket.gaierror, ConnectionRefusedError)):
+            return True
+        # requests wraps urllib3's MaxRetryError, whose reason wraps the socket error
+        pending += [getattr(current, 'reason', None), current.__cause__, current.__context__]
+        pending += [arg for arg in current.args if isinstance(arg, BaseException)]
+    return False
+
+
+class WebsiteEnricher:
+    def __init__(self, email_patterns=None, phone_patterns=None, max_workers=20, timeout=10, cache=None,
+                 max_contact_pages=3, max_site_bytes=2 * 1024 * 1024, max_page_bytes=512 * 1024,
+                 chunk_size=STREAM_CHUNK_BYTES, scheduler=None):
+        self.email_patterns = email_patterns or DEFAULT_EMAIL_PATTERNS
+        self.phone_patterns = phone_patterns or DEFAULT_PHONE_PATTERNS
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.max_contact_pages = max_contact_pages
+        self.max_site_bytes = max_site_bytes
+        self.max_page_bytes = max_page_bytes
+        self.chunk_size = chunk_size
+
+        self.pages_fetched = 0
+        self.emails_found = 0
+        self.cache_hits = 0
+        self.cache_revalidated = 0
+        self.negative_hits = 0
+        self.contact_pages_fetched = 0
+        self.early_aborts = 0
+        self.capped_fetches = 0
+        self.non_html_skipped = 0
+
+        # Set when a time-limited enrichment gives up on the websites still running; set and checked
+        # under _stop_lock together with the writes, so nothing lands in a business after that
+        self.stopped = threading.Event()
+        self._stop_lock = threading.Lock()
+        # Workers a time-limited run left running
+        self._stragglers = []
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5',
+            'Accept-Language': 'en-US,en;q=0.8',
+        })
+
+        self.scheduler = scheduler or HostScheduler(max_concurrency=max_workers, session=self.session)
+
+    def fetch_contacts(self, url, site=None, homepage=True):
+        """Return contacts found on a page, using the cache when available"""
+        entry = None
+        if self.cache:
+            if homepage and self.cache.is_dead_domain(url):
+                self.negative_hits += 1
+                return None
+            entry = self.cache.get(url)
+            if entry and self.cache.is_fresh(entry):
+                self.cache_hits += 1
+                return entry['contacts']
+
+        if not self.scheduler.allowed(url):
+            return None
+
+        headers = self.cache.conditional_headers(entry) if self.cache else {}
+        try:
+            with self.scheduler.slot(url):
+                # Timed after the politeness wait, so this is the site's own latency
+                started = time.monotonic()
+                outcome = 'error'
+                try:
+                    with self.session.get(url, headers=headers, timeout=self.timeout,
+                                          allow_redirects=True, stream=True) as response:
+                        if response.status_code == 304 and entry:
+                            outcome = 'not_modified'
+                            self.cache_revalidated += 1
+                            self.cache.touch(url)
+                            return entry['contacts']
+
+                        if response.status_code >= 400:
+                            outcome = 'http_error'
+                            if self.cache and homepage:
+                                # Only 410 says the site is gone; a 404 or 5xx homepage may be back soon
+                                if response.status_code == 410:
+                                    self.cache.mark_dead(url, 'HTTP 410')
+                                elif response.status_code == 404 or response.status_code >= 500:
+                                    self.cache.mark_unreachable(url, f"HTTP {response.status_code}")
+                            return None
+
+                        self.pages_fetched += 1
+                        content_type = response.headers.get('Content-Type', '').lower()
+                        if content_type and 'html' not in content_type and 'text' not in content_type:
+                            # Decided from the headers alone; the body is never downloaded
+                            outcome = 'non_html'
+                            self.non_html_skipped += 1
+                            contacts, body_hash, cacheable = {'emails': [], 'phones': []}, None, True
+                        else:
+                            scanned = self._scan_stream(response, site, homepage)
+                            if scanned is None:
+                                outcome = 'parked'
+                                if self.cache:
+                                    self.cache.mark_dead(url, 'parked')
+                                return None
+                            contacts, body_hash, cacheable = scanned
+                            outcome = 'ok'
+
+                        if self.cache and cacheable:
+                            self.cache.store(
+                                url, body_hash, contacts,
+                                etag=response.headers.get('ETag'),
+                                last_modified=response.headers.get('Last-Modified')
+                            )
+                        return contacts
+                finally:
+                    WEBSITE_FETCH_SECONDS.observe(time.monotonic() - started, outcome=outcome)
+
+        except requests.RequestException as e:
+            if self.cache and homepage:
+                if _is_dead_host(e):
+                    self.cache.mark_dead(url, type(e).__name__)
+                else:
+                    self.cache.mark_unreachable(url, type(e).__name__)
+            return None
+
+    def _scan_stream(self, response, site, homepage):
+        """Scan the body chunk by chunk; returns (contacts, body_hash, cacheable) or None if parked"""
+        decoder = codecs.getincrementaldecoder(self._charset(response))(errors='replace')
+        digest = hashlib.sha1()
+        emails, phones, link_scores = [], [], {}
+        page_bytes = 0
+        # Text carried over from the previous window, where its unscanned part starts, and the
+        # script/style block it starts inside (a block can span many windows)
+        tail, scanned_to, block = '', 0, None
+        cacheable = True
+
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            if not chunk:
+                continue
+            page_bytes += len(chunk)
+            digest.update(chunk)
+            if site:
+                site.spend(len(chunk))
+
+            window = tail + decoder.decode(chunk)
+            # Only matches starting before the last STREAM_OVERLAP_CHARS are surely whole; later ones
+            # are taken from the next window, which keeps the text before them for context
+            limit = max(scanned_to, len(window) - STREAM_OVERLAP_CHARS)
+
+            if homepage and page_bytes <= PARKED_SCAN_BYTES and self._is_parked(window):
+                return None
+
+            # Reopen the block the window starts inside, so its script is not read as visible text
+            opened = f'<{block}>' if block else ''
+            self._collect_contacts(opened + window, len(opened) + scanned_to, len(opened) + limit, emails, phones)
+            keep = max(0, limit - STREAM_OVERLAP_CHARS)
+            block = _block_at(opened + window, len(opened) + keep)
+            tail, scanned_to = window[keep:], limit - keep
+            if homepage and self.max_contact_pages:
+                _score_contact_links(window, response.url, link_scores)
+
+            if emails and phones:
+                self.early_aborts += 1
+                break
+            if page_bytes >= self.max_page_bytes:
+                self.capped_fetches += 1
+                break
+            if site and (site.exhausted() or site.stop.is_set()):
+                # Cut short by the rest of the crawl, so don't cache a partial page
+                self.capped_fetches += 1
+                cacheable = False
+                break
+        else:
+            # The whole page arrived: what is left in the overlap is complete too
+            opened = f'<{block}>' if block else ''
+            self._collect_contacts(opened + tail, len(opened) + scanned_to, len(opened + tail), emails, phones)
+
+        contacts = {'emails': emails, 'phones': phones}
+        if homepage and self.max_contact_pages:
+            contacts['contact_links'] = _top_links(link_scores, self.max_contact_pages)
+        return contacts, digest.hexdigest(), cacheable
+
+    def _charset(self, response):
+        content_type = response.headers.get('Content-Type', '').lower()
+        if 'charset=' in content_type:
+            charset = content_type.split('charset=')[-1].split(';')[0].strip(' "\'')
+            try:
+                codecs.lookup(charset)
+                return charset
+            except LookupError:
+                pass
+        return 'utf-8'
+
+    def _is_parked(self, html):
+        head = html[:PARKED_SCAN_BYTES].lower()
+        return any(marker in head for marker in PARKED_DOMAIN_MARKERS)
+
+    def extract_emails(self, text):
+        """Extract unique emails in page order"""
+        emails = []
+        _extend_unique(emails, (email for _, email in self._email_matches(text)))
+        return emails
+
+    def _email_matches(self, text):
+        """(offset, email) for every valid email match"""
+        for pattern in self.email_patterns:
+            for match in pattern.finditer(text):
+                email = (match.group(1) if pattern.groups else match.group(0)).strip().lower()
+                if self._is_valid_email(email):
+                    yield match.start(), email
+
+    def extract_phones(self, html):
+        """Extract unique phone numbers, preferring tel: links"""
+        phones = []
+        _extend_unique(phones, (phone for _, phone in self._phone_matches(html)))
+        return phones
+
+    def _phone_matches(self, html):
+        """(offset in html, phone) for every valid tel: link, then every phone in the visible text"""
+        for match in TEL_LINK_PATTERN.finditer(html):
+            phone = match.group(1).replace('%20', ' ').strip()
+            if self._is_valid_phone(phone):
+                yield match.start(), phone
+
+        text, to_html = _strip_markup(html)
+        for pattern in self.phone_patterns:
+            for match in pattern.finditer(text):
+                phone = match.group(0).strip()
+                if self._is_valid_phone(phone):
+                    yield to_html(match.start()), phone
+
+    def _collect_contacts(self, window, start, end, emails, phones):
+        """Add the emails and phones whose match starts in window[start:end]"""
+        _extend_unique(emails, (email for offset, email in self._email_matches(window) if start <= offset < end))
+        _extend_unique(phones, (phone for offset, phone in self._phone_matches(window) if start <= offset < end))
+
+    def extract_contacts(self, html):
+        """Extract emails and phones from a page"""
+        return {
+            'emails': self.extract_emails(html),
+            'phones': self.extract_phones(html),
+        }
+
+    def _is_valid_email(self, email):
+        if email.endswith(IGNORED_EMAIL_SUFFIXES):
+            return False
+        domain = email.rsplit('@', 1)[-1]
+        return not any(domain == d or domain.endswith('.' + d) for d in IGNORED_EMAIL_DOMAINS)
+
+    def _is_valid_phone(self, phone):
+        digits = re.sub(r'\D', '', phone)
+        return 10 <= len(digits) <= 15
+
+    def enrich_business(self, business):
+        """Visit a business website and fill in contact fields in place"""
+        url = normalize_website_url(business.get('website'))
+        if not url:
+            return business
+
+        site = _SiteCrawl(self.max_site_bytes)
+        contacts = self.fetch_contacts(url, site=site)
+        if contacts is None:
+            return business
+
+        contacts = self.crawl_contact_pages(contacts, site)
+        with self._stop_lock:
+            if self.stopped.is_set():
+                # enrich_businesses already returned; the caller owns the dicts now
+                return business
+            self.apply_contacts(business, contacts)
+        return business
+
+    def crawl_contact_pages(self, homepage_contacts, site):
+        """Fetch up to K ranked contact pages concurrently, stopping early"""
+        links = homepage_contacts.get('contact_links', [])[:self.max_contact_pages]
+        if not links or _has_email_and_phone(homepage_contacts) or site.exhausted():
+            return _merge_contacts([homepage_contacts])
+
+        pages = {}
+        with ThreadPoolExecutor(max_workers=len(links)) as executor:
+            futures = {
+                executor.submit(self._fetch_contact_page, link, site): link
+                for link in links
+            }
+            for future in as_completed(futures):
+                try:
+                    contacts = future.result()
+                except Exception:
+                    contacts = None
+                if contacts:
+                    pages[futures[future]] = contacts
+
+                found = _merge_contacts([homepage_contacts] + list(pages.values()))
+                if _has_email_and_phone(found) or site.exhausted():
+                    # Cancel queued pages and abort the ones still streaming
+                    site.stop.set()
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+        # Merge in rank order so results don't depend on which page answered first
+        return _merge_contacts([homepage_contacts] + [pages[link] for link in links if link in pages])
+
+    def _fetch_contact_page(self, url, site):
+        if site.exhausted() or site.stop.is_set():
+            return None
+        self.contact_pages_fetched += 1
+        return self.fetch_contacts(url, site=site, homepage=False)
+
+    def apply_contacts(self, business, contacts):
+        """Write extracted contacts into the business result fields"""
+        emails = contacts.get('emails', [])
+        phones = contacts.get('phones', [])
+
+        business['website_visited'] = True
+        if emails:
+            self.emails_found += 1
+            business['email'] = business.get('email') or emails[0]
+            remaining = [e for e in emails if e != business['email']]
+            if remaining and not business.get('secondary_email'):
+                business['secondary_email'] = remaining[0]
+
+        if phones and not business.get('mobile'):
+            business['mobile'] = phones[0]
+
+        used = {business.get('email'), business.get('secondary_email'), business.get('mobile')}
+        extra = [c for c in emails + phones if c not in used]
+        if extra:
+            business['additional_contacts'] = ', '.join(extra)
+        else:
+            business.setdefault('additional_contacts', '')
+
+    def enrich_businesses(self, businesses, time_limit=None):
+        """Enrich all businesses that have a website, concurrently (stopping after time_limit seconds)"""
+        targets = [b for b in businesses if b and b.get('website')]
+        if not targets:
+            return businesses
+
+        start_time = time.time()
+        targets = _interleave_by_host(targets)
+        print(f"🌐 Enriching {len(targets)} websites with {self.max_workers} workers...")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {executor.submit(self.enrich_business, b): b for b in targets}
+        try:
+            for future in as_completed(futures, timeout=time_limit):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"⚠️ Website enrichment error for {futures[future].get('website')}: {e}")
+        except FuturesTimeout:
+            with self._stop_lock:
+                self.stopped.set()
+            unfinished = sum(1 for f in futures if not f.done())
+            print(f"⏱️ Website enrichment out of time; {unfinished} websites not finished")
+        finally:
+            # Don't wait for stragglers past the time limit; their fetches time out on their own
+            executor.shutdown(wait=time_limit is None, cancel_futures=True)
+            self._stragglers = [f for f in futures if not f.done()]
+
+        elapsed = time.time() - start_time
+        print(f"✅ Website enrichment done: {self.pages_fetched} pages "
+              f"({self.contact_pages_fetched} contact pages), "
+              f"{self.emails_found} with email, {elapsed:.1f}s")
+        print(f"📉 Streaming: {self.early_aborts} early aborts, {self.capped_fetches} capped, "
+              f"{self.non_html_skipped} non-HTML skipped")
+        stats = self.scheduler.stats()
+        print(f"🚦 Hosts: {stats['hosts']}, waited {stats['total_wait_seconds']}s for politeness, "
+              f"{stats['robots_blocked']} blocked by robots.txt")
+        if self.cache:
+            print(f"💾 Cache: {self.cache_hits} hits, {self.cache_revalidated} revalidated, "
+                  f"{self.negative_hits} dead domains skipped")
+        return businesses
+
+    def close(self):
+        """Release pooled connections"""
+        self.session.close()
+
+    def when_idle(self, fn):
+        """Call fn once the workers a time-limited run left behind are done (right away if there are none)"""
+        pending = [f for f in self._stragglers if not f.done()]
+        if not pending:
+            fn()
+            return
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def finished(future):
+            if not future.cancelled() and future.exception():
+                print(f"⚠️ Website enrichment error after the time limit: {future.exception()}")
+            with lock:
+                remaining[0] -= 1
+                last = not remaining[0]
+            if last:
+                fn()
+        for future in pending:
+            future.add_done_callback(finished)
+
+
+def enrich_with_websites(businesses, email_patterns=None, phone_patterns=None, max_workers=20, timeout=10,
+                         use_cache=True, time_limit=None):
+    """Convenience function used by the scrapers when visit_websites is enabled"""
+    cache = None
+    if use_cache:
+        try:
+            cache = WebsiteCache()
+        except Exception as e:
+            print(f"⚠️ Website cache unavailable, fetching without it: {e}")
+
+    enricher = WebsiteEnricher(
+        email_patterns=email_patterns,
+        phone_patterns=phone_patterns,
+        max_workers=max_workers,
+        timeout=timeout,
+        cache=cache
+    )
+
+    def release():
+        enricher.close()
+        if cache:
+            cache.close()
+
+    try:
+        return enricher.enrich_businesses(businesses, time_limit=time_limit)
+    finally:
+        # Workers still running past the time limit use the session and cache until they finish
+        enricher.when_idle(release)
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Work Queue - Hand scrape jobs from the API to separate worker processes
+Key points:
+- The API enqueues jobs; any number of `worker.py` processes lease them,
+  run them on their own Chrome slots and write progress and results back
+- Leases expire, so a job held by a crashed worker goes back to the queue
+  (up to max_attempts)
+- SQLiteWorkQueue works for every process on one machine; RedisWorkQueue
+  (needs `pip install redis`) shares the queue across nodes; it pops a
+  task and records its lease in one Lua script, so a crash can't lose it,
+  and heartbeat/finish/fail check the lease inside their own scripts
+- QueueScraper plugs into JobManager as its scrape_fn, so caching,
+  single-flight, streaming and backpressure work unchanged in queue mode
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+DEFAULT_WORK_QUEUE_PATH = os.environ.get(
+    'WORK_QUEUE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'work_queue.db')
+)
+# In queue mode API threads only wait on workers, so many can be tracked at once
+DEFAULT_REMOTE_SLOTS = int(os.environ.get('REMOTE_JOB_SLOTS', '32'))
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def open_work_queue(url=None):
+    """Queue for a SCRAPE_QUEUE setting: None (scrape in-process), 'sqlite[:///path]' or 'redis://...'"""
+    url = url if url is not None else os.environ.get('SCRAPE_QUEUE', '')
+    if not url:
+        return None
+    if url == 'sqlite':
+        return SQLiteWorkQueue()
+    if url.startswith('sqlite:///'):
+        return SQLiteWorkQueue(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(url)
+    raise ValueError(f"Unsupported SCRAPE_QUEUE: {url}")
+
+
+class SQLiteWorkQueue:
+    def __init__(self, path=DEFAULT_WORK_QUEUE_PATH, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()
+        # Autocommit, with explicit BEGIN IMMEDIATE where several processes race
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, created_at)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_results (
+                task_id TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (task_id, rank)
+            ) WITHOUT ROWID
+        """)
+
+    def enqueue(self, payload):
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, payload, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                (task_id, json.dumps(payload), now, now)
+            )
+        return task_id
+
+    def lease(self, worker_id):
+        """Claim the oldest runnable task: {'task_id', 'payload', 'attempts'} or None"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(now)
+                row = self._conn.execute(
+                    "SELECT task_id, payload, attempts FROM tasks WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                        (worker_id, now + self.lease_seconds, now, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if not row:
+            return None
+        return {'task_id': row[0], 'payload': json.loads(row[1]), 'attempts': row[2] + 1}
+
+    def _expire_leases(self, now):
+        """Requeue tasks whose worker stopped heartbeating; call inside a transaction"""
+        self._conn.execute(
+            "UPDATE tasks SET status = 'failed', worker = NULL, error = 'Worker lease expired too often', "
+            "updated_at = ? WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        )
+        self._conn.execute(
+            "UPDATE tasks SET status = 'queued', worker = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now, now)
+        )
+
+    def heartbeat(self, task_id, worker_id, progress=None):
+        """Extend the lease (and record progress); False if the lease was lost"""
+        now = time.time()
+        with self._lock:
+            if progress is None:
+                cursor = self._conn.execute(
+                    "UPDATE tasks SET lease_expires = ?, updated_at = ? "
+                    "WHERE task_id = ? AND worker = ? AND status = 'leased'",
+                    (now + self.lease_seconds, now, task_id, worker_id)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE tasks SET lease_expires = ?, progress = ?, updated_at = ? "
+                    "WHERE task_id = ? AND worker = ? AND status = 'leased'",
+                    (now + self.lease_seconds, json.dumps(progress), now, task_id, worker_id)
+                )
+        return cursor.rowcount == 1
+
+    def add_result(self, task_id, rank, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO task_results (task_id, rank, data) VALUES (?, ?, ?)",
+                (task_id, rank, json.dumps(result, default=str))
+            )
+
+    def finish(self, task_id, worker_id, results):
+        """Store the final results and mark the task done; False if the lease was lost"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                owned = self._conn.execute(
+                    "UPDATE tasks SET status = 'done', lease_expires = NULL, updated_at = ? "
+                    "WHERE task_id = ? AND worker = ? AND status = 'leased'",
+                    (now, task_id, worker_id)
+                ).rowcount == 1
+                if owned:
+                    self._conn.execute("DELETE FROM task_results WHERE task_id = ?", (task_id,))
+                    self._conn.executemany(
+                        "INSERT INTO task_results (task_id, rank, data) VALUES (?, ?, ?)",
+                        ((task_id, rank, json.dumps(r, default=str)) for rank, r in enumerate(results))
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return owned
+
+    def fail(self, task_id, worker_id, error):
+        """Give a task back for another attempt, or fail it for good after max_attempts"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "worker = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE task_id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, str(error), now, task_id, worker_id)
+            )
+
+    def status(self, task_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, worker, attempts, progress, error FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return {'status': row[0], 'worker': row[1], 'attempts': row[2],
+                'progress': json.loads(row[3]) if row[3] else {}, 'error': row[4]}
+
+    def results(self, task_id, after=-1):
+        """(rank, result) pairs with rank > after"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rank, data FROM task_results WHERE task_id = ? AND rank > ? ORDER BY rank",
+                (task_id, after)
+            ).fetchall()
+        return [(rank, json.loads(data)) for rank, data in rows]
+
+    def depth(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Popping a task and recording its lease happen in one script: a worker that dies in between
+# would otherwise leave the task in neither the queue nor the lease set, never to be retried
+# KEYS: queue, leases; ARGV: task key prefix, worker id, now, lease deadline
+LEASE_SCRIPT = """
+local task_id = redis.call('LPOP', KEYS[1])
+if not task_id then
+    return nil
+end
+local key = ARGV[1] .. task_id
+redis.call('HSET', key, 'status', 'leased', 'worker', ARGV[2], 'updated_at', ARGV[3])
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[4], task_id)
+return {task_id, attempts, redis.call('HGET', key, 'payload')}
+"""
+
+# Expired leases go back to the queue (or fail) in one step too
+# KEYS: queue, leases; ARGV: task key prefix, now, max attempts
+EXPIRE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], 0, ARGV[2])
+for _, task_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], task_id)
+    local key = ARGV[1] .. task_id
+    if tonumber(redis.call('HGET', key, 'attempts') or '0') >= tonumber(ARGV[3]) then
+        redis.call('HSET', key, 'status', 'failed', 'worker', '', 'error', 'Worker lease expired too often',
+                   'updated_at', ARGV[2])
+    else
+        redis.call('HSET', key, 'status', 'queued', 'worker', '', 'updated_at', ARGV[2])
+        redis.call('LPUSH', KEYS[1], task_id)
+    end
+end
+return #expired
+"""
+
+# Heartbeat, finish and fail check that the caller still holds the lease in the same script that
+# writes: a worker whose lease expired must not touch a task another worker has leased since
+# KEYS: leases, task; ARGV: task id, worker id, now, lease deadline, progress JSON ('' for none)
+HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'status') ~= 'leased' or redis.call('HGET', KEYS[2], 'worker') ~= ARGV[2] then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+redis.call('HSET', KEYS[2], 'updated_at', ARGV[3])
+if ARGV[5] ~= '' then
+    redis.call('HSET', KEYS[2], 'progress', ARGV[5])
+end
+return 1
+"""
+
+# KEYS: leases, task, results; ARGV: task id, worker id, now, then rank, result JSON pairs
+FINISH_SCRIPT = """
+if redis.call('HGET', KEYS[2], 'status') ~= 'leased' or redis.call('HGET', KEYS[2], 'worker') ~= ARGV[2] then
+    return 0
+end
+redis.call('DEL', KEYS[3])
+for i = 4, #ARGV, 2 do
+    redis.call('HSET', KEYS[3], ARGV[i], ARGV[i + 1])
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], 'status', 'done', 'updated_at', ARGV[3])
+return 1
+"""
+
+# KEYS: queue, leases, task; ARGV: task id, worker id, error, now, max attempts
+FAIL_SCRIPT = """
+if redis.call('HGET', KEYS[3], 'status') ~= 'leased' or redis.call('HGET', KEYS[3], 'worker') ~= ARGV[2] then
+    return 0
+end
+local retry = tonumber(redis.call('HGET', KEYS[3], 'attempts') or '0') < tonumber(ARGV[5])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[3], 'status', retry and 'queued' or 'failed', 'worker', '', 'error', ARGV[3],
+           'updated_at', ARGV[4])
+if retry then
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class RedisWorkQueue:
+    """Same interface as SQLiteWorkQueue on a Redis-compatible server"""
+
+    def __init__(self, url, prefix='gmaps', lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RedisWorkQueue needs the redis package: pip install redis")
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.queue_key = f"{prefix}:queue"
+        self.leases_key = f"{prefix}:leases"
+        self._lease_script = self.redis.register_script(LEASE_SCRIPT)
+        self._expire_script = self.redis.register_script(EXPIRE_SCRIPT)
+        self._heartbeat_script = self.redis.register_script(HEARTBEAT_SCRIPT)
+        self._finish_script = self.redis.register_script(FINISH_SCRIPT)
+        self._fail_script = self.redis.register_script(FAIL_SCRIPT)
+
+    def _task_key(self, task_id):
+        return f"{self.prefix}:task:{task_id}"
+
+    def _results_key(self, task_id):
+        return f"{self.prefix}:task:{task_id}:results"
+
+    def enqueue(self, payload):
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.hset(self._task_key(task_id), mapping={
+            'payload': json.dumps(payload), 'status': 'queued', 'attempts': 0,
+            'created_at': now, 'updated_at': now,
+        })
+        pipe.rpush(self.queue_key, task_id)
+        pipe.execute()
+        return task_id
+
+    def lease(self, worker_id):
+        now = time.time()
+        self._expire_leases(now)
+
+        leased = self._lease_script(keys=[self.queue_key, self.leases_key],
+                                    args=[self._task_key(''), worker_id, now, now + self.lease_seconds])
+        if not leased:
+            return None
+        task_id, attempts, payload = leased
+        return {'task_id': task_id, 'payload': json.loads(payload), 'attempts': attempts}
+
+    def _expire_leases(self, now):
+        self._expire_script(keys=[self.queue_key, self.leases_key],
+                            args=[self._task_key(''), now, self.max_attempts])
+
+    def heartbeat(self, task_id, worker_id, progress=None):
+        now = time.time()
+        return bool(self._heartbeat_script(
+            keys=[self.leases_key, self._task_key(task_id)],
+            args=[task_id, worker_id, now, now + self.lease_seconds,
+                  json.dumps(progress) if progress is not None else '']))
+
+    def add_result(self, task_id, rank, result):
+        self.redis.hset(self._results_key(task_id), rank, json.dumps(result, default=str))
+
+    def finish(self, task_id, worker_id, results):
+        ranked = []
+        for rank, result in enumerate(results or []):
+            ranked += [rank, json.dumps(result, default=str)]
+        return bool(self._finish_script(
+            keys=[self.leases_key, self._task_key(task_id), self._results_key(task_id)],
+            args=[task_id, worker_id, time.time()] + ranked))
+
+    def fail(self, task_id, worker_id, error):
+        self._fail_script(keys=[self.queue_key, self.leases_key, self._task_key(task_id)],
+                          args=[task_id, worker_id, str(error), time.time(), self.max_attempts])
+
+    def status(self, task_id):
+        data = self.redis.hgetall(self._task_key(task_id))
+        if not data:
+            return None
+        return {'status': data.get('status'), 'worker': data.get('worker') or None,
+                'attempts': int(data.get('attempts', 0)),
+                'progress': json.loads(data['progress']) if data.get('progress') else {},
+                'error': data.get('error')}
+
+    def results(self, task_id, after=-1):
+        rows = self.redis.hgetall(self._results_key(task_id))
+        return sorted((int(rank), json.loads(data)) for rank, data in rows.items() if int(rank) > after)
+
+    def depth(self):
+        return {'queued': self.redis.llen(self.queue_key), 'leased': self.redis.zcard(self.leases_key)}
+
+    def close(self):
+        self.redis.close()
+
+
+class QueueScraper:
+    """scrape_fn that runs the scrape on a worker process and relays its progress"""
+
+    def __init__(self, queue, poll_interval=0.5, max_poll_interval=5.0, timeout=None):
+        self.queue = queue
+        self.poll_interval = poll_interval
+        # Polling backs off up to max_poll_interval while the task shows no change
+        self.max_poll_interval = max_poll_interval
+        # Seconds to wait for a worker before giving up (None waits until the time budget runs out)
+        self.timeout = timeout
+
+    def __call__(self, query, max_results, visit_websites, progress_callback=None, skip_links=None,
+                 claim_link=None, time_budget=None):
+        # claim_link can't reach another process: batch dedup then happens when results merge
+        payload = {
+            'query': query,
+            'max_results': max_results,
+            'visit_websites': visit_websites,
+            'skip_links': sorted(skip_links or ()),
+        }
+        if time_budget:
+            # Wall-clock deadline, so time waiting for a worker counts too (assumes NTP-synced nodes)
+            payload['deadline'] = time.time() + time_budget.remaining()
+        give_up = time.time() + self.timeout if self.timeout else None
+        if 'deadline' in payload:
+            # A worker returns partial results at the deadline; past one more lease, nobody is coming
+            late = payload['deadline'] + self.queue.lease_seconds
+            give_up = min(give_up, late) if give_up else late
+        task_id = self.queue.enqueue(payload)
+        report = progress_callback or (lambda event, payload: None)
+        last_rank, last_progress = -1, {}
+        interval = self.poll_interval
+
+        while True:
+            state = self.queue.status(task_id)
+            if state is None:
+                raise RuntimeError(f'Task {task_id} disappeared from the queue')
+            changed = False
+            for rank, result in self.queue.results(task_id, last_rank):
+                report('result', {'result': result})
+                last_rank = rank
+                changed = True
+
+            progress = state['progress']
+            if progress.get('links_found') != last_progress.get('links_found'):
+                report('links', {'links_found': progress['links_found']})
+            if progress.get('processed') != last_progress.get('processed'):
+                report('progress', {'processed': progress['processed'], 'total': progress.get('total', 0)})
+            if progress.get('stage') == 'enriching' and last_progress.get('stage') != 'enriching':
+                report('enriching', {})
+            if progress.get('partial') and not last_progress.get('partial'):
+                report('partial', {'reason': progress['partial']})
+            changed = changed or progress != last_progress
+            last_progress = progress
+
+            if state['status'] == 'done':
+                return [result for _, result in self.queue.results(task_id)]
+            if state['status'] == 'failed':
+                raise RuntimeError(state['error'] or 'Worker failed')
+            if give_up and time.time() >= give_up:
+                raise TimeoutError(f"Task {task_id} still {state['status']} after the wait limit")
+            interval = self.poll_interval if changed else min(interval * 2, self.max_poll_interval)
+            time.sleep(interval)
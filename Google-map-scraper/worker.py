@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Scrape Worker - Leases jobs from the work queue and runs them
+Key points:
+- Start any number of these, on any node that can reach the queue:
+  `SCRAPE_QUEUE=redis://host:6379/0 python worker.py --concurrency 2`
+- Each worker runs its own Chrome slots (one per concurrency thread)
+- Progress and every extracted business are written back as they happen,
+  so the API streams them just like an in-process scrape
+- A heartbeat keeps the lease alive; if the worker dies the lease expires
+  and another worker picks the job up, resuming from its checkpoint when
+  it shares the CHECKPOINT_PATH (same node or a shared volume)
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import traceback
+
+from checkpoints import CheckpointStore
+from scrape_jobs import DEFAULT_SCRAPE_WORKERS, default_scrape
+from time_budget import TimeBudget
+from work_queue import open_work_queue
+
+
+class TaskReporter:
+    """Progress callback that writes a leased task's progress back to the queue"""
+
+    def __init__(self, queue, task_id, worker_id):
+        self.queue = queue
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.progress = {'links_found': 0, 'processed': 0, 'total': 0, 'stage': 'searching'}
+        self.rank = 0
+        self.lost = False
+        self._lock = threading.Lock()
+
+    def __call__(self, event, payload):
+        if self.lost:
+            return
+        with self._lock:
+            if event == 'result':
+                self.queue.add_result(self.task_id, self.rank, payload['result'])
+                self.rank += 1
+                return
+            if event == 'links':
+                self.progress['links_found'] = self.progress['total'] = payload.get('links_found', 0)
+                self.progress['stage'] = 'extracting'
+            elif event == 'progress':
+                self.progress['processed'] = payload.get('processed', 0)
+                self.progress['total'] = payload.get('total', self.progress['total'])
+            elif event == 'enriching':
+                self.progress['stage'] = 'enriching'
+            elif event == 'partial':
+                self.progress['partial'] = payload.get('reason') or True
+        self.heartbeat()
+
+    def heartbeat(self):
+        with self._lock:
+            progress = dict(self.progress)
+        if not self.queue.heartbeat(self.task_id, self.worker_id, progress):
+            self.lost = True
+        return not self.lost
+
+
+def run_task(queue, task, worker_id, scrape_fn=default_scrape, checkpoints=None):
+    """Run one leased task to completion, keeping its lease alive meanwhile"""
+    task_id, params = task['task_id'], task['payload']
+    reporter = TaskReporter(queue, task_id, worker_id)
+    done = threading.Event()
+
+    def keep_alive():
+        while not done.wait(queue.lease_seconds / 3):
+            if not reporter.heartbeat():
+                print(f"⚠️ Lost lease on task {task_id}; another worker will run it")
+                return
+
+    threading.Thread(target=keep_alive, daemon=True).start()
+    print(f"🚀 [{worker_id}] Task {task_id} (attempt {task['attempts']}): '{params['query']}'")
+    try:
+        kwargs = {'progress_callback': reporter}
+        if params.get('skip_links'):
+            kwargs['skip_links'] = set(params['skip_links'])
+        if params.get('deadline'):
+            kwargs['time_budget'] = TimeBudget(max(0.0, params['deadline'] - time.time()))
+        if checkpoints:
+            # Keyed by task, so whichever worker re-leases it resumes the same checkpoint
+            kwargs['checkpoint'] = checkpoints.open(task_id, params)
+        results = scrape_fn(params['query'], params['max_results'], params['visit_websites'], **kwargs)
+        done.set()
+        if queue.finish(task_id, worker_id, [r for r in (results or []) if r]):
+            print(f"✅ [{worker_id}] Task {task_id} completed with {len(results or [])} results")
+            if checkpoints:
+                checkpoints.delete(task_id)
+    except Exception as e:
+        done.set()
+        queue.fail(task_id, worker_id, e)
+        print(f"❌ [{worker_id}] Task {task_id} failed: {e}")
+        traceback.print_exc()
+        if checkpoints and (queue.status(task_id) or {}).get('status') == 'failed':
+            checkpoints.delete(task_id)
+
+
+def run_worker(queue, concurrency=1, scrape_fn=default_scrape, worker_id=None, stop_event=None, idle_sleep=1.0,
+               checkpoints=None):
+    """Lease and run tasks on `concurrency` threads until stop_event is set"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+
+    def loop(slot):
+        slot_id = f"{worker_id}/{slot}"
+        while not stop_event.is_set():
+            try:
+                task = queue.lease(slot_id)
+            except Exception as e:
+                print(f"⚠️ [{slot_id}] Could not lease from the queue: {e}")
+                task = None
+            if task is None:
+                stop_event.wait(idle_sleep)
+                continue
+            run_task(queue, task, slot_id, scrape_fn, checkpoints)
+
+    threads = [threading.Thread(target=loop, args=(slot,), daemon=True) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scrape jobs from the work queue")
+    parser.add_argument('--queue', default=os.environ.get('SCRAPE_QUEUE') or 'sqlite',
+                        help="sqlite, sqlite:///path/to/queue.db or redis://host:port/db")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_SCRAPE_WORKERS,
+                        help="Chrome instances this worker runs at once")
+    args = parser.parse_args()
+
+    queue = open_work_queue(args.queue)
+    print(f"🔧 Worker on {args.queue} with {args.concurrency} driver slot(s)")
+    stop_event = threading.Event()
+    threads = run_worker(queue, args.concurrency, stop_event=stop_event, checkpoints=CheckpointStore())
+    try:
+        while any(t.is_alive() for t in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping worker (running tasks are abandoned and will be re-leased)")
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    main()